@@ -0,0 +1,305 @@
+import argparse
+import io
+import json
+import logging
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from carregamento import limpar_padronizar_dataframe
+from esquema import aplicar_esquema
+from fontes_dados import FonteArquivoLocal, PASTA_SNAPSHOT, SnapshotDados
+from metodologia import METODOLOGIAS, metodologia_do_ano, obter_metodologia
+from motor_calculo import (COL_FINANCIAMENTO, COLUNAS_QTM, COLUNAS_RESULTADO, FINANCIAMENTOS,
+                           calcular_matricula_total_lote, preparar_entradas)
+
+# =======================================================
+# API HTTP DA MATRÍCULA TOTAL (JSON/CSV, só biblioteca padrão)
+# Mesma fórmula e mesma regra de CHM da calculadora, para um ciclo ou para
+# milhares de uma vez (cálculo vetorizado). A base do IFFar é o mesmo
+# snapshot local gravado pelo app.
+#
+#   python api_mt.py --porta 8765
+#   curl -X POST localhost:8765/mt -d '{"DIC": "01/03/2024", "DTC": "20/12/2026", ...}'
+#   curl -X POST 'localhost:8765/mt/lote?ano=2023&metodologia=646/2022' -d @ciclos.json
+# =======================================================
+
+logger = logging.getLogger(__name__)
+
+PORTA_PADRAO = 8765
+TAMANHO_MAXIMO_CORPO = 50 * 1024 * 1024
+NIVEIS_BASE = ['Unidade de Ensino', 'Tipo de Curso', 'Nome_Padronizado']
+
+# Nomes de campo da API -> colunas da planilha Fase 4 (já limpas)
+CAMPOS_API = {
+    'TIPO_CURSO': 'Tipo de Curso',
+    'TIPO_OFERTA': 'Tipo de Oferta',
+    'AGRO': 'Agropecuária',
+    'FINANCIAMENTO': COL_FINANCIAMENTO,
+    'APTO': 'Apto',
+}
+# Campos sem os quais a MT não é calculada (QTM pode vir como QTM1P)
+CAMPOS_OBRIGATORIOS = {'DIC': ['DIC'], 'DTC': ['DTC'], 'CHC': ['CHC'], 'QTM': COLUNAS_QTM}
+COLUNAS_SAIDA = ['DIC', 'DTC', 'CHC', 'CHM', 'PC', 'QTM', 'AGRO',
+                 'FINANCIAMENTO', 'JUBILADO'] + COLUNAS_RESULTADO
+
+
+class ErroRequisicao(Exception):
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _texto_sim_nao(valor):
+    if isinstance(valor, bool):
+        return "Sim" if valor else "Não"
+    return valor
+
+
+def quadro_de_ciclos(registros):
+    """
+    DataFrame no formato da planilha limpa, já tipado pelo esquema, a partir
+    de registros da API, e os problemas de cada linha: uma Series com a
+    lista dos campos ausentes ou inválidos (None nas linhas sem problema).
+    """
+    df = pd.DataFrame(registros)
+    if df.empty:
+        raise ErroRequisicao("Nenhum ciclo informado.")
+    df = df.rename(columns=CAMPOS_API)
+    for coluna in ('Agropecuária', 'Apto'):
+        if coluna in df.columns:
+            df[coluna] = df[coluna].map(_texto_sim_nao)
+    # Cabeçalhos completos da Fase 4 (ex.: "DIC - Data de Início") viram siglas
+    df = limpar_padronizar_dataframe(df)
+    tipado, falhas = aplicar_esquema(df)
+    return tipado, problemas_ciclos(tipado, falhas)
+
+
+def problemas_ciclos(df, falhas):
+    """Por linha, os campos obrigatórios ausentes e os valores que não puderam ser convertidos."""
+    nomes_api = {coluna: campo for campo, coluna in CAMPOS_API.items()}
+    problemas = [[] for _ in range(len(df))]
+    posicao = pd.Series(np.arange(len(df)), index=df.index)
+    for coluna, valores in falhas.items():
+        for indice, valor in valores.items():
+            problemas[posicao[indice]].append(f"{nomes_api.get(coluna, coluna)} inválido ({valor!r})")
+    for campo, colunas in CAMPOS_OBRIGATORIOS.items():
+        presentes = [c for c in colunas if c in df.columns]
+        ausente = df[presentes].isnull().all(axis=1) if presentes else pd.Series(True, index=df.index)
+        invalido = np.zeros(len(df), dtype=bool)
+        for c in presentes:
+            if c in falhas:
+                invalido[posicao[falhas[c].index].to_numpy()] = True
+        for i in np.flatnonzero(ausente.to_numpy() & ~invalido):
+            problemas[i].append(f"{campo} ausente")
+    return pd.Series(["; ".join(p) if p else None for p in problemas], index=df.index, dtype=object)
+
+
+def _metodologia(versao, ano):
+    """Versão pedida na requisição ou, sem ela, a vigente no ano."""
+    return obter_metodologia(versao) or metodologia_do_ano(ano)
+
+
+def calcular_ciclos(df, ano=2024, metodologia=None):
+    """
+    Calcula todos os ciclos de uma vez. Uma coluna CHM informada substitui a
+    CHM da regra (como o campo editável da calculadora).
+    """
+    entradas = preparar_entradas(df, metodologia, ano)
+    if 'CHM' in df.columns:
+        chm = pd.to_numeric(df['CHM'], errors='coerce')
+        entradas['CHM'] = chm.where(chm.notnull(), entradas['CHM']).astype(np.int64)
+    resultado = calcular_matricula_total_lote(df, ano, entradas, metodologia)
+    saida = resultado[COLUNAS_SAIDA].copy()
+    saida['FINANCIAMENTO'] = np.asarray(FINANCIAMENTOS, dtype=object)[saida['FINANCIAMENTO']]
+    if 'ID' in df.columns:
+        saida.insert(0, 'ID', df['ID'])
+    return saida
+
+
+def _json(df):
+    datas = df.select_dtypes('datetime').columns
+    if len(datas):
+        df = df.assign(**{c: df[c].dt.strftime('%Y-%m-%d') for c in datas})
+    return df.to_json(orient='records', force_ascii=False)
+
+
+class ServicoMT:
+    """Estado compartilhado entre as requisições: a base do IFFar, se houver."""
+
+    def __init__(self, base=None):
+        self.base = base
+
+    def mt_ciclo(self, corpo, consulta):
+        registro = json.loads(corpo or b'{}')
+        if not isinstance(registro, dict):
+            raise ErroRequisicao("Envie um objeto JSON com os campos do ciclo.")
+        ano = int(registro.pop('ANO', consulta.get('ano', 2024)))
+        metodologia = _metodologia(registro.pop('METODOLOGIA', consulta.get('metodologia')), ano)
+        df, problemas = quadro_de_ciclos([registro])
+        if problemas.notnull().any():
+            raise ErroRequisicao(f"Campos ausentes ou inválidos: {problemas.iloc[0]}.")
+        linha = json.loads(_json(calcular_ciclos(df, ano, metodologia)))[0]
+        linha['METODOLOGIA'] = metodologia.versao
+        return 200, 'application/json', json.dumps(linha, ensure_ascii=False)
+
+    def mt_lote(self, corpo, consulta, tipo_conteudo, aceita):
+        ano = int(consulta.get('ano', 2024))
+        versao = consulta.get('metodologia')
+        if 'csv' in tipo_conteudo:
+            df = pd.read_csv(io.BytesIO(corpo), sep=None, engine='python')
+            registros = df.to_dict(orient='records')
+        else:
+            dados = json.loads(corpo or b'[]')
+            if isinstance(dados, dict):
+                ano = int(dados.get('ano', ano))
+                versao = dados.get('metodologia', versao)
+                dados = dados.get('ciclos', [])
+            registros = dados
+        metodologia = _metodologia(versao, ano)
+        df, problemas = quadro_de_ciclos(registros)
+        saida = calcular_ciclos(df, ano, metodologia)
+        # Linhas com problema saem sem resultado e com o motivo em ERRO
+        invalidas = problemas.notnull().to_numpy()
+        if invalidas.any():
+            calculadas = [c for c in saida.columns if c != 'ID']
+            inteiras = [c for c in calculadas if pd.api.types.is_integer_dtype(saida[c])]
+            saida = saida.astype({c: 'Int64' for c in inteiras})
+            saida[calculadas] = saida[calculadas].mask(
+                np.broadcast_to(invalidas[:, None], (len(saida), len(calculadas))))
+        saida['ERRO'] = problemas.to_numpy()
+        if 'csv' in aceita:
+            return 200, 'text/csv; charset=utf-8', saida.to_csv(index=False)
+        return 200, 'application/json', '{"ano": %d, "metodologia": %s, "ciclos": %s}' % (
+            ano, json.dumps(metodologia.versao), _json(saida))
+
+    def ciclos_base(self, consulta):
+        if self.base is None:
+            raise ErroRequisicao("Base do IFFar não disponível neste servidor.", 404)
+        conjunto = self.base.obter_conjunto()
+        ano = int(consulta.get('ano', 2024))
+        metodologia = _metodologia(consulta.get('metodologia'), ano)
+        filtros = [consulta.get(p) for p in ('campus', 'tipo', 'curso')]
+        posicoes = conjunto.indice(NIVEIS_BASE).posicoes(*filtros)
+
+        df = conjunto.df.iloc[posicoes]
+        resultado = conjunto.resultado(ano, metodologia).iloc[posicoes]
+        saida = pd.concat([df[[c for c in NIVEIS_BASE if c in df.columns]],
+                           resultado[['DIC', 'DTC', 'QTM', 'JUBILADO', 'MECHDA', 'BA', 'MT']]], axis=1)
+        return 200, 'application/json', '{"ano": %d, "metodologia": %s, "versao_base": %s, "mt_total": %s, "ciclos": %s}' % (
+            ano, json.dumps(metodologia.versao), json.dumps(self.base.versao),
+            json.dumps(float(saida['MT'].sum())), _json(saida))
+
+    def metodologias(self):
+        return 200, 'application/json', json.dumps([
+            {'versao': m.versao, 'portaria': m.portaria, 'ano_inicial': m.ano_inicial,
+             'regras_chm': m.regras_chm, **m.parametros(), 'pesos_curso': m.pesos_curso}
+            for m in METODOLOGIAS], ensure_ascii=False)
+
+
+class ManipuladorAPI(BaseHTTPRequestHandler):
+    servico = None
+
+    def _responder(self, status, tipo, corpo):
+        dados = corpo.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _erro(self, status, mensagem):
+        self._responder(status, 'application/json',
+                        json.dumps({'erro': mensagem}, ensure_ascii=False))
+
+    def _executar(self, rota):
+        url = urlparse(self.path)
+        consulta = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            self._responder(*rota(url.path, consulta))
+        except ErroRequisicao as e:
+            self._erro(e.status, str(e))
+        except (ValueError, KeyError) as e:
+            self._erro(400, f"Requisição inválida: {e}")
+        except Exception as e:
+            logger.exception("Erro ao atender %s", self.path)
+            self._erro(500, str(e))
+
+    def _ler_corpo(self):
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        if tamanho > TAMANHO_MAXIMO_CORPO:
+            raise ErroRequisicao("Corpo da requisição muito grande.", 413)
+        return self.rfile.read(tamanho)
+
+    def do_GET(self):
+        def rota(caminho, consulta):
+            if caminho == '/saude':
+                versao = self.servico.base.versao if self.servico.base else None
+                return 200, 'application/json', json.dumps({'status': 'ok', 'versao_base': versao})
+            if caminho == '/base/ciclos':
+                return self.servico.ciclos_base(consulta)
+            if caminho == '/metodologias':
+                return self.servico.metodologias()
+            raise ErroRequisicao("Rota não encontrada.", 404)
+        self._executar(rota)
+
+    def do_POST(self):
+        def rota(caminho, consulta):
+            corpo = self._ler_corpo()
+            if caminho == '/mt':
+                return self.servico.mt_ciclo(corpo, consulta)
+            if caminho == '/mt/lote':
+                return self.servico.mt_lote(corpo, consulta,
+                                            self.headers.get('Content-Type', ''),
+                                            self.headers.get('Accept', ''))
+            raise ErroRequisicao("Rota não encontrada.", 404)
+        self._executar(rota)
+
+    def log_message(self, formato, *args):
+        logger.info("%s - %s", self.address_string(), formato % args)
+
+
+def base_compartilhada():
+    """
+    A mesma base do app. Com CALCMT_FONTE_LOCAL, a API mantém o próprio
+    snapshot (e registro de alterações); sem ela, só lê o snapshot do app,
+    relendo-o quando o app o regrava.
+    """
+    caminho_snapshot = os.path.join(PASTA_SNAPSHOT, "base_iffar.parquet")
+    caminho_local = os.environ.get("CALCMT_FONTE_LOCAL")
+    if caminho_local:
+        return SnapshotDados(FonteArquivoLocal(caminho_local),
+                             os.path.join(PASTA_SNAPSHOT, "base_iffar_api.parquet"))
+    if os.path.exists(caminho_snapshot):
+        return SnapshotDados(None, caminho_snapshot, somente_leitura=True)
+    return None
+
+
+def criar_servidor(host='127.0.0.1', porta=PORTA_PADRAO, base=None):
+    manipulador = type('Manipulador', (ManipuladorAPI,), {'servico': ServicoMT(base)})
+    return ThreadingHTTPServer((host, porta), manipulador)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP de cálculo da Matrícula Total.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    servidor = criar_servidor(args.host, args.porta, base_compartilhada())
+    logger.info("API da MT em http://%s:%d", args.host, args.porta)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
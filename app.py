@@ -1,9 +1,30 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import datetime
 import warnings
 import os
-from streamlit_gsheets import GSheetsConnection
+import io
+from metodologia import metodologia_do_ano, obter_metodologia, versoes_metodologia
+from motor_calculo import (FINANCIAMENTOS, calcular_chm, calcular_ciclo,
+                           converter_para_data, converter_para_numero, get_val)
+from solucionador import SOLUCIONADORES, entradas_ciclo
+from auditoria import (ETAPAS_AUDITORIA, TOLERANCIA_PADRAO, ano_da_planilha,
+                       auditar_planilha, divergencias, resumo_auditoria)
+from exportacao import TIPOS_MIME, exportar_para_temporario
+from painel import METRICAS_PAINEL
+from simulacao import COLUNAS_EDITAVEIS, SimulacaoEdicao
+from projecao import ANOS_PADRAO, agregar_projecao
+from qualidade import mascara_regra, problemas_do_ciclo, relatorio_qualidade, resumo_qualidade
+from cenarios import EIXOS, matriz_calor, varredura_cenarios
+from busca_cursos import colunas_busca
+from carregamento import MAPA_COLUNAS_OUTROS_IFS, formatar_nome, ler_planilha_fase4
+from carga_multipla import COL_ANO_BASE, carregar_planilhas, comparativo_mt
+from cache_planilhas import cache_planilhas, chave_conteudo
+from conjunto_dados import ConjuntoDados
+from esquema import resumo_falhas
+from instrumentacao import ATIVO as INSTRUMENTACAO_ATIVA, iniciar_execucao, medir, registros_execucao
+from fontes_dados import FonteArquivoLocal, FonteGSheets, PASTA_SNAPSHOT, SnapshotDados
 
 
 st.set_page_config(
@@ -21,11 +42,6 @@ else:
 
 warnings.filterwarnings("ignore", category=UserWarning, module="pandas")
 
-try:
-    from correcoes_nomes import nomes_cursos_substituicoes
-except ImportError:
-    nomes_cursos_substituicoes = {}
-
 st.markdown("""
     <style>
     
@@ -95,6 +111,8 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+iniciar_execucao()
+
 # Gerenciamento de Estado para Navegação
 if 'modo' not in st.session_state:
     st.session_state['modo'] = None
@@ -103,190 +121,208 @@ if 'modo' not in st.session_state:
 def set_modo(novo_modo):
     st.session_state['modo'] = novo_modo
 
+
+# Metodologia escolhida para esta execução (padrão: a vigente em cada ano de análise)
+OPCAO_METODOLOGIA_ANO = "Conforme o ano de análise"
+st.sidebar.selectbox("Metodologia de cálculo", [OPCAO_METODOLOGIA_ANO] + versoes_metodologia(),
+                     key="metodologia_calculo",
+                     help="Regras de CHM, divisor de CH, jubilamento, bônus agro e redutores EaD.")
+
+
+def metodologia_escolhida():
+    versao = st.session_state.get("metodologia_calculo", OPCAO_METODOLOGIA_ANO)
+    return None if versao == OPCAO_METODOLOGIA_ANO else obter_metodologia(versao)
+
 # =======================================================
 # 1. FUNÇÕES AUXILIARES E LÓGICA
 # =======================================================
 
 
-def formatar_nome(x):
-    if pd.isnull(x):
-        return ""
-    x = str(x).strip().upper()
-    return nomes_cursos_substituicoes.get(x, x).upper()
-
-
-def calcular_chm(tipo_curso, tipo_oferta, chc, chmc):
-    tipo_curso_upper = str(tipo_curso).upper(
-    ) if pd.notnull(tipo_curso) else ""
-    tipo_oferta_upper = str(tipo_oferta).strip(
-    ).upper() if pd.notnull(tipo_oferta) else ""
-
-    if tipo_curso_upper in ["QUALIFICACAO PROFISSIONAL (FIC)", "DOUTORADO"]:
-        return chc
-    elif "PROEJA" in tipo_oferta_upper:
-        return 2400
-    elif tipo_oferta_upper == "INTEGRADO":
-        if chmc == 800:
-            return 3000
-        elif chmc == 1000:
-            return 3100
-        elif chmc == 1200:
-            return 3200
-        else:
-            return chmc
+@st.cache_resource
+def obter_base_iffar():
+    # CALCMT_FONTE_LOCAL aponta para um arquivo que substitui o Google Sheets
+    caminho_local = os.environ.get("CALCMT_FONTE_LOCAL")
+    if caminho_local:
+        fonte = FonteArquivoLocal(caminho_local)
     else:
-        return chmc
+        # Só o modo com Google Sheets precisa do conector
+        from streamlit_gsheets import GSheetsConnection
+        fonte = FonteGSheets(st.connection("gsheets", type=GSheetsConnection))
+    return SnapshotDados(fonte, os.path.join(PASTA_SNAPSHOT, "base_iffar.parquet"))
 
 
-def get_val(row, keys, default=None):
-    if row is None:
-        return default
-    if isinstance(keys, str):
-        keys = [keys]
-    for k in keys:
-        if k in row.index and pd.notnull(row[k]):
-            return row[k]
-    return default
+def _acertos_base_iffar():
+    return obter_base_iffar().acertos
 
 
-def converter_para_data(valor):
-    if pd.isnull(valor) or valor == "":
-        return None
-    if isinstance(valor, (pd.Timestamp, datetime.datetime)):
-        return valor.date()
-    if isinstance(valor, datetime.date):
-        return valor
-    try:
-        dt = pd.to_datetime(valor, dayfirst=True, errors='coerce')
-        return dt.date() if pd.notnull(dt) else None
-    except:
-        return None
+@medir("carregar_dados_gsheets", _acertos_base_iffar)
+def carregar_base_iffar():
+    return obter_base_iffar().obter_conjunto()
 
 
-def limpar_padronizar_dataframe(df):
-    siglas_alvo = [
-        "DIC", "DTC", "CHC", "CHMC", "CHM", "PC",
-        "QTDC", "CHMD", "CHA", "FECH",
-        "DIP", "DFP", "QTM1P", "QTM", "DACP",
-        "FEDA", "FECHDA", "MECHDA", "MP", "BA", "MT", "Apto"
-    ]
-    novos_nomes = {}
-    for col in df.columns:
-        primeiro_token = str(col).strip().split()[0]
-        primeiro_token_limpo = primeiro_token.strip()
-        if any(primeiro_token_limpo.startswith(sigla) for sigla in siglas_alvo):
-            novos_nomes[col] = primeiro_token_limpo
-        else:
-            novos_nomes[col] = ' '.join(str(col).split())
-    df = df.rename(columns=novos_nomes)
-
-    if 'Nome do curso' in df.columns:
-        df = df[df['Nome do curso'].notnull()]
-        df['Nome_Padronizado'] = df['Nome do curso'].apply(formatar_nome)
-    else:
-        df['Nome_Padronizado'] = "A DEFINIR"
-    return df
+NIVEIS_IFFAR = ['Unidade de Ensino', 'Tipo de Curso', 'Nome_Padronizado']
+NIVEIS_MANUAL = ['Tipo de Curso', 'Tipo de Oferta', 'Nome_Padronizado']
 
 
-@st.cache_data(ttl=600)
-def carregar_dados_gsheets():
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    df = conn.read(header=2)
-    df = limpar_padronizar_dataframe(df)
-    return df
+def ler_planilha_outros_ifs(conteudo):
+    df, nome_aba = ler_planilha_fase4(io.BytesIO(conteudo))
+    if df is None:
+        return None, None
+    df = df.rename(columns=MAPA_COLUNAS_OUTROS_IFS)
+    return ConjuntoDados(df), nome_aba
 
 
+@medir("carregar_dados_excel", lambda: cache_planilhas.acertos)
 def carregar_dados_excel(uploaded_file):
+    conteudo = uploaded_file.getvalue()
     try:
-        xls = pd.ExcelFile(uploaded_file)
-        for nome_aba in xls.sheet_names:
-            try:
-                df_preview = pd.read_excel(
-                    xls, sheet_name=nome_aba, header=None, nrows=15)
-                header_row_index = -1
-                for idx, row in df_preview.iterrows():
-                    row_str = row.astype(str).str.cat(sep=' ').upper()
-                    if "INSTITUIÇÃO" in row_str and "NOME DO CURSO" in row_str and ("CICLO" in row_str or "MATRÍCULA" in row_str):
-                        header_row_index = idx
-                        break
-
-                if header_row_index != -1:
-                    df = pd.read_excel(
-                        xls, sheet_name=nome_aba, skiprows=header_row_index)
-                    df.columns = [' '.join(str(c).split()) for c in df.columns]
-                    df = limpar_padronizar_dataframe(df)
-                    st.success(f"✅ Dados encontrados na aba: **{nome_aba}**")
-                    return df
-            except:
-                continue
-        st.error("❌ Estrutura não encontrada. Envie a planilha Fase 4 da Matriz de Distribuição Orçamentária disponibilizada no sistema.")
-        return None
+        # Mesmo arquivo (mesmo conteúdo) reaproveita a leitura já feita
+        conjunto, nome_aba = cache_planilhas.obter_ou_calcular(
+            chave_conteudo(conteudo), lambda: ler_planilha_outros_ifs(conteudo))
     except Exception as e:
         st.error(f"Erro ao abrir arquivo: {e}")
         return None
+    if conjunto is None:
+        st.error("❌ Estrutura não encontrada. Envie a planilha Fase 4 da Matriz de Distribuição Orçamentária disponibilizada no sistema.")
+        return None
+    st.success(f"✅ Dados encontrados na aba: **{nome_aba}**")
+    return conjunto
 
 
-def interface_selecao_ciclo(df_curso):
-    if df_curso.empty:
-        st.warning("⚠️ Nenhum dado encontrado para este filtro.")
-        return None
+def carregar_varias_planilhas(arquivos):
+    origens = [(a.name, a.getvalue()) for a in arquivos]
+    chave = chave_conteudo("".join(
+        nome + chave_conteudo(conteudo) for nome, conteudo in origens).encode())
 
-    df_temp = df_curso.copy()
-    df_temp['DIC_dt'] = pd.to_datetime(
-        df_temp['DIC'], dayfirst=False, errors='coerce')
-    df_temp = df_temp.sort_values(by='DIC_dt', ascending=False)
+    def ler():
+        barra = st.progress(0.0, text="Lendo planilhas...")
 
-    opcoes_map = {}
-    for idx, row in df_temp.iterrows():
-        dic_str = row['DIC']
-        if pd.notnull(row['DIC_dt']):
-            dic_str = row['DIC_dt'].strftime('%d/%m/%Y')
+        def ao_concluir(concluidas, total, nome):
+            barra.progress(concluidas / total, text=f"{concluidas}/{total} planilhas lidas ({nome})")
 
-        oferta = str(row.get('Tipo de Oferta', 'N/A'))
-        qtm = str(row.get('QTM1P', row.get('QTM', 0)))
+        df, falhas = carregar_planilhas(origens, ao_concluir=ao_concluir)
+        barra.empty()
+        return (ConjuntoDados(df) if df is not None else None), falhas
 
-        if qtm.strip().lower() == 'nan':
-            continue
+    return cache_planilhas.obter_ou_calcular(chave, ler)
 
-        label = f"Início: {dic_str} {'' if str(oferta).upper().strip() in ['NÃO SE APLICA', 'N/A', 'NAN'] else f'| Oferta: {oferta}'} | Matrículas: {
-            qtm}"
-        opcoes_map[idx] = label
+
+def avisar_falhas_esquema(conjunto):
+    if not conjunto.falhas_esquema:
+        return
+    total = sum(len(v) for v in conjunto.falhas_esquema.values())
+    with st.expander(f"⚠️ {total} valores da planilha não puderam ser convertidos"):
+        st.caption("Esses valores foram tratados como vazios no cálculo. Confira a planilha de origem.")
+        st.dataframe(resumo_falhas(conjunto.falhas_esquema), use_container_width=True, hide_index=True)
+
+
+def exibir_qualidade(conjunto, colunas_identificacao, ano=2024):
+    mapa = conjunto.qualidade(ano, metodologia_escolhida())
+    total = int((mapa.to_numpy() != 0).sum())
+    if total == 0:
+        return
+    with st.expander(f"🩺 Qualidade dos dados: {total} ciclo(s) com problemas"):
+        st.caption(f"Regras verificadas em todos os ciclos na carga da base (Apto considerando o ano de {ano}).")
+        resumo = resumo_qualidade(mapa)
+        st.dataframe(resumo[resumo['Ciclos'] > 0], use_container_width=True, hide_index=True)
+
+        regra = st.selectbox("Mostrar ciclos com", ["Qualquer problema"] + [
+            c for c, n in zip(resumo['Regra'], resumo['Ciclos']) if n > 0], key="regra_qualidade")
+        relatorio = relatorio_qualidade(conjunto.df, mapa, colunas_identificacao)
+        if regra != "Qualquer problema":
+            relatorio = relatorio[mascara_regra(mapa, regra)[mapa.to_numpy() != 0]]
+        st.dataframe(relatorio, use_container_width=True, hide_index=True)
+        st.download_button("Baixar relatório (CSV)", relatorio.to_csv(index=False).encode('utf-8'),
+                           file_name="qualidade_dos_dados.csv", mime="text/csv")
+
+
+@medir("interface_selecao_ciclo")
+def interface_selecao_ciclo(df, indice, *filtros, qualidade=None):
+    posicoes, opcoes_map = indice.ciclos(*filtros)
+    if len(posicoes) == 0:
+        st.warning("⚠️ Nenhum dado encontrado para este filtro.")
+        return None
 
     if not opcoes_map:
         st.warning("Nenhum ciclo com matrículas válidas encontrado.")
         return None
+    if len(opcoes_map) < len(posicoes):
+        st.caption(f"ℹ️ {len(posicoes) - len(opcoes_map)} ciclo(s) sem QTM não aparecem na lista. Veja o relatório de qualidade dos dados.")
 
     with st.container():
         st.markdown("Ciclo")
-        indice_selecionado = st.selectbox(
+        posicao_selecionada = st.selectbox(
             "Ciclos encontrados:",
             options=list(opcoes_map.keys()),
             format_func=lambda x: opcoes_map[x],
             label_visibility="collapsed"
         )
-    return df_temp.loc[indice_selecionado]
+    avisar_problemas_ciclo(qualidade, posicao_selecionada)
+    return df.iloc[posicao_selecionada]
+
+
+def avisar_problemas_ciclo(qualidade, posicao):
+    if qualidade is None:
+        return
+    problemas = problemas_do_ciclo(qualidade.iloc[posicao])
+    if problemas:
+        st.warning("⚠️ Problemas nos dados deste ciclo: " + "; ".join(problemas) + ".")
 
 
+def campo_busca_cursos():
+    return st.text_input("🔎 Buscar curso", key="busca_curso",
+                         placeholder="Curso, campus ou oferta (ex.: agropecuaria alegrete integrado)",
+                         help="Aceita nomes sem acento, abreviados ou com pequenos erros de digitação. Deixe em branco para usar os filtros.")
+
+
+@medir("exibir_busca_cursos")
+def exibir_busca_cursos(conjunto, termo, qualidade=None):
+    colunas = colunas_busca(conjunto.df)
+    busca = conjunto.busca(colunas)
+    posicoes, _ = busca.buscar(termo)
+    if len(posicoes) == 0:
+        st.warning("⚠️ Nenhum curso encontrado para esta busca.")
+        return None
+
+    # Curso e campus identificam o resultado; oferta, início e matrículas vêm no rótulo do ciclo
+    identificacao = conjunto.df.iloc[posicoes][colunas[:2]].astype(object)
+    opcoes_map = {
+        int(p): " — ".join(formatar_nome(str(v)) if i else str(v) for i, v in enumerate(valores)) + f" | {rotulo}"
+        for p, valores, rotulo in zip(posicoes, identificacao.itertuples(index=False), busca.rotulos(posicoes))
+    }
+    posicao_selecionada = st.selectbox(
+        f"{len(opcoes_map)} ciclo(s) encontrado(s), dos mais parecidos com a busca:",
+        options=list(opcoes_map.keys()),
+        format_func=lambda x: opcoes_map[x],
+        key="resultado_busca"
+    )
+    avisar_problemas_ciclo(qualidade, posicao_selecionada)
+    return conjunto.df.iloc[posicao_selecionada]
+
+
+@medir("exibir_calculadora_core")
 def exibir_calculadora_core(dados_linha=None, ano_default=2024):
     def_dic = get_val(dados_linha, 'DIC')
     def_dtc = get_val(dados_linha, 'DTC')
-    val_dic = converter_para_data(
-        def_dic) if def_dic else datetime.date.today()
-    val_dtc = converter_para_data(
-        def_dtc) if def_dtc else datetime.date.today()
-    val_chc = int(get_val(dados_linha, 'CHC', 0))
-    val_chmc = int(get_val(dados_linha, 'CHMC', 0))
-    raw_pc = get_val(dados_linha, 'PC', 1.0)
-    try:
-        val_pc = float(str(raw_pc).replace(',', '.'))
-    except:
+    val_dic = converter_para_data(def_dic)
+    val_dtc = converter_para_data(def_dtc)
+    if dados_linha is not None and (val_dic is None or val_dtc is None):
+        st.warning("⚠️ A planilha não traz uma data de início/término válida para este ciclo. Informe as datas abaixo antes de conferir o cálculo.")
+    val_dic = val_dic or datetime.date.today()
+    val_dtc = val_dtc or datetime.date.today()
+    val_chc = int(converter_para_numero(get_val(dados_linha, 'CHC', 0)) or 0)
+    val_chmc = int(converter_para_numero(get_val(dados_linha, 'CHMC', 0)) or 0)
+    val_pc = converter_para_numero(get_val(dados_linha, 'PC', 1.0))
+    if val_pc is None:
+        if dados_linha is not None:
+            st.warning("⚠️ O peso do curso (PC) da planilha está ausente ou inválido. Foi usado 1,0.")
         val_pc = 1.0
     raw_agro = get_val(
         dados_linha, ['Agropecuária', 'AGROPECUÁRIA', 'Curso de Agropecuária'], "Não")
     is_agro_sim = str(raw_agro).strip().upper() in ['SIM', 'S', 'TRUE', '1']
     val_finan = get_val(
         dados_linha, 'Situação de acordo com o tipo de financiamento', "PRESENCIAL")
-    val_qtm = int(get_val(dados_linha, ['QTM1P', 'QTM'], 0))
+    val_qtm = int(converter_para_numero(get_val(dados_linha, ['QTM1P', 'QTM'], 0)) or 0)
     tipo_curso_val = get_val(dados_linha, 'Tipo de Curso', '')
     tipo_oferta_val = get_val(dados_linha, 'Tipo de Oferta', '')
 
@@ -309,8 +345,7 @@ def exibir_calculadora_core(dados_linha=None, ano_default=2024):
             pc = st.number_input(
                 "Peso do Curso (PC)", min_value=0.0, value=val_pc, step=0.1, format="%.2f")
         with col2_2:
-            opt_fin = ["PRESENCIAL",
-                       "EAD FINANCIAMENTO EXTERNO", "EAD PRÓPRIO"]
+            opt_fin = FINANCIAMENTOS
             try:
                 idx_fin = opt_fin.index(val_finan)
             except:
@@ -340,7 +375,8 @@ def exibir_calculadora_core(dados_linha=None, ano_default=2024):
         with col3_3:
             # Cálculo dinâmico para sugestão do CHM
             chm_calculado = calcular_chm(
-                tipo_curso_val, tipo_oferta_val, chc, chmc)
+                tipo_curso_val, tipo_oferta_val, chc, chmc,
+                metodologia_escolhida() or metodologia_do_ano(ano_default))
             chm = st.number_input(
                 "CH Matriz (CHM)", min_value=0, value=int(chm_calculado))
             if dados_linha is not None:
@@ -365,55 +401,28 @@ def exibir_calculadora_core(dados_linha=None, ano_default=2024):
         btn_calcular = st.button(
             "CALCULAR MATRÍCULA TOTAL", type="primary", use_container_width=True)
 
-    if btn_calcular:
-        DIP = datetime.date(ano_periodo, 1, 1)
-        DFP = datetime.date(ano_periodo, 12, 31)
-
-        QTDC = (DTC - DIC).days + 1
-        CHMD = min(chm, chc) / QTDC if QTDC > 0 else 0
-        CHA = CHMD * 365 if QTDC > 365 else chm
-        FECH = CHA / 800 if QTDC > 365 else chc / 800
-
-        # Dias ativos
-        DACP1 = (DFP - DIP).days + 1 if (DIC < DIP and DTC > DFP) else 0
-        DACP2 = (DFP - DIC).days + 1 if (DIC >=
-                                         DIP and DTC > DFP and DIC < DFP) else 0
-        DACP3 = (DTC - DIP).days + 1 if (DIC <
-                                         DIP and DTC <= DFP and DTC >= DIP) else 0
-        DACP4 = (DTC - DIC).days + 1 if (DIC >= DIP and DTC <= DFP) else 0
-        DACP5 = ((DFP - DIP).days + 1) / 2 if (DIC < DIP and DTC < DIP) else 0
-
-        denominador = (DFP - DIP).days + 1
-        FEDA = (DACP1 + DACP2 + DACP3 + DACP4 + DACP5) / \
-            denominador if denominador > 0 else 0
-        FECHDA = FECH * FEDA
-
-        if DACP5 == 0:
-            MECHDA = FECHDA * qtm
-        elif (DIP - DTC).days > 1095:
-            MECHDA = 0
-        else:
-            MECHDA = FECHDA * (qtm / 2)
-
-        MP = MECHDA * pc
-        BA = MP * 0.5 if agropecuaria == "Sim" else 0
+    with st.expander("🎯 Meta de Matrícula Total"):
+        st.caption(
+            "Calcula quanto uma variável precisa valer para atingir a MT desejada, mantidos os demais parâmetros acima.")
+        exibir_meta_mt(DIC, DTC, chc, chm, qtm, pc, agropecuaria == "Sim",
+                       FINANCIAMENTOS.index(tipo_financiamento), ano_periodo, tipo_curso_val)
 
-        MT = 0
-        CMTD80 = 0
-        CMTD25 = 0
-
-        if tipo_financiamento == "PRESENCIAL":
-            MT = MP + BA
-        elif tipo_financiamento == "EAD PRÓPRIO":
-            CMTD80 = MP * 0.80
-            MT = CMTD80
-        elif tipo_financiamento == "EAD FINANCIAMENTO EXTERNO":
-            CMTD25 = MP * 0.25
-            MT = CMTD25
+    if btn_calcular:
+        idx_fin_sel = FINANCIAMENTOS.index(tipo_financiamento)
+        metodologia = metodologia_escolhida() or metodologia_do_ano(ano_periodo)
+        r = calcular_ciclo(DIC, DTC, chc, chm, qtm, pc,
+                           agropecuaria == "Sim", idx_fin_sel, ano_periodo, metodologia)
+        st.caption(f"Metodologia aplicada: {metodologia.portaria}")
+
+        QTDC, CHMD, CHA, FECH = r['QTDC'], r['CHMD'], r['CHA'], r['FECH']
+        DACP1, DACP2, DACP3 = r['DACP1'], r['DACP2'], r['DACP3']
+        DACP4, DACP5 = r['DACP4'], r['DACP5']
+        FEDA, FECHDA, MECHDA = r['FEDA'], r['FECHDA'], r['MECHDA']
+        BA, CMTD80, CMTD25, MT = r['BA'], r['CMTD80'], r['CMTD25'], r['MT']
 
         # Verificação Apto/Jubilado
         raw_apto = get_val(dados_linha, 'Apto', "SIM")
-        is_jubilado = str(raw_apto).strip().upper() == "NÃO"
+        is_jubilado = str(raw_apto).strip().upper() in ("NÃO", "FALSE")
 
         if is_jubilado:
             st.markdown(f"""
@@ -480,6 +489,317 @@ def exibir_calculadora_core(dados_linha=None, ano_default=2024):
                         f"CMTD80 (Fomento próprio vale 80% da presencial): {CMTD80:.2f}")
 
 
+def exibir_meta_mt(DIC, DTC, chc, chm, qtm, pc, is_agro, idx_fin, ano_periodo, tipo_curso):
+    col_m1, col_m2 = st.columns(2)
+    with col_m1:
+        meta = st.number_input("MT desejada", min_value=0.0, value=10.0, step=1.0)
+    with col_m2:
+        variavel = st.selectbox("Variável a calcular", list(SOLUCIONADORES), format_func=lambda x: {
+            'QTM': "Matrículas (QTM)", 'CHC': "CH do Ciclo (CHC)", 'DTC': "Término do Ciclo (DTC)"}[x])
+
+    if meta <= 0:
+        return
+    metodologia = metodologia_escolhida() or metodologia_do_ano(ano_periodo)
+    entradas = entradas_ciclo(
+        DIC, DTC, chc, chm, qtm, pc, is_agro, idx_fin,
+        chm_segue_chc=str(tipo_curso).upper() in metodologia.tipos_chm_igual_chc)
+    r = SOLUCIONADORES[variavel](entradas, meta, ano_periodo, metodologia).iloc[0]
+
+    if not r['VIAVEL']:
+        st.warning(
+            f"⚠️ Não é possível atingir {meta:.2f} matrícula(s) total(is) em {ano_periodo} alterando apenas essa variável.")
+    elif variavel == 'QTM':
+        st.success(
+            f"São necessárias **{int(r['QTM_NECESSARIO'])}** matrículas (MT obtida: {r['MT_OBTIDA']:.2f}).")
+    elif variavel == 'CHC':
+        st.success(
+            f"É necessária CH do ciclo de **{int(r['CHC_NECESSARIA'])}h** (MT obtida: {r['MT_OBTIDA']:.2f}).")
+    else:
+        st.success(
+            f"O ciclo precisa terminar em **{r['DTC_NECESSARIA'].strftime('%d/%m/%Y')}**, com {int(r['DURACAO_NECESSARIA'])} dias (MT obtida: {r['MT_OBTIDA']:.2f}).")
+
+
+def exibir_projecao(conjunto, colunas_grupo):
+    col_p1, col_p2 = st.columns(2)
+    with col_p1:
+        faixa_anos = st.slider("Anos de análise", ANOS_PADRAO[0], ANOS_PADRAO[-1],
+                               (ANOS_PADRAO[0], ANOS_PADRAO[-1]))
+    with col_p2:
+        opcoes_grupo = [c for c in colunas_grupo if c in conjunto.df.columns]
+        grupo = st.selectbox("Agrupar por", opcoes_grupo + ["Total"], key="grupo_projecao")
+
+    anos = range(faixa_anos[0], faixa_anos[1] + 1)
+    matriz = conjunto.projecao(ANOS_PADRAO, metodologia_escolhida())[list(anos)]
+    tabela = agregar_projecao(matriz, conjunto.df, [] if grupo == "Total" else grupo)
+    tabela.columns = [str(a) for a in tabela.columns]
+
+    st.line_chart(tabela.T)
+    st.dataframe(tabela.style.format("{:.2f}"), use_container_width=True)
+
+
+def exibir_painel(conjunto, dimensoes, colunas_identificacao):
+    col_d1, col_d2 = st.columns(2)
+    with col_d1:
+        ano_painel = st.number_input("Ano de análise", value=2024, step=1,
+                                     format="%d", key="ano_painel")
+    painel = conjunto.painel(int(ano_painel), dimensoes, metodologia_escolhida())
+    with col_d2:
+        dimensao = st.selectbox("Agrupar por", painel.dimensoes, key="dimensao_painel")
+
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("MT total", f"{painel.totais['MT']:.2f}")
+    m2.metric("MECHDA total", f"{painel.totais['MECHDA']:.2f}")
+    m3.metric("BA total", f"{painel.totais['BA']:.2f}")
+    m4.metric("Ciclos", painel.total_ciclos)
+
+    tabela = painel.agregados[dimensao]
+    st.bar_chart(tabela[METRICAS_PAINEL])
+    st.dataframe(tabela.style.format({m: "{:.2f}" for m in METRICAS_PAINEL}),
+                 use_container_width=True)
+
+    st.write("**Ciclos que mais contribuem:**")
+    col_g1, col_g2 = st.columns([3, 1])
+    with col_g1:
+        grupo = st.selectbox(dimensao, tabela.index.tolist(), key="grupo_painel")
+    with col_g2:
+        quantidade = st.number_input("Quantidade", min_value=1, value=10, step=5)
+    st.dataframe(painel.ciclos_principais(dimensao, grupo, int(quantidade), colunas_identificacao),
+                 use_container_width=True, hide_index=True)
+
+
+def obter_simulacao(conjunto, ano, dimensao):
+    # Uma simulação por sessão; recomeça se a base, o ano, a metodologia ou o agrupamento mudar
+    metodologia = metodologia_escolhida() or metodologia_do_ano(ano)
+    chave = (id(conjunto), conjunto.versao, ano, metodologia.versao, dimensao)
+    if st.session_state.get('chave_simulacao') != chave:
+        st.session_state['simulacao'] = SimulacaoEdicao(
+            conjunto.df, conjunto.entradas(metodologia), conjunto.resultado(ano, metodologia),
+            ano, dimensao, metodologia)
+        st.session_state['chave_simulacao'] = chave
+    return st.session_state['simulacao']
+
+
+def exibir_simulacao(conjunto, posicoes, dimensao, colunas_identificacao, grupo_sel=None):
+    col_s1, col_s2 = st.columns([1, 3])
+    with col_s1:
+        ano_simulacao = st.number_input("Ano de análise", value=2024, step=1,
+                                        format="%d", key="ano_simulacao")
+    simulacao = obter_simulacao(conjunto, int(ano_simulacao), dimensao)
+
+    if len(posicoes) == 0:
+        st.info("Selecione um filtro com ciclos para editar.")
+    else:
+        colunas = [c for c in colunas_identificacao if c in conjunto.df.columns]
+        grade = conjunto.df.iloc[posicoes][colunas].reset_index(drop=True)
+        grade[COLUNAS_EDITAVEIS] = simulacao.valores(posicoes)
+        editada = st.data_editor(
+            grade, disabled=colunas, hide_index=True, use_container_width=True,
+            column_config={
+                'DIC': st.column_config.DateColumn("DIC", format="DD/MM/YYYY"),
+                'DTC': st.column_config.DateColumn("DTC", format="DD/MM/YYYY"),
+                'CHC': st.column_config.NumberColumn("CHC", min_value=0, step=1),
+                'CHM': st.column_config.NumberColumn("CHM", min_value=0, step=1),
+                'QTM': st.column_config.NumberColumn("QTM", min_value=0, step=1),
+            })
+        simulacao.aplicar(posicoes, editada[COLUNAS_EDITAVEIS])
+        st.caption("Em cursos FIC e doutorados, a CHM acompanha a CHC editada.")
+
+    m1, m2 = st.columns(2)
+    m1.metric("MT da instituição", f"{simulacao.total:.2f}",
+              f"{simulacao.total - simulacao.total_original:+.2f}")
+    if grupo_sel:
+        total_grupo, original_grupo = simulacao.total_grupo(grupo_sel)
+        m2.metric(f"MT de {formatar_nome(grupo_sel)}", f"{total_grupo:.2f}",
+                  f"{total_grupo - original_grupo:+.2f}")
+
+    alterados = simulacao.ciclos_alterados()
+    if len(alterados):
+        st.write("**Ciclos alterados:**")
+        colunas = [c for c in colunas_identificacao if c in conjunto.df.columns]
+        st.dataframe(pd.concat([conjunto.df.iloc[alterados.index][colunas].reset_index(drop=True),
+                                alterados.reset_index(drop=True)], axis=1)
+                     .style.format({c: "{:.2f}" for c in alterados.columns}),
+                     use_container_width=True, hide_index=True)
+        resumo = simulacao.resumo_grupos()
+        st.dataframe(resumo[resumo['Diferença'].abs() > 1e-9].style.format("{:.2f}"),
+                     use_container_width=True)
+        if st.button("Desfazer alterações", key="desfazer_simulacao"):
+            simulacao.restaurar()
+            st.rerun()
+
+
+def exibir_exportacao(conjunto, posicoes_filtro):
+    col_e1, col_e2, col_e3 = st.columns(3)
+    with col_e1:
+        escopo = st.radio("Ciclos", ["Filtro atual", "Base inteira"], horizontal=True,
+                          key="escopo_exportacao")
+    with col_e2:
+        formato = st.selectbox("Formato", ["xlsx", "csv", "parquet"], key="formato_exportacao")
+    with col_e3:
+        ano_exportacao = st.number_input("Ano de análise", value=2024, step=1,
+                                         format="%d", key="ano_exportacao")
+
+    df = conjunto.df if escopo == "Base inteira" else conjunto.df.iloc[posicoes_filtro]
+    st.caption(f"{len(df)} ciclos serão exportados, com todas as variáveis intermediárias.")
+    if st.button("Gerar arquivo", disabled=len(df) == 0, key="gerar_exportacao"):
+        with st.spinner("Calculando e gravando..."):
+            caminho = exportar_para_temporario(df, formato, int(ano_exportacao), metodologia_escolhida())
+        try:
+            with open(caminho, "rb") as arquivo:
+                st.download_button(f"Baixar resultados ({formato})", arquivo,
+                                   file_name=f"matriculas_totais_{int(ano_exportacao)}.{formato}",
+                                   mime=TIPOS_MIME[formato])
+        finally:
+            os.remove(caminho)
+
+
+def exibir_auditoria(conjunto, colunas_identificacao):
+    df = conjunto.df
+    etapas = [e for e in ETAPAS_AUDITORIA if e in df.columns]
+    if not etapas:
+        st.warning("A planilha não traz as colunas calculadas (QTDC ... MT) para conferência.")
+        return
+
+    col_a1, col_a2 = st.columns(2)
+    with col_a1:
+        ano_auditoria = st.number_input("Ano de análise", value=ano_da_planilha(df),
+                                        step=1, format="%d", key="ano_auditoria")
+    with col_a2:
+        tolerancia = st.number_input("Tolerância (diferença absoluta)", min_value=0.0,
+                                     value=TOLERANCIA_PADRAO, step=0.01, format="%.4f")
+
+    metodologia = metodologia_escolhida()
+    auditoria = auditar_planilha(df, int(ano_auditoria), tolerancia,
+                                 resultado=conjunto.resultado(int(ano_auditoria), metodologia),
+                                 metodologia=metodologia)
+    divergentes = divergencias(auditoria)
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Ciclos conferidos", len(auditoria))
+    m2.metric("Ciclos divergentes", len(divergentes))
+    m3.metric("Etapas conferidas", len(etapas))
+
+    if divergentes.empty:
+        st.success("Todos os valores da planilha conferem com o recálculo.")
+        return
+
+    st.write("**Primeira etapa divergente:**")
+    st.dataframe(resumo_auditoria(auditoria), use_container_width=True)
+
+    colunas_id = [c for c in colunas_identificacao if c in df.columns]
+    relatorio = pd.concat([df.loc[divergentes.index, colunas_id], divergentes], axis=1)
+    st.dataframe(relatorio, use_container_width=True, hide_index=True)
+    st.download_button("Baixar relatório de auditoria (CSV)",
+                       relatorio.to_csv(index=False).encode("utf-8"),
+                       file_name=f"auditoria_mt{int(ano_auditoria)}.csv", mime="text/csv")
+
+
+def exibir_alteracoes_base(snapshot):
+    registros = snapshot.alteracoes()
+    if not registros:
+        st.info("Nenhuma alteração registrada desde a criação do snapshot local.")
+        return
+    st.dataframe(pd.DataFrame([{
+        'Data': r['data'], 'Inseridos': r['inseridas'], 'Alterados': r['alteradas'],
+        'Removidos': r['removidas'], f"Variação da MT ({r['ano']})": r['delta_mt'],
+    } for r in registros]), use_container_width=True, hide_index=True)
+
+    st.write(f"**Ciclos afetados na atualização de {registros[0]['data']}:**")
+    st.dataframe(pd.DataFrame(registros[0]['ciclos']), use_container_width=True, hide_index=True)
+
+
+def ler_lista_numeros(texto):
+    return [int(v) for v in str(texto).replace(';', ',').split(',') if v.strip()]
+
+
+def exibir_varredura_cenarios(dados_linha=None, ano_default=2026):
+    import altair as alt
+
+    val_chmc = int(converter_para_numero(get_val(dados_linha, 'CHMC', 0)) or 0)
+    val_pc = converter_para_numero(get_val(dados_linha, 'PC', 1.0))
+    if val_pc is None:
+        val_pc = 1.0
+    raw_agro = get_val(
+        dados_linha, ['Agropecuária', 'AGROPECUÁRIA', 'Curso de Agropecuária'], "Não")
+    is_agro_sim = str(raw_agro).strip().upper() in ['SIM', 'S', 'TRUE', '1']
+
+    with st.container(border=True):
+        st.markdown("#### Faixas de Parâmetros")
+
+        col1_1, col1_2 = st.columns(2)
+        with col1_1:
+            faixa_qtm = st.slider("Matrículas (QTM)", 1, 100, (10, 40))
+            passo_qtm = st.number_input("Passo de QTM", min_value=1, value=1)
+        with col1_2:
+            txt_chc = st.text_input(
+                "CH Ciclo (CHC), separadas por vírgula", f"{val_chmc or 800}, 1000, 1200")
+            txt_dur = st.text_input(
+                "Duração do ciclo em dias, separadas por vírgula", "365, 730, 1095")
+
+        col2_1, col2_2, col2_3 = st.columns(3)
+        with col2_1:
+            inicio_dic = st.date_input("Primeiro início (DIC)", datetime.date(
+                ano_default - 2, 1, 1), format="DD/MM/YYYY")
+        with col2_2:
+            fim_dic = st.date_input("Último início (DIC)", datetime.date(
+                ano_default, 12, 31), format="DD/MM/YYYY")
+        with col2_3:
+            passo_dic = st.number_input("Passo entre inícios (dias)", min_value=1, value=30)
+
+        col3_1, col3_2 = st.columns(2)
+        with col3_1:
+            financiamentos = st.multiselect(
+                "Financiamento", FINANCIAMENTOS, default=FINANCIAMENTOS)
+        with col3_2:
+            lista_anos = list(range(2020, 2031))
+            ano_periodo = st.selectbox(
+                "Ano de Análise", lista_anos, key="ano_varredura",
+                index=lista_anos.index(ano_default) if ano_default in lista_anos else 0)
+
+        col4_1, col4_2 = st.columns(2)
+        with col4_1:
+            eixo_x = st.selectbox("Eixo horizontal", EIXOS, index=0)
+        with col4_2:
+            eixo_y = st.selectbox("Eixo vertical", EIXOS, index=1)
+
+    try:
+        valores_chc = ler_lista_numeros(txt_chc)
+        valores_dur = ler_lista_numeros(txt_dur)
+    except ValueError:
+        st.error("⚠️ Informe CHC e durações como números separados por vírgula.")
+        return
+    if not (valores_chc and valores_dur and financiamentos) or fim_dic < inicio_dic:
+        st.warning("Preencha todas as faixas para gerar os cenários.")
+        return
+
+    tabela = varredura_cenarios(
+        qtm=range(faixa_qtm[0], faixa_qtm[1] + 1, passo_qtm),
+        chc=valores_chc,
+        dic=np.arange(np.datetime64(inicio_dic), np.datetime64(fim_dic) + 1, passo_dic),
+        duracoes=valores_dur,
+        financiamentos=financiamentos,
+        chmc=val_chmc, pc=val_pc, agro=is_agro_sim, ano=ano_periodo,
+        metodologia=metodologia_escolhida(),
+        tipo_curso=get_val(dados_linha, 'Tipo de Curso', ''),
+        tipo_oferta=get_val(dados_linha, 'Tipo de Oferta', ''))
+
+    st.caption(f"{len(tabela):,} cenários calculados.".replace(",", "."))
+
+    if eixo_x != eixo_y:
+        calor = matriz_calor(tabela, eixo_x, eixo_y)
+        grafico = alt.Chart(calor).mark_rect().encode(
+            x=alt.X(f"{eixo_x}:O"),
+            y=alt.Y(f"{eixo_y}:O"),
+            color=alt.Color("MT:Q", title="MT média"),
+            tooltip=[eixo_x, eixo_y, alt.Tooltip("MT:Q", format=".2f")]
+        )
+        st.altair_chart(grafico, use_container_width=True)
+
+    st.dataframe(tabela.head(10000), use_container_width=True, hide_index=True)
+    st.download_button("Baixar cenários (CSV)", tabela.to_csv(index=False).encode("utf-8"),
+                       file_name="cenarios_mt.csv", mime="text/csv")
+
+
 st.write("Esta ferramenta foi desenvolvida baseada na [Portaria MEC nº 646, de 25 de agosto de 2022](https://www.in.gov.br/web/dou/-/portaria-n-646-de-25-de-agosto-de-2022-425194865), que estabelece a metodologia da Matriz de Distribuição Orçamentária dos Institutos Federais. Os dados são calculados a partir das fórmulas da planilha 'Fase 4', que é disponibilizada para os Institutos Federais. Assim, é possível verificar quanto cada matrícula contribui no cálculo de matrículas totais, bem como simular outros cenários.")
 st.write("Selecione uma das opções para iniciar:")
 
@@ -507,57 +827,90 @@ if st.session_state['modo'] == 'iffar':
     st.markdown("## Matrículas do IFFarroupilha")
     st.markdown(
         "##### Dados da PNP Ano Base 2024 que foram usados pela MDO 2026")
-    st.info("Escolha um campus, tipo de curso, nome do curso e qual ciclo deseja conferir os dados.")
+    st.info("Busque o curso pelo nome (ou escolha campus, tipo de curso e nome do curso) e o ciclo que deseja conferir.")
     st.write("")
 
     try:
-        df = carregar_dados_gsheets()
-
-        c1, c2 = st.columns(2)
-
-        with c1:
-            lista_campus = sorted(df['Unidade de Ensino'].unique().tolist())
-
-            campus_sel = st.selectbox(
-                "1. Campus",
-                options=[""] + lista_campus,
-                format_func=lambda x: "Selecione..." if x == "" else formatar_nome(
-                    x)
-            )
+        base = carregar_base_iffar()
+        indice = base.indice(NIVEIS_IFFAR)
+        avisar_falhas_esquema(base)
+        exibir_qualidade(base, ['Unidade de Ensino', 'Tipo de Curso', 'Nome do curso', 'Tipo de Oferta', 'DIC', 'DTC'])
+
+        campus_sel = tipo_sel = curso_sel = ""
+        termo_busca = campo_busca_cursos()
+        if termo_busca.strip():
+            linha_selecionada = exibir_busca_cursos(
+                base, termo_busca, qualidade=base.qualidade(2024, metodologia_escolhida()))
+            if linha_selecionada is not None:
+                exibir_calculadora_core(linha_selecionada)
+        else:
+            c1, c2 = st.columns(2)
 
-        # Só prossegue se um campus foi selecionado
-        if campus_sel:
-            df_c = df[df['Unidade de Ensino'] == campus_sel]
+            with c1:
+                lista_campus = indice.opcoes()
 
-            with c2:
-                lista_tipos = sorted(df_c['Tipo de Curso'].unique().tolist())
-                tipo_sel = st.selectbox(
-                    "2. Tipo de Curso",
-                    options=[""] + lista_tipos,
+                campus_sel = st.selectbox(
+                    "1. Campus",
+                    options=[""] + lista_campus,
                     format_func=lambda x: "Selecione..." if x == "" else formatar_nome(
                         x)
                 )
 
-            # Só prossegue se um tipo de curso foi selecionado
-            if tipo_sel:
-                df_t = df_c[df_c['Tipo de Curso'] == tipo_sel]
+            # Só prossegue se um campus foi selecionado
+            if campus_sel:
+                with c2:
+                    lista_tipos = indice.opcoes(campus_sel)
+                    tipo_sel = st.selectbox(
+                        "2. Tipo de Curso",
+                        options=[""] + lista_tipos,
+                        format_func=lambda x: "Selecione..." if x == "" else formatar_nome(
+                            x)
+                    )
+
+                # Só prossegue se um tipo de curso foi selecionado
+                if tipo_sel:
+                    lista_cursos = indice.opcoes(campus_sel, tipo_sel)
+                    curso_sel = st.selectbox(
+                        "3. Curso",
+                        options=[""] + lista_cursos,
+                        format_func=lambda x: "Selecione..." if x == "" else x
+                    )
+
+                    # Só exibe o cálculo se o curso final foi selecionado
+                    if curso_sel:
+                        linha_selecionada = interface_selecao_ciclo(
+                            base.df, indice, campus_sel, tipo_sel, curso_sel,
+                            qualidade=base.qualidade(2024, metodologia_escolhida()))
 
-                lista_cursos = sorted(
-                    df_t['Nome_Padronizado'].unique().tolist())
-                curso_sel = st.selectbox(
-                    "3. Curso",
-                    options=[""] + lista_cursos,
-                    format_func=lambda x: "Selecione..." if x == "" else x
-                )
+                        if linha_selecionada is not None:
+                            exibir_calculadora_core(linha_selecionada)
+
+        st.write("")
+        with st.expander("✏️ Simulação de alterações em lote"):
+            st.caption("Edite QTM, CH ou datas dos ciclos do filtro atual e acompanhe a MT do campus e da instituição.")
+            posicoes_sim = list(indice.ciclos(campus_sel, tipo_sel, curso_sel)[1]) if campus_sel else []
+            exibir_simulacao(base, posicoes_sim, 'Unidade de Ensino',
+                             ['Tipo de Curso', 'Nome do curso', 'Tipo de Oferta'], campus_sel)
 
-                # Só exibe o cálculo se o curso final foi selecionado
-                if curso_sel:
-                    df_final = df_t[df_t['Nome_Padronizado'] == curso_sel]
+        with st.expander("⬇️ Exportar resultados"):
+            exibir_exportacao(base, indice.posicoes(campus_sel, tipo_sel, curso_sel))
 
-                    linha_selecionada = interface_selecao_ciclo(df_final)
+        with st.expander("🏛️ Painel institucional"):
+            st.caption("Totais de MT, MECHDA e BA de todos os ciclos da base, por grupo.")
+            exibir_painel(base, ['Unidade de Ensino', 'Tipo de Curso', 'Tipo de Oferta'],
+                          ['Unidade de Ensino', 'Tipo de Curso', 'Nome do curso', 'DIC', 'DTC'])
 
-                    if linha_selecionada is not None:
-                        exibir_calculadora_core(linha_selecionada)
+        with st.expander("📈 Projeção plurianual da Matrícula Total"):
+            st.caption("MT de todos os ciclos em cada ano de análise, considerando o término e o jubilamento dos ciclos.")
+            exibir_projecao(base, ['Unidade de Ensino', 'Tipo de Curso', 'Tipo de Oferta'])
+
+        with st.expander("🧾 Auditoria da planilha"):
+            st.caption("Recalcula todos os ciclos e compara cada etapa com os valores da própria planilha.")
+            exibir_auditoria(base, ['Unidade de Ensino', 'Tipo de Curso', 'Nome do curso', 'DIC', 'DTC'])
+
+        with st.expander("🕑 Alterações recentes na base"):
+            st.caption("A cada atualização, só os ciclos inseridos, alterados ou removidos na planilha são recalculados.")
+            exibir_alteracoes_base(obter_base_iffar())
 
     except Exception as e:
         st.error(
@@ -572,16 +925,14 @@ elif st.session_state['modo'] == 'excel':
 
     if arq:
         try:
-            df_up = carregar_dados_excel(arq)
-
-            if df_up is not None:
-                mapa_auxiliar = {
-                    'Unidade de Ensino': 'Campus',
-                    'Unidade': 'Campus',
-                    'Tipo Curso': 'Tipo de Curso'
-                }
-                df_up = df_up.rename(columns=mapa_auxiliar)
-
+            conjunto_up = carregar_dados_excel(arq)
+
+            if conjunto_up is not None:
+                avisar_falhas_esquema(conjunto_up)
+                ano_up = ano_da_planilha(conjunto_up.df)
+                exibir_qualidade(conjunto_up, ['Campus', 'Tipo de Curso', 'Nome do curso', 'Tipo de Oferta', 'DIC', 'DTC'],
+                                 ano_up)
+                df_up = conjunto_up.df
                 cols_existentes = df_up.columns
 
                 col_nome_real = None
@@ -600,73 +951,94 @@ elif st.session_state['modo'] == 'excel':
                 tem_tipo = 'Tipo de Curso' in cols_existentes
 
                 if col_nome_real:
+                    niveis = [c for c, tem in [('Campus', tem_campus), ('Tipo de Curso', tem_tipo)] if tem]
+                    indice = conjunto_up.indice(niveis + [col_nome_real])
+
                     st.divider()
                     st.markdown("#### 🔍 Filtros de Seleção")
 
-                    col_f1, col_f2, col_f3 = st.columns(3)
-
-                    campus_sel = None
-                    with col_f1:
-                        if tem_campus:
-                            lista_campus = sorted(
-                                df_up['Campus'].astype(str).unique())
-                            campus_sel = st.selectbox(
-                                "Campus", [""] + lista_campus)
-                        else:
-                            st.warning(
-                                "Coluna 'Campus'/Unidade não identificada.")
-
-                    tipo_sel = None
-                    with col_f2:
-                        if tem_tipo:
-                            # Filtra opções baseado no campus (se selecionado)
-                            df_temp = df_up[df_up['Campus'] ==
-                                            campus_sel] if campus_sel else df_up
-                            lista_tipos = sorted(
-                                df_temp['Tipo de Curso'].astype(str).unique())
-                            tipo_sel = st.selectbox(
-                                "Tipo de Curso", [""] + lista_tipos)
-                        else:
-                            st.warning(
-                                "Coluna 'Tipo de Curso' não identificada.")
-
-                    curso_sel = None
-                    with col_f3:
-                        # Aplica os filtros em cascata
-                        df_filtrado = df_up.copy()
-                        if campus_sel:
-                            df_filtrado = df_filtrado[df_filtrado['Campus']
-                                                      == campus_sel]
-                        if tipo_sel:
-                            df_filtrado = df_filtrado[df_filtrado['Tipo de Curso'] == tipo_sel]
-
-                        # Carrega a lista usando a coluna original encontrada
-                        lista_cursos = sorted(
-                            df_filtrado[col_nome_real].astype(str).unique())
-
-                        # Exibe o selectbox com o label correto da coluna
-                        label_filtro = f"Selecionar {col_nome_real}"
-                        curso_sel = st.selectbox(
-                            label_filtro, [""] + lista_cursos)
-
-                    if curso_sel:
-
-                        df_final = df_up[df_up[col_nome_real] == curso_sel]
-
-                        # Reforça filtros de consistência
-                        if campus_sel:
-                            df_final = df_final[df_final['Campus']
-                                                == campus_sel]
-                        if tipo_sel:
-                            df_final = df_final[df_final['Tipo de Curso']
-                                                == tipo_sel]
-
-                        st.markdown("---")
-                        # Passa para a tabela de seleção
-                        linha_selecionada = interface_selecao_ciclo(df_final)
-
+                    # Valores escolhidos em cada nível do índice (campus, tipo); vazios durante a busca
+                    filtros = [""] * len(niveis)
+                    curso_sel = ""
+                    termo_busca = campo_busca_cursos()
+                    if termo_busca.strip():
+                        linha_selecionada = exibir_busca_cursos(
+                            conjunto_up, termo_busca,
+                            qualidade=conjunto_up.qualidade(ano_up, metodologia_escolhida()))
                         if linha_selecionada is not None:
                             exibir_calculadora_core(linha_selecionada)
+                    else:
+                        col_f1, col_f2, col_f3 = st.columns(3)
+
+                        filtros = []
+
+                        with col_f1:
+                            if tem_campus:
+                                lista_campus = indice.opcoes()
+                                campus_sel = st.selectbox(
+                                    "Campus", [""] + lista_campus)
+                                filtros.append(campus_sel)
+                            else:
+                                st.warning(
+                                    "Coluna 'Campus'/Unidade não identificada.")
+
+                        with col_f2:
+                            if tem_tipo:
+                                # Opções dependem do campus (se selecionado)
+                                lista_tipos = indice.opcoes(*filtros)
+                                tipo_sel = st.selectbox(
+                                    "Tipo de Curso", [""] + lista_tipos)
+                                filtros.append(tipo_sel)
+                            else:
+                                st.warning(
+                                    "Coluna 'Tipo de Curso' não identificada.")
+
+                        with col_f3:
+                            # Carrega a lista usando a coluna original encontrada
+                            lista_cursos = indice.opcoes(*filtros)
+
+                            # Exibe o selectbox com o label correto da coluna
+                            label_filtro = f"Selecionar {col_nome_real}"
+                            curso_sel = st.selectbox(
+                                label_filtro, [""] + lista_cursos)
+
+                        if curso_sel:
+                            st.markdown("---")
+                            # Passa para a tabela de seleção
+                            linha_selecionada = interface_selecao_ciclo(
+                                df_up, indice, *filtros, curso_sel,
+                                qualidade=conjunto_up.qualidade(ano_up, metodologia_escolhida()))
+
+                            if linha_selecionada is not None:
+                                exibir_calculadora_core(linha_selecionada)
+
+                    st.write("")
+                    with st.expander("✏️ Simulação de alterações em lote"):
+                        st.caption("Edite QTM, CH ou datas dos ciclos do filtro atual e acompanhe a MT do campus e da instituição.")
+                        campus_up = filtros[0] if tem_campus and filtros else ""
+                        # Como no modo IFFar, a grade só aparece com um campus escolhido
+                        # (sem coluna de campus, com um curso escolhido)
+                        selecionado = campus_up if tem_campus else curso_sel
+                        posicoes_sim = list(indice.ciclos(*filtros, curso_sel)[1]) if selecionado else []
+                        exibir_simulacao(conjunto_up, posicoes_sim, 'Campus',
+                                         ['Campus', 'Tipo de Curso', col_nome_real, 'Tipo de Oferta'],
+                                         campus_up or None)
+
+                    with st.expander("⬇️ Exportar resultados"):
+                        exibir_exportacao(conjunto_up, indice.posicoes(*filtros, curso_sel))
+
+                    with st.expander("🏛️ Painel institucional"):
+                        st.caption("Totais de MT, MECHDA e BA de todos os ciclos da planilha, por grupo.")
+                        exibir_painel(conjunto_up, ['Campus', 'Tipo de Curso', 'Tipo de Oferta'],
+                                      ['Campus', 'Tipo de Curso', col_nome_real, 'DIC', 'DTC'])
+
+                    with st.expander("📈 Projeção plurianual da Matrícula Total"):
+                        st.caption("MT de todos os ciclos em cada ano de análise, considerando o término e o jubilamento dos ciclos.")
+                        exibir_projecao(conjunto_up, ['Campus', 'Tipo de Curso', 'Tipo de Oferta'])
+
+                    with st.expander("🧾 Auditoria da planilha"):
+                        st.caption("Recalcula todos os ciclos e compara cada etapa com os valores da própria planilha.")
+                        exibir_auditoria(conjunto_up, ['Campus', 'Tipo de Curso', col_nome_real, 'DIC', 'DTC'])
                 else:
                     st.error(
                         "⚠️ Não foi encontrada uma coluna contendo 'Nome' e 'Curso'. Verifique o cabeçalho da planilha.")
@@ -676,6 +1048,22 @@ elif st.session_state['modo'] == 'excel':
             st.error("Erro ao processar o arquivo.")
             st.error(e)
 
+    st.write("")
+    with st.expander("📚 Comparar várias planilhas (IFs e anos base)"):
+        st.caption("Cada planilha é lida em paralelo. O ano base vem do nome do arquivo (ex.: IFFar_2023.xlsx) ou da coluna DIP.")
+        arquivos = st.file_uploader("Selecione os arquivos", type=["xlsx"],
+                                    accept_multiple_files=True, key="arquivos_comparacao")
+        if arquivos:
+            conjunto_multi, falhas = carregar_varias_planilhas(arquivos)
+            for nome, erro in falhas.items():
+                st.error(f"❌ {nome}: {erro}")
+            if conjunto_multi is not None:
+                tabela = comparativo_mt(conjunto_multi.df)
+                st.success(f"✅ {len(arquivos) - len(falhas)} planilhas, {len(conjunto_multi.df)} ciclos.")
+                st.dataframe(tabela['MT'].unstack(COL_ANO_BASE).style.format("{:.2f}"),
+                             use_container_width=True)
+                st.dataframe(tabela.reset_index(), use_container_width=True, hide_index=True)
+
 
 elif st.session_state['modo'] == 'manual':
     st.markdown("### ✏️ Simulação Manual")
@@ -687,23 +1075,22 @@ elif st.session_state['modo'] == 'manual':
     with st.expander("📂 Carregar base de dados de curso existente", expanded=True):
         try:
             # Carrega dados para popular os selects
-            df = carregar_dados_gsheets()
+            base = carregar_base_iffar()
+            df = base.df
+            indice = base.indice(NIVEIS_MANUAL)
 
             c_filtro1, c_filtro2, c_filtro3 = st.columns(3)
 
             with c_filtro1:
                 # 1. Filtro Tipo de Curso
-                lista_tipos = sorted(df['Tipo de Curso'].astype(str).unique())
+                lista_tipos = indice.opcoes()
                 tipo_sel = st.selectbox("Tipo de Curso", [""] + lista_tipos)
 
             with c_filtro2:
                 # 2. Filtro Tipo de Oferta (Aparece dinamicamente se for Técnico)
                 oferta_sel = None
                 if tipo_sel and "TECNICO" in tipo_sel.upper():
-                    # Filtra o DF pelo tipo para ver as ofertas disponíveis
-                    df_tipo = df[df['Tipo de Curso'] == tipo_sel]
-                    lista_ofertas = sorted(
-                        df_tipo['Tipo de Oferta'].astype(str).unique())
+                    lista_ofertas = indice.opcoes(tipo_sel)
                     oferta_sel = st.selectbox(
                         "Tipo de Oferta", [""] + lista_ofertas)
                 else:
@@ -712,16 +1099,8 @@ elif st.session_state['modo'] == 'manual':
             with c_filtro3:
                 lista_cursos = []
                 if tipo_sel:
-                    # Começa filtrando pelo tipo
-                    df_filtrado = df[df['Tipo de Curso'] == tipo_sel]
-
-                    # Se tiver oferta selecionada (caso dos técnicos), filtra também pela oferta
-                    if oferta_sel:
-                        df_filtrado = df_filtrado[df_filtrado['Tipo de Oferta']
-                                                  == oferta_sel]
-
-                    lista_cursos = sorted(
-                        df_filtrado['Nome_Padronizado'].unique())
+                    # Cursos do tipo e, no caso dos técnicos, da oferta escolhida
+                    lista_cursos = indice.opcoes(tipo_sel, oferta_sel)
                     curso_base_sel = st.selectbox(
                         "Nome do Curso", [""] + lista_cursos)
                 else:
@@ -730,11 +1109,8 @@ elif st.session_state['modo'] == 'manual':
 
             if curso_base_sel:
 
-                df_final_busca = df[df['Nome_Padronizado'] == curso_base_sel]
-                if oferta_sel:
-                    df_final_busca = df_final_busca[df_final_busca['Tipo de Oferta'] == oferta_sel]
-
-                linha_base = df_final_busca.iloc[0].copy()
+                posicoes_busca = indice.posicoes(None, oferta_sel, curso_base_sel)
+                linha_base = df.iloc[posicoes_busca[0]].copy()
 
                 linha_base['DIC'] = datetime.date(2026, 2, 19)
                 linha_base['DTC'] = datetime.date(2026, 2, 19)
@@ -754,9 +1130,25 @@ elif st.session_state['modo'] == 'manual':
                 "Não foi possível carregar a base de dados. Simule os valores digitando manualmente.")
     exibir_calculadora_core(linha_simulacao, ano_default=2026)
 
+    with st.expander("📊 Varredura de cenários"):
+        st.info("Calcula a MT para todas as combinações das faixas abaixo, usando o peso e a carga horária do curso carregado.")
+        exibir_varredura_cenarios(linha_simulacao, ano_default=2026)
+
 
 st.markdown("""
     <div style="text-align: center; color: #666; font-size: 0.8em;">
         © 2025 | Diretoria de Planejamento e Desenvolvimento Institucional do IFFarroupilha - dpdi@iffarroupilha.edu.br
     </div>
 """, unsafe_allow_html=True)
+
+# Painel de depuração (CALCMT_INSTRUMENTACAO=1 e ?debug=1 na URL)
+if INSTRUMENTACAO_ATIVA and st.query_params.get("debug") == "1":
+    with st.sidebar.expander("🛠️ Depuração: etapas desta execução", expanded=True):
+        registros = registros_execucao()
+        if registros:
+            tabela_etapas = pd.DataFrame(registros)[["etapa", "segundos", "cache", "memoria_bytes", "erro"]]
+            tabela_etapas["memoria_mb"] = tabela_etapas.pop("memoria_bytes") / 1024 / 1024
+            st.dataframe(tabela_etapas, hide_index=True, use_container_width=True)
+            st.caption(f"Total medido: {tabela_etapas['segundos'].sum():.3f} s")
+        else:
+            st.caption("Nenhuma etapa medida nesta execução.")
@@ -0,0 +1,175 @@
+import datetime
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from carregamento import padronizar_colunas, remover_acentos
+
+# =======================================================
+# ATUALIZAÇÃO INCREMENTAL DA BASE
+# Cada linha da fonte recebe uma impressão: a chave do ciclo (instituição,
+# unidade, curso, DIC e oferta) e o hash do conteúdo. Ao atualizar, as
+# impressões novas são comparadas com as da versão anterior e só as linhas
+# inseridas ou alteradas passam pela limpeza, pelo esquema e pela fórmula.
+# =======================================================
+
+CHAVE_CICLO = ['Instituição', 'Unidade de Ensino', 'Nome do curso', 'DIC', 'Tipo de Oferta']
+COL_IMPRESSAO_CHAVE = '_CHAVE_CICLO'
+COL_IMPRESSAO_CONTEUDO = '_HASH_CONTEUDO'
+COLUNAS_IMPRESSAO = [COL_IMPRESSAO_CHAVE, COL_IMPRESSAO_CONTEUDO]
+
+# Acima desta fração de linhas alteradas, remontar a base inteira sai mais barato
+LIMIAR_ATUALIZACAO_INCREMENTAL = 0.5
+
+
+def linhas_da_fonte(df):
+    """Linhas da fonte com os cabeçalhos padronizados e sem as linhas sem curso."""
+    df = padronizar_colunas(df)
+    if 'Nome do curso' in df.columns:
+        df = df[df['Nome do curso'].notnull()]
+    return df.reset_index(drop=True)
+
+
+def impressoes_linhas(df):
+    """Chave estável do ciclo e hash do conteúdo de cada linha."""
+    colunas_chave = [c for c in CHAVE_CICLO if c in df.columns]
+    chave = pd.util.hash_pandas_object(df[colunas_chave].astype(str), index=False)
+    # Ciclos com a mesma chave são distinguidos pela ordem de ocorrência
+    ocorrencia = chave.groupby(chave.to_numpy()).cumcount()
+    chave = pd.util.hash_pandas_object(
+        pd.DataFrame({'chave': chave.to_numpy(), 'ocorrencia': ocorrencia.to_numpy()}), index=False)
+    conteudo = pd.util.hash_pandas_object(df.astype(str), index=False)
+    return pd.DataFrame({COL_IMPRESSAO_CHAVE: chave.to_numpy(),
+                         COL_IMPRESSAO_CONTEUDO: conteudo.to_numpy()})
+
+
+def separar_impressoes(df):
+    """Retira do DataFrame as impressões gravadas junto com o snapshot, se houver."""
+    if not all(c in df.columns for c in COLUNAS_IMPRESSAO):
+        return df, None
+    impressoes = df[COLUNAS_IMPRESSAO].astype(np.uint64).reset_index(drop=True)
+    return df.drop(columns=COLUNAS_IMPRESSAO), impressoes
+
+
+def versao_impressoes(impressoes):
+    h = hashlib.sha256(impressoes[COL_IMPRESSAO_CHAVE].to_numpy().tobytes())
+    h.update(impressoes[COL_IMPRESSAO_CONTEUDO].to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class DiferencaBase:
+    """Linhas mantidas, alteradas, inseridas e removidas entre duas versões."""
+
+    def __init__(self, antigas, novas):
+        indice_antigo = pd.Index(antigas[COL_IMPRESSAO_CHAVE])
+        if not indice_antigo.is_unique:
+            raise ValueError("Impressões antigas com chaves repetidas.")
+        posicao_antiga = indice_antigo.get_indexer(novas[COL_IMPRESSAO_CHAVE])
+        existe = posicao_antiga >= 0
+
+        igual = np.zeros(len(novas), dtype=bool)
+        igual[existe] = (antigas[COL_IMPRESSAO_CONTEUDO].to_numpy()[posicao_antiga[existe]]
+                         == novas[COL_IMPRESSAO_CONTEUDO].to_numpy()[existe])
+        alterada = existe & ~igual
+
+        self.total_antigas = len(antigas)
+        self.mantidas_novas = np.flatnonzero(igual)
+        self.mantidas_antigas = posicao_antiga[igual]
+        self.alteradas_novas = np.flatnonzero(alterada)
+        self.alteradas_antigas = posicao_antiga[alterada]
+        self.inseridas = np.flatnonzero(~existe)
+        casadas = np.zeros(len(antigas), dtype=bool)
+        casadas[posicao_antiga[existe]] = True
+        self.removidas = np.flatnonzero(~casadas)
+        # Linhas que precisam passar pela limpeza e pelo cálculo, na ordem da fonte
+        self.novas_posicoes = np.flatnonzero(~igual)
+
+    @property
+    def vazia(self):
+        return (len(self.novas_posicoes) == 0 and len(self.removidas) == 0
+                and np.array_equal(self.mantidas_antigas, np.arange(self.total_antigas)))
+
+    @property
+    def proporcao_alterada(self):
+        total = len(self.mantidas_novas) + len(self.novas_posicoes)
+        return (len(self.novas_posicoes) + len(self.removidas)) / max(total, 1)
+
+
+def alinhar_nomes(novos, existentes):
+    """
+    Nomes padronizados das linhas novas que só diferem nos acentos de um nome
+    já presente na base passam a usar a grafia da base, como aconteceria na
+    padronização da base inteira.
+    """
+    canonicos = {remover_acentos(n): n for n in pd.unique(existentes.astype(object).dropna())}
+    novos = novos.astype(object)
+    return novos.map(lambda n: canonicos.get(remover_acentos(n), n) if isinstance(n, str) else n)
+
+
+def atualizar_conjunto(conjunto, linhas, diferenca, limpar, versao=None):
+    """Novo ConjuntoDados a partir do anterior, limpando só as linhas que mudaram."""
+    novas = limpar(linhas.iloc[diferenca.novas_posicoes])
+    if len(novas) != len(diferenca.novas_posicoes):
+        raise ValueError("A limpeza descartou linhas da atualização incremental.")
+    if 'Nome_Padronizado' in novas.columns and 'Nome_Padronizado' in conjunto.df.columns:
+        novas['Nome_Padronizado'] = alinhar_nomes(
+            novas['Nome_Padronizado'], conjunto.df['Nome_Padronizado']).to_numpy()
+    return conjunto.com_linhas_substituidas(
+        diferenca.mantidas_antigas, diferenca.mantidas_novas,
+        novas, diferenca.novas_posicoes, versao)
+
+
+def _ciclos(df, posicoes, tipo, mt_antes, mt_depois):
+    colunas = [c for c in CHAVE_CICLO if c in df.columns]
+    ciclos = df.iloc[posicoes][colunas].astype(str).reset_index(drop=True)
+    ciclos.insert(0, 'tipo', tipo)
+    ciclos['MT_ANTES'] = mt_antes
+    ciclos['MT_DEPOIS'] = mt_depois
+    return ciclos
+
+
+def _mt(conjunto, posicoes, ano):
+    # O resultado do ano já fica guardado no conjunto (e é completado na
+    # atualização incremental); aqui só se leem as posições afetadas
+    if len(posicoes) == 0:
+        return np.array([], dtype=float)
+    mt = conjunto.resultado(ano)['MT'].to_numpy(dtype=float)[posicoes]
+    return np.nan_to_num(mt)
+
+
+def registrar_alteracoes(antigo, novo, diferenca, ano=None):
+    """
+    Registro do que mudou entre duas versões da base: quantidades, ciclos
+    afetados com a MT antes e depois (no ano informado ou, sem ele, no ano
+    da nova base) e a variação da MT por unidade, lida dos resultados
+    guardados nos conjuntos.
+    """
+    if ano is None:
+        ano = novo.ano_base()
+    ciclos = pd.concat([
+        _ciclos(novo.df, diferenca.alteradas_novas, 'alterada',
+                _mt(antigo, diferenca.alteradas_antigas, ano), _mt(novo, diferenca.alteradas_novas, ano)),
+        _ciclos(novo.df, diferenca.inseridas, 'inserida',
+                np.zeros(len(diferenca.inseridas)), _mt(novo, diferenca.inseridas, ano)),
+        _ciclos(antigo.df, diferenca.removidas, 'removida',
+                _mt(antigo, diferenca.removidas, ano), np.zeros(len(diferenca.removidas))),
+    ], ignore_index=True)
+    ciclos['DELTA_MT'] = ciclos['MT_DEPOIS'] - ciclos['MT_ANTES']
+
+    por_unidade = {}
+    if 'Unidade de Ensino' in ciclos.columns:
+        por_unidade = {k: float(v) for k, v in
+                       ciclos.groupby('Unidade de Ensino')['DELTA_MT'].sum().items()}
+    return {
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'versao_anterior': antigo.versao,
+        'versao': novo.versao,
+        'ano': ano,
+        'inseridas': int(len(diferenca.inseridas)),
+        'alteradas': int(len(diferenca.alteradas_novas)),
+        'removidas': int(len(diferenca.removidas)),
+        'delta_mt': float(ciclos['DELTA_MT'].sum()),
+        'delta_mt_por_unidade': por_unidade,
+        'ciclos': ciclos.to_dict(orient='records'),
+    }
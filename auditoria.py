@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from motor_calculo import calcular_matricula_total_lote, normalizar_datas
+
+# =======================================================
+# AUDITORIA DA PLANILHA
+# Recalcula todos os ciclos de uma vez e compara cada etapa da fórmula com
+# os valores que a própria planilha traz (QTDC ... MT), apontando a primeira
+# etapa em que o cálculo oficial diverge.
+# =======================================================
+
+# Etapas na ordem da fórmula; DACP da planilha é a soma dos dias ativos
+ETAPAS_AUDITORIA = ["QTDC", "CHMD", "CHA", "FECH", "DACP", "FEDA",
+                    "FECHDA", "MECHDA", "MP", "BA", "MT"]
+TOLERANCIA_PADRAO = 0.01
+TOLERANCIA_RELATIVA_PADRAO = 1e-4
+
+
+def _para_numero(serie):
+    # Valores da planilha podem vir como texto com vírgula decimal
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+    return pd.to_numeric(
+        serie.astype(str).str.strip().str.replace(',', '.', regex=False),
+        errors='coerce')
+
+
+def ano_da_planilha(df, padrao=2024):
+    """Ano do período de análise indicado pela coluna DIP, se houver."""
+    if 'DIP' not in df.columns:
+        return padrao
+    anos = pd.Series(normalizar_datas(df['DIP'])).dt.year
+    return int(anos.mode().iloc[0]) if anos.notnull().any() else padrao
+
+
+def valores_calculados(resultado):
+    calculados = resultado[[e for e in ETAPAS_AUDITORIA if e != "DACP"]].copy()
+    calculados["DACP"] = resultado[["DACP1", "DACP2", "DACP3", "DACP4", "DACP5"]].sum(axis=1)
+    return calculados[ETAPAS_AUDITORIA]
+
+
+def auditar_planilha(df, ano_periodo=2024, tolerancia=TOLERANCIA_PADRAO,
+                     tolerancia_relativa=TOLERANCIA_RELATIVA_PADRAO, resultado=None,
+                     metodologia=None):
+    """
+    Compara, linha a linha, os valores oficiais da planilha com o recálculo.
+    Etapas ausentes na planilha (ou células vazias) não são comparadas.
+    Devolve uma tabela com uma linha por ciclo e as colunas:
+    ETAPA_DIVERGENTE (primeira etapa fora da tolerância, ou None),
+    ETAPAS_DIVERGENTES (quantidade), <etapa>_PLANILHA, <etapa>_CALCULADO
+    e DIFERENCA_MT. Sem `resultado`, recalcula pela metodologia informada
+    (ou pela vigente no ano).
+    """
+    if resultado is None:
+        resultado = calcular_matricula_total_lote(df, ano_periodo, metodologia=metodologia)
+    calculados = valores_calculados(resultado)
+    etapas = [e for e in ETAPAS_AUDITORIA if e in df.columns]
+
+    oficiais = pd.DataFrame({e: _para_numero(df[e]) for e in etapas}, index=df.index)
+    calc = calculados[etapas].to_numpy(dtype=float)
+    ofic = oficiais.to_numpy(dtype=float)
+    comparavel = ~np.isnan(ofic)
+    with np.errstate(invalid='ignore'):
+        iguais = np.isclose(calc, ofic, rtol=tolerancia_relativa, atol=tolerancia)
+    diverge = comparavel & ~iguais
+
+    tem_divergencia = diverge.any(axis=1)
+    primeira = np.argmax(diverge, axis=1) if etapas else np.zeros(len(df), dtype=np.int64)
+    nomes_etapas = np.asarray(etapas + [None], dtype=object)
+
+    auditoria = pd.DataFrame({
+        'ETAPA_DIVERGENTE': nomes_etapas[np.where(tem_divergencia, primeira, len(etapas))],
+        'ETAPAS_DIVERGENTES': diverge.sum(axis=1),
+    }, index=df.index)
+    for i, etapa in enumerate(etapas):
+        auditoria[f"{etapa}_PLANILHA"] = ofic[:, i]
+        auditoria[f"{etapa}_CALCULADO"] = calc[:, i]
+    if "MT" in etapas:
+        auditoria["DIFERENCA_MT"] = oficiais["MT"] - calculados["MT"]
+    return auditoria
+
+
+def divergencias(auditoria):
+    """Somente os ciclos com alguma etapa divergente."""
+    return auditoria[auditoria['ETAPA_DIVERGENTE'].notnull()]
+
+
+def resumo_auditoria(auditoria):
+    """Quantidade de ciclos por primeira etapa divergente, na ordem da fórmula."""
+    contagem = auditoria['ETAPA_DIVERGENTE'].value_counts()
+    etapas = [e for e in ETAPAS_AUDITORIA if e in contagem.index]
+    return contagem.reindex(etapas).rename("Ciclos").rename_axis("Primeira etapa divergente")
@@ -0,0 +1,202 @@
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from busca_cursos import IndiceBusca, colunas_busca
+from carregamento import (MAPA_COLUNAS_OUTROS_IFS, limpar_cache_nomes,
+                          limpar_padronizar_dataframe, ler_planilha_fase4,
+                          padronizar_nomes)
+from esquema import aplicar_esquema
+from gerador_fase4 import gerar_dataframe_fase4, gerar_planilha_fase4
+from indice_cascata import IndiceCascata
+from motor_calculo import calcular_matricula_total_lote
+from qualidade import avaliar_qualidade
+
+# =======================================================
+# MEDIÇÃO DE DESEMPENHO (offline, com planilhas sintéticas)
+# Mede separadamente a leitura da planilha, a limpeza (e nela a padronização
+# de nomes), os filtros em cascata, a consulta de ciclos, a busca de cursos, o
+# cálculo da MT e as regras de qualidade, com tempo, vazão e pico de memória.
+#
+#   python benchmark.py --linhas 1000 10000 100000 --salvar-base base.json
+#   python benchmark.py --linhas 1000 10000 100000 --comparar base.json
+# =======================================================
+
+LINHAS_PADRAO = [1000, 10000, 100000]
+NIVEIS = ['Unidade de Ensino', 'Tipo de Curso', 'Nome_Padronizado']
+CONSULTAS_SELECAO = 200
+LIMITE_REGRESSAO = 1.25
+
+
+def _medir(funcao, repeticoes):
+    """Menor tempo entre as repetições e pico de memória (em uma execução à parte)."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(tempos), pico / 1024 / 1024
+
+
+def _carregar_excel(conteudo):
+    # Mesmo caminho de carregar_dados_excel, sem o cache e a interface
+    df, _ = ler_planilha_fase4(io.BytesIO(conteudo))
+    return df.rename(columns=MAPA_COLUNAS_OUTROS_IFS)
+
+
+def _limpar(bruto):
+    # Sem o cache de nomes, para medir a padronização a frio
+    limpar_cache_nomes()
+    return limpar_padronizar_dataframe(bruto.copy())
+
+
+def _padronizar_nomes(nomes):
+    limpar_cache_nomes()
+    return padronizar_nomes(nomes)
+
+
+def _filtrar_cascata(indice):
+    # Percorre todos os caminhos Campus → Tipo → Curso, como nos selectboxes
+    caminhos = []
+    for campus in indice.opcoes():
+        for tipo in indice.opcoes(campus):
+            for curso in indice.opcoes(campus, tipo):
+                indice.posicoes(campus, tipo, curso)
+                caminhos.append((campus, tipo, curso))
+    return caminhos
+
+
+def _buscar_cursos(df, busca, termos):
+    # Mesmo trabalho de exibir_busca_cursos: ciclos encontrados, rótulos e linha escolhida
+    for termo in termos:
+        posicoes, _ = busca.buscar(termo)
+        if len(posicoes):
+            busca.rotulos(posicoes)
+            df.iloc[posicoes[0]]
+
+
+def executar(linhas, repeticoes=3, pasta=None, semente=0):
+    """Devolve {(etapa, linhas): {'segundos', 'itens_por_segundo', 'pico_mb'}}."""
+    pasta = pasta or tempfile.mkdtemp(prefix="calcmt_bench_")
+    resultados = {}
+
+    for n in linhas:
+        caminho = os.path.join(pasta, f"fase4_{n}.xlsx")
+        if not os.path.exists(caminho):
+            gerar_planilha_fase4(caminho, n, semente)
+        with open(caminho, 'rb') as f:
+            conteudo = f.read()
+
+        bruto = gerar_dataframe_fase4(n, semente)
+        df = limpar_padronizar_dataframe(bruto.copy())
+        tipado, _ = aplicar_esquema(df)
+        indice = IndiceCascata(df, NIVEIS)
+        rng = np.random.default_rng(semente)
+        chaves = _filtrar_cascata(indice)
+        selecoes = [chaves[i] for i in rng.integers(0, len(chaves), CONSULTAS_SELECAO)]
+        busca = IndiceBusca(df, colunas_busca(df))
+        # Buscas pelo início do nome (como durante a digitação) de cursos sorteados
+        termos = [busca.textos[i][:8] for i in rng.integers(0, len(busca.textos), CONSULTAS_SELECAO)]
+
+        etapas = {
+            'carregar_dados_excel': (lambda: _carregar_excel(conteudo), n),
+            'limpar_padronizar_dataframe': (lambda: _limpar(bruto), n),
+            'padronizar_nomes': (lambda: _padronizar_nomes(bruto['Nome do curso']), n),
+            'indice_cascata': (lambda: IndiceCascata(df, NIVEIS), n),
+            'filtro_cascata': (lambda: _filtrar_cascata(indice), n),
+            # Consulta feita por interface_selecao_ciclo (o restante é o selectbox)
+            'indice_ciclos': (lambda: [indice.ciclos(*filtros) for filtros in selecoes],
+                              CONSULTAS_SELECAO),
+            'indice_busca': (lambda: IndiceBusca(df, colunas_busca(df)), n),
+            'busca_cursos': (lambda: _buscar_cursos(df, busca, termos), CONSULTAS_SELECAO),
+            'calculo_mt': (lambda: calcular_matricula_total_lote(df, 2024), n),
+            'regras_qualidade': (lambda: avaliar_qualidade(tipado, 2024), n),
+        }
+        for etapa, (funcao, itens) in etapas.items():
+            segundos, pico = _medir(funcao, repeticoes)
+            resultados[(etapa, n)] = {
+                'segundos': segundos,
+                'itens_por_segundo': itens / segundos if segundos > 0 else float('inf'),
+                'pico_mb': pico,
+            }
+    return resultados
+
+
+def _chave_texto(etapa, n):
+    return f"{etapa}|{n}"
+
+
+def salvar_base(resultados, caminho):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({_chave_texto(*k): v for k, v in resultados.items()}, f, indent=2)
+
+
+def comparar_com_base(resultados, caminho, limite=LIMITE_REGRESSAO):
+    """Lista as etapas cujo tempo ou memória passou de limite × a base."""
+    with open(caminho, encoding='utf-8') as f:
+        base = json.load(f)
+    regressoes = []
+    for chave, valores in resultados.items():
+        anterior = base.get(_chave_texto(*chave))
+        if anterior is None:
+            continue
+        for medida in ('segundos', 'pico_mb'):
+            if anterior[medida] > 0 and valores[medida] / anterior[medida] > limite:
+                regressoes.append((chave, medida, anterior[medida], valores[medida]))
+    return regressoes
+
+
+def imprimir(resultados):
+    print(f"{'etapa':<30}{'linhas':>9}{'tempo (s)':>12}{'itens/s':>14}{'pico (MB)':>12}")
+    for (etapa, n), v in resultados.items():
+        print(f"{etapa:<30}{n:>9}{v['segundos']:>12.4f}"
+              f"{v['itens_por_segundo']:>14,.0f}{v['pico_mb']:>12.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mede o desempenho das etapas da calculadora com planilhas Fase 4 sintéticas.")
+    parser.add_argument("--linhas", type=int, nargs="+", default=LINHAS_PADRAO,
+                        help="Quantidades de linhas (ex.: 1000 10000 500000)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--pasta", help="Pasta das planilhas geradas (reaproveitadas entre execuções)")
+    parser.add_argument("--salvar-base", help="Grava os resultados como base de comparação (JSON)")
+    parser.add_argument("--comparar", help="Compara com uma base gravada anteriormente")
+    parser.add_argument("--limite", type=float, default=LIMITE_REGRESSAO,
+                        help="Razão a partir da qual a diferença é tratada como regressão")
+    args = parser.parse_args(argv)
+
+    if args.pasta:
+        os.makedirs(args.pasta, exist_ok=True)
+    resultados = executar(args.linhas, args.repeticoes, args.pasta)
+    imprimir(resultados)
+
+    if args.salvar_base:
+        salvar_base(resultados, args.salvar_base)
+        print(f"Base gravada em {args.salvar_base}")
+
+    if args.comparar:
+        regressoes = comparar_com_base(resultados, args.comparar, args.limite)
+        for (etapa, n), medida, antes, depois in regressoes:
+            print(f"REGRESSÃO {etapa} ({n} linhas) {medida}: {antes:.4f} -> {depois:.4f}",
+                  file=sys.stderr)
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
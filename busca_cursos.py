@@ -0,0 +1,131 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from carregamento import remover_acentos
+from indice_cascata import _texto, matriculas_ciclos, rotulos_ciclos
+
+# =======================================================
+# BUSCA DE CURSOS POR TRIGRAMAS (sem acentos, tolerante a erros de digitação)
+# Cada combinação distinta de curso, campus e oferta vira um texto normalizado
+# e seus trigramas formam um índice invertido (vetores NumPy), montado uma vez
+# por carga. Uma consulta soma, por combinação, os trigramas em comum com o
+# texto digitado e devolve os ciclos das combinações mais parecidas.
+# =======================================================
+
+# Primeira coluna presente de cada grupo entra no texto pesquisado
+COLUNAS_BUSCA = [
+    ['Nome_Padronizado', 'Nome do curso'],
+    ['Unidade de Ensino', 'Campus'],
+    ['Tipo de Oferta'],
+]
+# Fração mínima dos trigramas da consulta presentes no texto da combinação
+LIMIAR_SEMELHANCA = 0.5
+LIMITE_RESULTADOS = 50
+
+_NAO_ALFANUMERICO = re.compile(r'[^0-9A-Z]+')
+
+
+def dobrar_texto(texto):
+    """Maiúsculas, sem acentos e só letras e números separados por um espaço."""
+    return ' '.join(_NAO_ALFANUMERICO.sub(' ', remover_acentos(str(texto)).upper()).split())
+
+
+def trigramas(texto, prefixo=False):
+    """
+    Trigramas das palavras (com espaço nas bordas). Com prefixo=True, a
+    última palavra não é fechada: "MATEM" casa com "MATEMATICA" enquanto
+    o usuário digita.
+    """
+    palavras = texto.split()
+    resultado = set()
+    for i, palavra in enumerate(palavras):
+        aberta = prefixo and i == len(palavras) - 1
+        p = f" {palavra}" + ("" if aberta else " ")
+        resultado.update(p[j:j + 3] for j in range(len(p) - 2))
+    return resultado
+
+
+def colunas_busca(df, grupos=COLUNAS_BUSCA):
+    return [next(c for c in grupo if c in df.columns)
+            for grupo in grupos if any(c in df.columns for c in grupo)]
+
+
+class IndiceBusca:
+    def __init__(self, df, colunas):
+        self.df = df
+        self.colunas = list(colunas)
+
+        textos = pd.Series('', index=df.index, dtype=object)
+        for coluna in self.colunas:
+            valores = _texto(df[coluna]).where(df[coluna].notnull(), '')
+            textos = textos + ' ' + valores
+        codigos, unicos = pd.factorize(textos.to_numpy())
+        self.textos = [dobrar_texto(t) for t in unicos]
+
+        # Índice invertido: trigrama -> combinações que o contêm
+        self._ids = {}
+        pares_trigrama, pares_combinacao = [], []
+        self._tamanhos = np.zeros(len(self.textos), dtype=np.int64)
+        for combinacao, texto in enumerate(self.textos):
+            grams = trigramas(texto)
+            self._tamanhos[combinacao] = len(grams)
+            for g in grams:
+                pares_trigrama.append(self._ids.setdefault(g, len(self._ids)))
+                pares_combinacao.append(combinacao)
+        pares_trigrama = np.asarray(pares_trigrama, dtype=np.int64)
+        ordem = np.argsort(pares_trigrama, kind='stable')
+        self._combinacoes = np.asarray(pares_combinacao, dtype=np.int64)[ordem]
+        self._inicio = np.searchsorted(pares_trigrama[ordem], np.arange(len(self._ids) + 1))
+
+        # Rótulos montados uma vez, como na cascata; a consulta só os indexa
+        if 'DIC' in df.columns:
+            self._rotulos, dic_dt = rotulos_ciclos(df)
+            dic = dic_dt.to_numpy(dtype='datetime64[D]')
+            valido = pd.notnull(self._rotulos)
+        else:
+            self._rotulos = np.full(len(df), None, dtype=object)
+            dic = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[D]')
+            valido = matriculas_ciclos(df)[0].to_numpy(dtype=bool)
+
+        # Ciclos de cada combinação, do início mais recente para o mais antigo;
+        # ciclos sem matrículas ficam de fora, como na lista da cascata
+        sem_data = np.isnat(dic)
+        ordem = np.lexsort((np.where(sem_data, 0, -dic.astype(np.int64)), sem_data, codigos))
+        self._ciclos = ordem[valido[ordem]]
+        self._inicio_ciclos = np.searchsorted(codigos[self._ciclos], np.arange(len(self.textos) + 1))
+
+    def combinacoes(self, consulta):
+        """Combinações parecidas com a consulta e a semelhança (0 a 1), da mais parecida à menos."""
+        grams = trigramas(dobrar_texto(consulta), prefixo=True)
+        conhecidos = [self._ids[g] for g in grams if g in self._ids]
+        if not grams or not conhecidos:
+            return np.array([], dtype=np.int64), np.array([], dtype=float)
+        encontradas = np.concatenate([self._combinacoes[self._inicio[g]:self._inicio[g + 1]]
+                                      for g in conhecidos])
+        semelhanca = np.bincount(encontradas, minlength=len(self.textos)) / len(grams)
+        candidatas = np.flatnonzero(semelhanca >= LIMIAR_SEMELHANCA)
+        # Empate: o texto mais curto (mais específico) primeiro
+        ordem = np.lexsort((self._tamanhos[candidatas], -semelhanca[candidatas]))
+        return candidatas[ordem], semelhanca[candidatas[ordem]]
+
+    def buscar(self, consulta, limite=LIMITE_RESULTADOS):
+        """Posições dos ciclos das combinações mais parecidas (até `limite`) e a semelhança de cada um."""
+        combinacoes, semelhanca = self.combinacoes(consulta)
+        posicoes, notas = [], []
+        total = 0
+        for combinacao, nota in zip(combinacoes, semelhanca):
+            ciclos = self._ciclos[self._inicio_ciclos[combinacao]:self._inicio_ciclos[combinacao + 1]]
+            posicoes.append(ciclos[:limite - total])
+            notas.append(np.full(len(posicoes[-1]), nota))
+            total += len(posicoes[-1])
+            if total >= limite:
+                break
+        if not posicoes:
+            return np.array([], dtype=np.int64), np.array([], dtype=float)
+        return np.concatenate(posicoes), np.concatenate(notas)
+
+    def rotulos(self, posicoes):
+        """Rótulos (início, oferta, matrículas) dos ciclos encontrados."""
+        return self._rotulos[posicoes]
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# =======================================================
+# CACHE DE PLANILHAS ENVIADAS (endereçado pelo conteúdo)
+# O mesmo arquivo, enviado em qualquer sessão, é lido uma única vez enquanto
+# couber no limite de memória. Os itens menos usados são descartados primeiro.
+# Itens que crescem depois de guardados (um ConjuntoDados acumula índices e
+# resultados) são medidos de novo a cada verificação do limite.
+# =======================================================
+
+LIMITE_CACHE_MB = int(os.environ.get("CALCMT_CACHE_MB", "512"))
+
+
+def chave_conteudo(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def tamanho_em_bytes(valor, vistos=None):
+    """
+    Memória aproximada de DataFrames, vetores NumPy e dos objetos que os
+    guardam (atributos, listas, dicionários). Um mesmo objeto, alcançado por
+    mais de um caminho, só é contado uma vez.
+    """
+    vistos = set() if vistos is None else vistos
+    if id(valor) in vistos:
+        return 0
+    vistos.add(id(valor))
+    if hasattr(valor, 'tamanho_em_bytes'):
+        return int(valor.tamanho_em_bytes())
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if isinstance(valor, dict):
+        valor = list(valor.values())
+    if isinstance(valor, (tuple, list)):
+        return sum(tamanho_em_bytes(v, vistos) for v in valor)
+    if hasattr(valor, 'memory_usage'):
+        return int(np.sum(valor.memory_usage(deep=True)))
+    if hasattr(valor, '__dict__'):
+        return tamanho_em_bytes(vars(valor), vistos)
+    return 0
+
+
+class CacheLRU:
+    def __init__(self, limite_bytes, medir=tamanho_em_bytes):
+        self.limite_bytes = limite_bytes
+        self.medir = medir
+        self.ocupado = 0
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+        self._em_calculo = {}
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __contains__(self, chave):
+        return chave in self._itens
+
+    def _buscar(self, chave):
+        if chave in self._itens:
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return True, self._itens[chave][0]
+        return False, None
+
+    def obter_ou_calcular(self, chave, calcular):
+        with self._trava:
+            # Os itens podem ter crescido desde a última consulta
+            self._remedir()
+            self._descartar_excedente()
+            achou, valor = self._buscar(chave)
+            if achou:
+                return valor
+            trava_chave = self._em_calculo.setdefault(chave, threading.Lock())
+
+        # Sessões que pedem a mesma chave ao mesmo tempo esperam um único cálculo
+        with trava_chave:
+            with self._trava:
+                achou, valor = self._buscar(chave)
+                if achou:
+                    return valor
+                self.falhas += 1
+            try:
+                valor = calcular()
+                self.guardar(chave, valor)
+            finally:
+                with self._trava:
+                    self._em_calculo.pop(chave, None)
+        return valor
+
+    def _remedir(self):
+        for chave, (valor, _) in list(self._itens.items()):
+            self._itens[chave] = (valor, self.medir(valor))
+        self.ocupado = sum(tamanho for _, tamanho in self._itens.values())
+
+    def guardar(self, chave, valor):
+        tamanho = self.medir(valor)
+        with self._trava:
+            if chave in self._itens:
+                self._itens.pop(chave)
+            self._remedir()
+            if tamanho > self.limite_bytes:
+                return
+            self._itens[chave] = (valor, tamanho)
+            self.ocupado += tamanho
+            self._descartar_excedente()
+
+    def _descartar_excedente(self):
+        while self.ocupado > self.limite_bytes and self._itens:
+            _, (_, tamanho_antigo) = self._itens.popitem(last=False)
+            self.ocupado -= tamanho_antigo
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+            self.ocupado = 0
+
+
+# Instância única por processo: compartilhada entre reruns e sessões
+cache_planilhas = CacheLRU(LIMITE_CACHE_MB * 1024 * 1024)
@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+
+from carregamento import TAMANHO_BLOCO_PADRAO, iterar_blocos_fase4
+from exportacao import ESCRITORES, exportar_blocos
+from metodologia import versoes_metodologia
+
+# =======================================================
+# MODO LOTE (linha de comando)
+# Calcula a MT de todos os ciclos de uma ou mais planilhas Fase 4 e grava
+# o resultado em blocos, sem abrir a interface do Streamlit.
+#
+#   python calcmt_lote.py planilha1.xlsx planilha2.xlsx --ano 2024 --formato parquet
+#   python calcmt_lote.py planilha.xlsx --ano 2022 2023 2024 --metodologia 646/2022
+# =======================================================
+
+
+def processar_planilha(caminho, destino, formato, ano, tamanho_bloco, metodologia=None):
+    blocos = (bloco for bloco, _ in iterar_blocos_fase4(caminho, tamanho_bloco))
+    return exportar_blocos(blocos, destino, formato, ano, metodologia)
+
+
+def caminho_saida(caminho, pasta, formato, ano):
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    return os.path.join(pasta, f"{nome}_mt{ano}.{formato}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Calcula a Matrícula Total de todos os ciclos de planilhas Fase 4.")
+    parser.add_argument("planilhas", nargs="+", help="Arquivos .xlsx da Fase 4")
+    parser.add_argument("--ano", type=int, nargs="+", default=[2024],
+                        help="Ano(s) de análise; um arquivo por ano (padrão: 2024)")
+    parser.add_argument("--metodologia", choices=versoes_metodologia(),
+                        help="Versão da metodologia (padrão: a vigente em cada ano)")
+    parser.add_argument("--formato", choices=sorted(ESCRITORES), default="csv")
+    parser.add_argument("--saida", default=".", help="Pasta de destino dos resultados")
+    parser.add_argument("--bloco", type=int, default=TAMANHO_BLOCO_PADRAO,
+                        help="Quantidade de linhas processadas por vez")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.saida, exist_ok=True)
+    falhas = 0
+    for caminho in args.planilhas:
+        for ano in args.ano:
+            destino = caminho_saida(caminho, args.saida, args.formato, ano)
+            try:
+                linhas, total_mt = processar_planilha(
+                    caminho, destino, args.formato, ano, args.bloco, args.metodologia)
+            except Exception as e:
+                falhas += 1
+                print(f"ERRO {caminho} ({ano}): {e}", file=sys.stderr)
+                continue
+            print(f"{caminho} ({ano}): {linhas} ciclos, MT total {total_mt:.2f} -> {destino}",
+                  file=sys.stderr)
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
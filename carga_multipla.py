@@ -0,0 +1,88 @@
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from auditoria import ano_da_planilha
+from carregamento import MAPA_COLUNAS_OUTROS_IFS, ler_planilha_fase4
+from motor_calculo import calcular_matricula_total_lote
+
+# =======================================================
+# CARGA DE VÁRIAS PLANILHAS (comparação entre IFs e entre anos base)
+# Cada planilha é lida em um processo separado, pelo mesmo caminho da
+# análise de arquivo único; o resultado é um único DataFrame com a
+# instituição e o ano base de cada linha.
+# =======================================================
+
+COL_ARQUIVO = 'Arquivo'
+COL_INSTITUICAO = 'Instituição'
+COL_ANO_BASE = 'Ano Base'
+
+
+def _ano_do_nome(nome):
+    encontrado = re.search(r'(?<!\d)(20\d{2})(?!\d)', nome)
+    return int(encontrado.group(1)) if encontrado else None
+
+
+def ler_planilha_rotulada(nome, origem, ano_padrao=2024):
+    """
+    Lê uma planilha Fase 4 (caminho ou conteúdo em bytes) e acrescenta as
+    colunas de arquivo, instituição e ano base. Executada nos processos filhos.
+    """
+    arquivo = io.BytesIO(origem) if isinstance(origem, bytes) else origem
+    df, _ = ler_planilha_fase4(arquivo)
+    if df is None:
+        raise ValueError("Estrutura da planilha Fase 4 não encontrada.")
+    df = df.rename(columns=MAPA_COLUNAS_OUTROS_IFS)
+
+    nome_base = os.path.splitext(os.path.basename(nome))[0]
+    ano = _ano_do_nome(nome_base) or ano_da_planilha(df, ano_padrao)
+    if COL_INSTITUICAO in df.columns:
+        df[COL_INSTITUICAO] = df[COL_INSTITUICAO].fillna(nome_base)
+    else:
+        df[COL_INSTITUICAO] = nome_base
+    df[COL_ARQUIVO] = nome
+    df[COL_ANO_BASE] = ano
+    return df
+
+
+def carregar_planilhas(origens, processos=None, ao_concluir=None, ano_padrao=2024):
+    """
+    origens: lista de (nome, caminho ou bytes). Devolve (DataFrame combinado,
+    {nome: erro}) com as linhas na ordem das origens.
+    ao_concluir(concluidas, total, nome) é chamada a cada planilha lida.
+    """
+    origens = list(origens)
+    quadros = [None] * len(origens)
+    falhas = {}
+    if processos is None:
+        processos = min(len(origens), os.cpu_count() or 1) or 1
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        tarefas = {
+            executor.submit(ler_planilha_rotulada, nome, origem, ano_padrao): (i, nome)
+            for i, (nome, origem) in enumerate(origens)
+        }
+        for concluidas, tarefa in enumerate(as_completed(tarefas), start=1):
+            i, nome = tarefas[tarefa]
+            try:
+                quadros[i] = tarefa.result()
+            except Exception as e:
+                falhas[nome] = e
+            if ao_concluir:
+                ao_concluir(concluidas, len(origens), nome)
+
+    quadros = [q for q in quadros if q is not None]
+    if not quadros:
+        return None, falhas
+    return pd.concat(quadros, ignore_index=True), falhas
+
+
+def comparativo_mt(df, por=(COL_INSTITUICAO, COL_ANO_BASE)):
+    """MT total de cada grupo, com cada linha calculada no seu próprio ano base."""
+    resultado = calcular_matricula_total_lote(df, df[COL_ANO_BASE].to_numpy(dtype=np.int64))
+    chaves = [df[c].astype(str) if c != COL_ANO_BASE else df[c] for c in por]
+    return resultado[['MECHDA', 'BA', 'MT']].groupby(chaves).sum()
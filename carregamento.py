@@ -0,0 +1,218 @@
+import unicodedata
+from functools import lru_cache
+
+import pandas as pd
+
+from instrumentacao import medir
+
+try:
+    from correcoes_nomes import nomes_cursos_substituicoes
+except ImportError:
+    nomes_cursos_substituicoes = {}
+
+# =======================================================
+# LEITURA E PADRONIZAÇÃO DAS PLANILHAS (sem dependência do Streamlit)
+# =======================================================
+
+LINHAS_BUSCA_CABECALHO = 15
+TAMANHO_BLOCO_PADRAO = 5000
+# Nomes formatados guardados em memória (o app roda por muito tempo)
+TAMANHO_CACHE_NOMES = 65536
+
+# Nomes alternativos usados nas planilhas de outros IFs
+MAPA_COLUNAS_OUTROS_IFS = {
+    'Unidade de Ensino': 'Campus',
+    'Unidade': 'Campus',
+    'Tipo Curso': 'Tipo de Curso'
+}
+
+
+def remover_acentos(texto):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto)
+                   if not unicodedata.combining(c))
+
+
+def _montar_indice_sem_acento(substituicoes):
+    # Chave sem acentos -> nome corrigido, para variantes que não estão no dicionário
+    indice = {}
+    for original, corrigido in substituicoes.items():
+        corrigido = corrigido.upper()
+        indice.setdefault(remover_acentos(corrigido), corrigido)
+        indice.setdefault(remover_acentos(original.upper()), corrigido)
+    return indice
+
+
+indice_nomes_sem_acento = _montar_indice_sem_acento(nomes_cursos_substituicoes)
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_NOMES)
+def _formatar_texto(x):
+    x = x.strip().upper()
+    if x in nomes_cursos_substituicoes:
+        return nomes_cursos_substituicoes[x].upper()
+    return indice_nomes_sem_acento.get(remover_acentos(x), x)
+
+
+def limpar_cache_nomes():
+    """Esvazia o cache de nomes formatados (usado nas medições a frio)."""
+    _formatar_texto.cache_clear()
+
+
+def formatar_nome(x):
+    if pd.isnull(x):
+        return ""
+    return _formatar_texto(str(x))
+
+
+def padronizar_nomes(serie):
+    """
+    Padroniza uma coluna de nomes calculando cada valor distinto uma única vez.
+    Grafias que só diferem nos acentos são unificadas na versão acentuada.
+    """
+    codigos, unicos = pd.factorize(serie)
+    nomes = [formatar_nome(u) for u in unicos]
+
+    grupos = {}
+    for nome in nomes:
+        grupos.setdefault(remover_acentos(nome), []).append(nome)
+    canonico = {
+        chave: min(variantes, key=lambda n: (-sum(ord(c) > 127 for c in n), n))
+        for chave, variantes in grupos.items()
+    }
+    nomes = [canonico[remover_acentos(n)] for n in nomes]
+
+    categorias = sorted(set(nomes) | ({""} if (codigos == -1).any() else set()))
+    posicao = {nome: i for i, nome in enumerate(categorias)}
+    # O último item atende ao código -1 (valores nulos) do factorize
+    mapa = pd.Series([posicao[n] for n in nomes] + [posicao.get("", -1)])
+    return pd.Categorical.from_codes(mapa.to_numpy()[codigos], categorias)
+
+
+def padronizar_colunas(df):
+    """Cabeçalhos da Fase 4 (ex.: "DIC - Data de Início") viram as siglas."""
+    siglas_alvo = [
+        "DIC", "DTC", "CHC", "CHMC", "CHM", "PC",
+        "QTDC", "CHMD", "CHA", "FECH",
+        "DIP", "DFP", "QTM1P", "QTM", "DACP",
+        "FEDA", "FECHDA", "MECHDA", "MP", "BA", "MT", "Apto"
+    ]
+    novos_nomes = {}
+    for col in df.columns:
+        primeiro_token = str(col).strip().split()[0]
+        primeiro_token_limpo = primeiro_token.strip()
+        if any(primeiro_token_limpo.startswith(sigla) for sigla in siglas_alvo):
+            novos_nomes[col] = primeiro_token_limpo
+        else:
+            novos_nomes[col] = ' '.join(str(col).split())
+    return df.rename(columns=novos_nomes)
+
+
+@medir("limpar_padronizar_dataframe")
+def limpar_padronizar_dataframe(df):
+    df = padronizar_colunas(df)
+
+    if 'Nome do curso' in df.columns:
+        df = df[df['Nome do curso'].notnull()]
+        df['Nome_Padronizado'] = padronizar_nomes(df['Nome do curso'])
+    else:
+        df['Nome_Padronizado'] = "A DEFINIR"
+    return df
+
+
+def linha_e_cabecalho(valores):
+    # Cabeçalho da Fase 4: precisa citar instituição, nome do curso e ciclo/matrícula
+    row_str = ' '.join(str(v) for v in valores).upper()
+    return "INSTITUIÇÃO" in row_str and "NOME DO CURSO" in row_str and ("CICLO" in row_str or "MATRÍCULA" in row_str)
+
+
+def _nomes_colunas(cabecalho):
+    # Mesmo tratamento do pandas: células vazias viram "Unnamed: i" e nomes
+    # repetidos recebem o sufixo ".n"
+    nomes = []
+    repeticoes = {}
+    for i, valor in enumerate(cabecalho):
+        nome = f"Unnamed: {i}" if valor is None else ' '.join(str(valor).split())
+        if nome in repeticoes:
+            repeticoes[nome] += 1
+            nome = f"{nome}.{repeticoes[nome]}"
+        else:
+            repeticoes[nome] = 0
+        nomes.append(nome)
+    return nomes
+
+
+def _localizar_cabecalho(linhas):
+    for i, valores in enumerate(linhas):
+        if i >= LINHAS_BUSCA_CABECALHO:
+            break
+        if linha_e_cabecalho('nan' if v is None else v for v in valores):
+            return i, valores
+    return None, None
+
+
+def _blocos_fase4(arquivo, tamanho_bloco):
+    # Leitura em streaming (read_only, só valores). As dimensões gravadas na aba
+    # são descartadas, pois podem estar ausentes ou erradas (ex.: A1:XFD1048576),
+    # e os dados são lidos só até a última coluna do cabeçalho.
+    # O ganho é modesto: com 20 mil linhas, a leitura ficou em 5 a 7 s, dentro do
+    # ruído da medição e igual à leitura original. Quase todo o tempo é gasto
+    # pelo openpyxl convertendo cada célula; a memória ficou em ~23 MB.
+    from openpyxl import load_workbook
+
+    wb = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            try:
+                ws.reset_dimensions()
+                posicao, cabecalho = _localizar_cabecalho(
+                    ws.iter_rows(max_row=LINHAS_BUSCA_CABECALHO, values_only=True))
+            except Exception:
+                continue
+            if cabecalho is None:
+                continue
+
+            largura = max(i for i, v in enumerate(cabecalho) if v is not None) + 1
+            colunas = _nomes_colunas(cabecalho[:largura])
+            linhas = ws.iter_rows(min_row=posicao + 2, max_col=largura, values_only=True)
+            inicio = 0
+            buffer = []
+            for valores in linhas:
+                if all(v is None for v in valores):
+                    continue
+                if len(valores) < largura:
+                    valores = valores + (None,) * (largura - len(valores))
+                buffer.append(valores)
+                if tamanho_bloco and len(buffer) >= tamanho_bloco:
+                    yield _montar_bloco(buffer, colunas, inicio), ws.title
+                    inicio += len(buffer)
+                    buffer = []
+            if buffer or inicio == 0:
+                yield _montar_bloco(buffer, colunas, inicio), ws.title
+            return
+    finally:
+        wb.close()
+    raise ValueError("Estrutura da planilha Fase 4 não encontrada.")
+
+
+def _montar_bloco(linhas, colunas, inicio):
+    df = pd.DataFrame(linhas, columns=colunas,
+                      index=pd.RangeIndex(inicio, inicio + len(linhas)))
+    return limpar_padronizar_dataframe(df)
+
+
+def ler_planilha_fase4(arquivo):
+    """
+    Procura, aba por aba, o cabeçalho da planilha Fase 4 e devolve
+    (DataFrame limpo, nome da aba). Devolve (None, None) se não encontrar.
+    """
+    try:
+        for df, nome_aba in _blocos_fase4(arquivo, None):
+            return df, nome_aba
+    except ValueError:
+        pass
+    return None, None
+
+
+def iterar_blocos_fase4(arquivo, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """Gera (bloco limpo, nome da aba) em fatias de até tamanho_bloco linhas."""
+    yield from _blocos_fase4(arquivo, tamanho_bloco)
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from motor_calculo import FINANCIAMENTOS, calcular_chm_lote, calcular_formula
+
+# =======================================================
+# VARREDURA DE CENÁRIOS
+# Avalia a fórmula da MT sobre o produto cartesiano dos parâmetros escolhidos,
+# em uma única operação vetorizada (broadcasting de eixos esparsos).
+# =======================================================
+
+EIXOS = ["QTM", "CHC", "DIC", "DURACAO", "FINANCIAMENTO"]
+
+
+def varredura_cenarios(qtm, chc, dic, duracoes, financiamentos, chmc=0, pc=1.0,
+                       agro=False, ano=2024, tipo_curso="", tipo_oferta="", metodologia=None):
+    """
+    Cada parâmetro de eixo recebe uma lista de valores. DTC é obtida de
+    DIC + duração (dias) - 1; financiamentos são rótulos de FINANCIAMENTOS.
+    Devolve uma tabela com uma linha por combinação.
+    """
+    qtm = np.asarray(qtm, dtype=np.int64)
+    chc = np.asarray(chc, dtype=np.int64)
+    dic = np.asarray(dic, dtype='datetime64[D]')
+    duracoes = np.asarray(duracoes, dtype=np.int64)
+    codigos_fin = np.asarray([FINANCIAMENTOS.index(f) for f in financiamentos], dtype=np.int8)
+
+    # CHM depende de CHC (FIC/Doutorado) e do tipo/oferta do curso
+    chm = calcular_chm_lote(
+        pd.Series([tipo_curso] * len(chc), dtype=object),
+        pd.Series([tipo_oferta] * len(chc), dtype=object),
+        chc, np.full(len(chc), chmc), metodologia, ano)
+
+    g_qtm, g_chc, g_dic, g_dur, g_fin = np.meshgrid(
+        qtm, chc, dic, duracoes, codigos_fin, indexing='ij', sparse=True)
+    g_chm = chm.reshape(g_chc.shape)
+    g_dtc = g_dic + (g_dur - 1).astype('timedelta64[D]')
+
+    valores = calcular_formula(g_dic, g_dtc, g_chc, g_chm, g_qtm, pc, agro, g_fin, ano, metodologia)
+
+    forma = (len(qtm), len(chc), len(dic), len(duracoes), len(codigos_fin))
+    colunas = {
+        "QTM": g_qtm, "CHC": g_chc, "CHM": g_chm, "DIC": g_dic,
+        "DURACAO": g_dur, "DTC": g_dtc, "FINANCIAMENTO": g_fin,
+    }
+    tabela = pd.DataFrame({
+        nome: np.broadcast_to(v, forma).ravel() for nome, v in colunas.items()
+    })
+    tabela["FINANCIAMENTO"] = pd.Categorical.from_codes(tabela["FINANCIAMENTO"], FINANCIAMENTOS)
+    for nome in ["FEDA", "MECHDA", "MP", "BA", "MT"]:
+        tabela[nome] = np.broadcast_to(valores[nome], forma).ravel()
+    return tabela
+
+
+def matriz_calor(tabela, eixo_x, eixo_y, valor="MT"):
+    """Média do valor para cada par (eixo_x, eixo_y), nas demais dimensões."""
+    return tabela.groupby([eixo_y, eixo_x], observed=True)[valor].mean().reset_index()
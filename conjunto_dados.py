@@ -0,0 +1,187 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from auditoria import ano_da_planilha
+from busca_cursos import IndiceBusca
+from cache_planilhas import tamanho_em_bytes
+from esquema import aplicar_esquema
+from indice_cascata import IndiceCascata
+from metodologia import metodologia_do_ano, obter_metodologia
+from motor_calculo import calcular_matricula_total_lote, preparar_entradas
+from painel import PainelInstitucional
+from projecao import projetar_anos
+from qualidade import avaliar_qualidade
+
+# =======================================================
+# CONJUNTO DE DADOS CARREGADO
+# Guarda o DataFrame junto com as estruturas derivadas dele, calculadas uma
+# única vez por carga e compartilhadas entre reruns e sessões. Como muitas
+# chaves dependem do ano digitado, os derivados menos usados são descartados
+# (e recalculados sob demanda) quando a soma passa do limite de memória.
+# =======================================================
+
+LIMITE_DERIVADOS_MB = int(os.environ.get("CALCMT_DERIVADOS_MB", "256"))
+
+
+def _remontar(antigo, parcial, mantidas, ordem):
+    # Linhas mantidas seguidas das novas, depois reordenadas para a nova base
+    combinado = pd.concat([antigo.iloc[mantidas], parcial], ignore_index=True)
+    return combinado.iloc[ordem].reset_index(drop=True)
+
+
+class ConjuntoDados:
+    def __init__(self, df, versao=None, falhas_esquema=None):
+        # Com falhas_esquema informado, o DataFrame já chegou tipado
+        if falhas_esquema is None:
+            df, falhas_esquema = aplicar_esquema(df)
+        self.df, self.falhas_esquema = df, falhas_esquema
+        self.versao = versao
+        self._derivados = OrderedDict()
+        self._tamanhos = {}
+        self._tamanho_df = None
+        self.limite_derivados = LIMITE_DERIVADOS_MB * 1024 * 1024
+        self._trava = threading.RLock()
+
+    def _derivado(self, chave, calcular):
+        with self._trava:
+            if chave in self._derivados:
+                self._derivados.move_to_end(chave)
+                return self._derivados[chave]
+            valor = calcular()
+            self._guardar_derivado(chave, valor)
+            return valor
+
+    def _guardar_derivado(self, chave, valor):
+        # Cada derivado é medido uma vez, ao entrar; o DataFrame base não é recontado
+        self._derivados[chave] = valor
+        self._derivados.move_to_end(chave)
+        self._tamanhos[chave] = tamanho_em_bytes(valor, {id(self.df)})
+        # Descarta os menos usados, mas nunca o que acabou de entrar
+        while sum(self._tamanhos.values()) > self.limite_derivados and len(self._derivados) > 1:
+            antiga, _ = self._derivados.popitem(last=False)
+            del self._tamanhos[antiga]
+
+    def memory_usage(self, deep=True):
+        return self.df.memory_usage(deep=deep)
+
+    def tamanho_em_bytes(self):
+        """Memória do DataFrame somada à das estruturas derivadas já calculadas."""
+        with self._trava:
+            if self._tamanho_df is None:
+                self._tamanho_df = int(self.memory_usage(deep=True).sum())
+            return self._tamanho_df + sum(self._tamanhos.values())
+
+    def indice(self, niveis):
+        niveis = tuple(niveis)
+        return self._derivado(('indice', niveis), lambda: IndiceCascata(self.df, niveis))
+
+    def busca(self, colunas):
+        colunas = tuple(colunas)
+        return self._derivado(('busca', colunas), lambda: IndiceBusca(self.df, colunas))
+
+    def ano_base(self):
+        return self._derivado(('ano_base',), lambda: ano_da_planilha(self.df))
+
+    def entradas(self, metodologia=None):
+        # Só a CHM depende da metodologia; sem ela, a versão mais recente
+        m = obter_metodologia(metodologia) or metodologia_do_ano()
+        return self._derivado(('entradas', m.versao), lambda: preparar_entradas(self.df, m))
+
+    def projecao(self, anos, metodologia=None):
+        anos = tuple(anos)
+        versao = obter_metodologia(metodologia).versao if metodologia is not None else None
+        return self._derivado(('projecao', anos, versao),
+                              lambda: projetar_anos(self.df, anos, self.entradas, metodologia,
+                                                    self.ano_base()))
+
+    def resultado(self, ano, metodologia=None):
+        m = obter_metodologia(metodologia) or metodologia_do_ano(ano)
+        return self._derivado(('resultado', ano, m.versao),
+                              lambda: calcular_matricula_total_lote(self.df, ano, self.entradas(m), m))
+
+    def painel(self, ano, dimensoes, metodologia=None):
+        dimensoes = tuple(dimensoes)
+        m = obter_metodologia(metodologia) or metodologia_do_ano(ano)
+        return self._derivado(('painel', ano, dimensoes, m.versao),
+                              lambda: PainelInstitucional(self.df, self.resultado(ano, m), dimensoes))
+
+    def qualidade(self, ano, metodologia=None):
+        m = obter_metodologia(metodologia) or metodologia_do_ano(ano)
+        return self._derivado(('qualidade', ano, m.versao), lambda: avaliar_qualidade(self.df, ano, m))
+
+    def com_linhas_substituidas(self, mantidas, destino_mantidas, novas_linhas, destino_novas, versao=None):
+        """
+        Novo conjunto formado pelas linhas `mantidas` (posições neste conjunto)
+        e pelas `novas_linhas` (já limpas), nas posições de destino indicadas.
+        Só as novas linhas passam pelo esquema e pela fórmula: entradas,
+        resultados e projeções já calculados são reaproveitados e completados,
+        e os agregados dos painéis são corrigidos pela diferença das linhas que
+        saíram e entraram. Índices dependem da base inteira e são remontados
+        sob demanda.
+        """
+        mantidas = np.asarray(mantidas, dtype=np.int64)
+        destino_mantidas = np.asarray(destino_mantidas, dtype=np.int64)
+        destino_novas = np.asarray(destino_novas, dtype=np.int64)
+        total = len(destino_mantidas) + len(destino_novas)
+        ordem = np.empty(total, dtype=np.int64)
+        ordem[destino_mantidas] = np.arange(len(mantidas))
+        ordem[destino_novas] = len(mantidas) + np.arange(len(destino_novas))
+
+        tipadas, falhas_novas = aplicar_esquema(novas_linhas.reset_index(drop=True))
+        df = _remontar(self.df, tipadas, mantidas, ordem)
+        for coluna in df.columns:
+            # Categorias diferentes dos dois lados fazem o concat cair para object
+            era_categoria = isinstance(self.df.dtypes.get(coluna), pd.CategoricalDtype)
+            if era_categoria and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+                df[coluna] = df[coluna].astype('category')
+
+        destino_antigas = np.full(len(self.df), -1, dtype=np.int64)
+        destino_antigas[mantidas] = destino_mantidas
+        falhas = {}
+        for coluna, valores in self.falhas_esquema.items():
+            destino = destino_antigas[valores.index.to_numpy()]
+            falhas[coluna] = valores[destino >= 0].set_axis(destino[destino >= 0])
+        for coluna, valores in falhas_novas.items():
+            valores = valores.set_axis(destino_novas[valores.index.to_numpy()])
+            falhas[coluna] = pd.concat([falhas[coluna], valores]) if coluna in falhas else valores
+        falhas = {c: v.sort_index() for c, v in falhas.items() if len(v)}
+
+        novo = ConjuntoDados(df, versao, falhas)
+        novo.limite_derivados = self.limite_derivados
+        with self._trava:
+            derivados = dict(self._derivados)
+        parciais = {}
+
+        def entradas_novas(m):
+            if m.versao not in parciais:
+                parciais[m.versao] = preparar_entradas(tipadas, m)
+            return parciais[m.versao]
+
+        for chave, valor in derivados.items():
+            if chave[0] == 'entradas':
+                parcial = entradas_novas(obter_metodologia(chave[1]))
+            elif chave[0] == 'resultado':
+                m = obter_metodologia(chave[2])
+                parcial = calcular_matricula_total_lote(tipadas, chave[1], entradas_novas(m), m)
+            elif chave[0] == 'projecao':
+                # A marca JUBILADO vale a partir do ano da base; se ele mudou, recalcula tudo
+                if novo.ano_base() != self.ano_base():
+                    continue
+                parcial = projetar_anos(tipadas, chave[1], entradas_novas, chave[2], self.ano_base())
+            else:
+                continue
+            novo._guardar_derivado(chave, _remontar(valor, parcial, mantidas, ordem))
+
+        # Painéis depois dos resultados, que eles usam já completados
+        saidas = np.setdiff1d(np.arange(len(self.df)), mantidas)
+        for chave, painel in derivados.items():
+            if chave[0] == 'painel':
+                ano, m = chave[1], obter_metodologia(chave[3])
+                novo._guardar_derivado(chave, painel.com_diferenca(
+                    df, novo.resultado(ano, m), self.df.iloc[saidas],
+                    self.resultado(ano, m).iloc[saidas], destino_novas))
+        return novo
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+from motor_calculo import COL_FINANCIAMENTO, COLUNAS_AGRO, normalizar_datas
+
+# =======================================================
+# ESQUEMA DE TIPOS DA BASE (aplicado uma vez, na carga)
+# Rótulos repetidos viram categorias, datas viram datetime64, cargas
+# horárias e matrículas viram inteiros pequenos, PC vira número e as
+# colunas Sim/Não viram booleanos. Valores que não puderam ser convertidos
+# são registrados em vez de descartados em silêncio.
+# =======================================================
+
+COLUNAS_CATEGORIA = [
+    'Instituição', 'Unidade de Ensino', 'Campus', 'Tipo de Curso', 'Tipo de Oferta',
+    'Nome do curso', COL_FINANCIAMENTO,
+]
+COLUNAS_DATA = ['DIC', 'DTC', 'DIP', 'DFP']
+COLUNAS_INTEIRO = ['CHC', 'CHMC', 'CHM', 'QTM', 'QTM1P', 'QTDC']
+COLUNAS_DECIMAL = ['PC', 'CHMD', 'CHA', 'FECH', 'DACP', 'FEDA', 'FECHDA',
+                   'MECHDA', 'MP', 'BA', 'MT']
+COLUNAS_BOOLEANO = COLUNAS_AGRO + ['Apto']
+
+VALORES_VERDADEIROS = ['SIM', 'S', 'TRUE', '1', 'VERDADEIRO']
+VALORES_FALSOS = ['NÃO', 'NAO', 'N', 'FALSE', '0', 'FALSO']
+
+TIPOS_INTEIROS = ['Int8', 'Int16', 'Int32', 'Int64']
+
+
+def _preenchido(serie):
+    # Células vazias ou só com espaços não contam como falha de conversão
+    return serie.notnull() & (serie.astype(str).str.strip() != '')
+
+
+def _como_categoria(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie, None
+    texto = serie.where(serie.isnull(), serie.astype(str).str.strip())
+    return texto.astype('category'), None
+
+
+def _como_data(serie):
+    datas = pd.Series(normalizar_datas(serie), index=serie.index).astype('datetime64[s]')
+    return datas, _preenchido(serie) & datas.isnull()
+
+
+def _como_numero(serie):
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        numeros = serie.astype(float)
+    else:
+        numeros = pd.to_numeric(
+            serie.astype(str).str.strip().str.replace(',', '.', regex=False),
+            errors='coerce')
+    return numeros, _preenchido(serie) & numeros.isnull()
+
+
+def _como_inteiro(serie):
+    numeros, falhas = _como_numero(serie)
+    inteiros = np.trunc(numeros)
+    validos = inteiros.dropna()
+    for tipo in TIPOS_INTEIROS:
+        info = np.iinfo(tipo.lower())
+        if validos.empty or (validos.min() >= info.min and validos.max() <= info.max):
+            return inteiros.astype(tipo), falhas
+    return inteiros, falhas
+
+
+def _como_decimal(serie):
+    return _como_numero(serie)
+
+
+def _como_booleano(serie):
+    if pd.api.types.is_bool_dtype(serie):
+        return serie.astype('boolean'), None
+    texto = serie.astype(str).str.strip().str.upper()
+    valores = pd.Series(pd.NA, index=serie.index, dtype='boolean')
+    valores[texto.isin(VALORES_VERDADEIROS)] = True
+    valores[texto.isin(VALORES_FALSOS)] = False
+    return valores, _preenchido(serie) & valores.isnull()
+
+
+CONVERSORES = (
+    [(c, _como_categoria) for c in COLUNAS_CATEGORIA]
+    + [(c, _como_data) for c in COLUNAS_DATA]
+    + [(c, _como_inteiro) for c in COLUNAS_INTEIRO]
+    + [(c, _como_decimal) for c in COLUNAS_DECIMAL]
+    + [(c, _como_booleano) for c in COLUNAS_BOOLEANO]
+)
+
+
+def aplicar_esquema(df):
+    """
+    Converte as colunas conhecidas para os tipos do esquema.
+    Devolve (DataFrame tipado, {coluna: Series com os valores originais
+    que não puderam ser convertidos}).
+    """
+    df = df.copy()
+    falhas = {}
+    for coluna, converter in CONVERSORES:
+        if coluna not in df.columns:
+            continue
+        original = df[coluna]
+        df[coluna], falhou = converter(original)
+        if falhou is not None and falhou.any():
+            falhas[coluna] = original[falhou]
+    return df, falhas
+
+
+def resumo_falhas(falhas, exemplos=3):
+    """Tabela com a quantidade de falhas e alguns exemplos por coluna."""
+    return pd.DataFrame([
+        {'Coluna': coluna, 'Valores não convertidos': len(valores),
+         'Exemplos': ", ".join(map(str, valores.astype(str).unique()[:exemplos]))}
+        for coluna, valores in falhas.items()
+    ], columns=['Coluna', 'Valores não convertidos', 'Exemplos'])
@@ -0,0 +1,157 @@
+import datetime
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from carregamento import TAMANHO_BLOCO_PADRAO
+from motor_calculo import FINANCIAMENTOS, calcular_matricula_total_lote
+
+# =======================================================
+# EXPORTAÇÃO DOS RESULTADOS (CSV, Parquet ou XLSX)
+# Todos os ciclos com as variáveis intermediárias (QTDC ... MT, CMTD80,
+# CMTD25 e jubilamento), calculados e gravados bloco a bloco: a memória
+# usada não cresce com o tamanho da base.
+# =======================================================
+
+COLUNAS_IDENTIFICACAO = [
+    'Instituição', 'Unidade de Ensino', 'Campus', 'Tipo de Curso', 'Tipo de Oferta',
+    'Nome do curso', 'Nome_Padronizado'
+]
+LINHAS_POR_ABA_XLSX = 1_000_000
+
+
+class EscritorCSV:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.cabecalho = True
+
+    def escrever(self, bloco):
+        bloco.to_csv(self.caminho, mode='w' if self.cabecalho else 'a',
+                     header=self.cabecalho, index=False)
+        self.cabecalho = False
+
+    def fechar(self):
+        pass
+
+
+class EscritorParquet:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.escritor = None
+
+    def escrever(self, bloco):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.escritor is None:
+            tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+            self.escritor = pq.ParquetWriter(self.caminho, tabela.schema)
+        else:
+            tabela = pa.Table.from_pandas(
+                bloco, schema=self.escritor.schema, preserve_index=False)
+        self.escritor.write_table(tabela)
+
+    def fechar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+
+
+def _valor_celula(valor):
+    # openpyxl só aceita tipos nativos do Python
+    if valor is None or valor is pd.NA or valor is pd.NaT:
+        return None
+    if isinstance(valor, (float, np.floating)) and np.isnan(valor):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+class EscritorXLSX:
+    """Planilha em modo somente escrita: as linhas vão direto para o arquivo."""
+
+    def __init__(self, caminho):
+        from openpyxl import Workbook
+
+        self.caminho = caminho
+        self.livro = Workbook(write_only=True)
+        self.aba = None
+        self.linhas_aba = 0
+        self.colunas = None
+
+    def _nova_aba(self):
+        numero = len(self.livro.worksheets) + 1
+        self.aba = self.livro.create_sheet("Resultados" if numero == 1 else f"Resultados ({numero})")
+        self.aba.append(self.colunas)
+        self.linhas_aba = 0
+
+    def escrever(self, bloco):
+        if self.colunas is None:
+            self.colunas = [str(c) for c in bloco.columns]
+        for linha in bloco.itertuples(index=False, name=None):
+            if self.aba is None or self.linhas_aba >= LINHAS_POR_ABA_XLSX:
+                self._nova_aba()
+            self.aba.append([_valor_celula(v) for v in linha])
+            self.linhas_aba += 1
+
+    def fechar(self):
+        if self.aba is None:
+            self.livro.create_sheet("Resultados")
+        self.livro.save(self.caminho)
+
+
+ESCRITORES = {'csv': EscritorCSV, 'parquet': EscritorParquet, 'xlsx': EscritorXLSX}
+TIPOS_MIME = {
+    'csv': 'text/csv',
+    'parquet': 'application/octet-stream',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def montar_bloco_resultado(bloco, ano, metodologia=None):
+    resultado = calcular_matricula_total_lote(bloco, ano, metodologia=metodologia)
+    resultado['FINANCIAMENTO'] = pd.Categorical.from_codes(
+        resultado['FINANCIAMENTO'], FINANCIAMENTOS)
+    identificacao = bloco[[c for c in COLUNAS_IDENTIFICACAO if c in bloco.columns]]
+    # Texto explícito para manter o mesmo esquema entre os blocos
+    identificacao = identificacao.astype('string')
+    return pd.concat([identificacao, resultado], axis=1)
+
+
+def exportar_blocos(blocos, destino, formato='csv', ano=2024, metodologia=None):
+    """Grava os resultados de uma sequência de blocos. Devolve (linhas, MT total)."""
+    escritor = ESCRITORES[formato](destino)
+    linhas = 0
+    total_mt = 0.0
+    try:
+        for bloco in blocos:
+            saida = montar_bloco_resultado(bloco, ano, metodologia)
+            escritor.escrever(saida)
+            linhas += len(saida)
+            total_mt += saida['MT'].sum()
+    finally:
+        escritor.fechar()
+    return linhas, total_mt
+
+
+def exportar_resultados(df, destino, formato='csv', ano=2024, tamanho_bloco=TAMANHO_BLOCO_PADRAO,
+                        metodologia=None):
+    """
+    Calcula e grava todos os ciclos de um DataFrame já carregado (a base
+    inteira ou só as linhas do filtro), em fatias de tamanho_bloco linhas.
+    """
+    blocos = (df.iloc[i:i + tamanho_bloco] for i in range(0, len(df), tamanho_bloco))
+    return exportar_blocos(blocos, destino, formato, ano, metodologia)
+
+
+def exportar_para_temporario(df, formato='csv', ano=2024, metodologia=None):
+    """Exporta para um arquivo temporário e devolve o caminho (para download)."""
+    descritor, caminho = tempfile.mkstemp(
+        prefix=f"calcmt_{ano}_{datetime.date.today():%Y%m%d}_", suffix=f".{formato}")
+    os.close(descritor)
+    exportar_resultados(df, caminho, formato, ano, metodologia=metodologia)
+    return caminho
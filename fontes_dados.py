@@ -0,0 +1,253 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from atualizacao_incremental import (COL_IMPRESSAO_CHAVE, COL_IMPRESSAO_CONTEUDO,
+                                     LIMIAR_ATUALIZACAO_INCREMENTAL, DiferencaBase,
+                                     atualizar_conjunto, impressoes_linhas, linhas_da_fonte,
+                                     registrar_alteracoes, separar_impressoes, versao_impressoes)
+from carregamento import limpar_padronizar_dataframe
+from conjunto_dados import ConjuntoDados
+
+# =======================================================
+# FONTES DE DADOS DA BASE DO IFFAR
+# A base limpa fica guardada em um snapshot local (Parquet), servido de
+# imediato; a atualização a partir da fonte ocorre em segundo plano e só
+# reprocessa as linhas que mudaram (ver atualizacao_incremental).
+# =======================================================
+
+logger = logging.getLogger(__name__)
+
+TTL_PADRAO = 600
+LINHA_CABECALHO_PLANILHA = 2
+PASTA_SNAPSHOT = os.environ.get("CALCMT_SNAPSHOT_DIR", ".dados")
+
+
+class FonteGSheets:
+    """Lê a planilha do Google Sheets por meio de uma conexão já aberta."""
+
+    def __init__(self, conexao, linha_cabecalho=LINHA_CABECALHO_PLANILHA):
+        self.conexao = conexao
+        self.linha_cabecalho = linha_cabecalho
+
+    def carregar(self):
+        return self.conexao.read(header=self.linha_cabecalho, ttl=0)
+
+
+class FonteArquivoLocal:
+    """Substitui o Sheets por um arquivo local (testes e ambientes offline)."""
+
+    def __init__(self, caminho, linha_cabecalho=LINHA_CABECALHO_PLANILHA):
+        self.caminho = caminho
+        self.linha_cabecalho = linha_cabecalho
+
+    def carregar(self):
+        extensao = os.path.splitext(self.caminho)[1].lower()
+        if extensao == ".parquet":
+            return pd.read_parquet(self.caminho)
+        if extensao in (".xlsx", ".xls"):
+            return pd.read_excel(self.caminho, header=self.linha_cabecalho)
+        return pd.read_csv(self.caminho, header=self.linha_cabecalho)
+
+
+def versao_dataframe(df):
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    h = hashlib.sha256(hashes.tobytes())
+    h.update(repr(list(df.columns)).encode())
+    return h.hexdigest()
+
+
+def _preparar_para_parquet(df):
+    # Colunas com tipos misturados (ex.: números e textos) são gravadas como texto
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed"):
+            df[col] = df[col].where(df[col].isnull(), df[col].astype(str))
+    return df
+
+
+class SnapshotDados:
+    def __init__(self, fonte, caminho, ttl=TTL_PADRAO, limpar=limpar_padronizar_dataframe,
+                 somente_leitura=False):
+        # Somente leitura: outro processo (o app) grava o snapshot e o registro de
+        # alterações; aqui o arquivo só é relido quando muda no disco
+        self.fonte = fonte
+        self.somente_leitura = somente_leitura
+        self.caminho = caminho
+        self.caminho_alteracoes = os.path.splitext(caminho)[0] + ".alteracoes.jsonl"
+        self.ttl = ttl
+        self.limpar = limpar
+        self.conjunto = None
+        self.impressoes = None
+        self.atualizado_em = 0.0
+        self.ultimo_erro = None
+        self.acertos = 0
+        self._atualizando = False
+        self._trava = threading.Lock()
+
+    @property
+    def df(self):
+        return self.conjunto.df if self.conjunto else None
+
+    @property
+    def versao(self):
+        return self.conjunto.versao if self.conjunto else None
+
+    def obter(self):
+        return self.obter_conjunto().df
+
+    def obter_conjunto(self):
+        with self._trava:
+            if self.somente_leitura:
+                self._reler_se_mudou()
+                return self.conjunto
+            if self.conjunto is None:
+                self._ler_snapshot()
+            if self.conjunto is None:
+                # Primeira execução sem snapshot: não há o que servir, espera a fonte
+                self._atualizar()
+                return self.conjunto
+            self.acertos += 1
+            if time.time() - self.atualizado_em > self.ttl and not self._atualizando:
+                self._atualizando = True
+                threading.Thread(target=self._atualizar_em_segundo_plano,
+                                 daemon=True).start()
+            return self.conjunto
+
+    def _ler_snapshot(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            df, impressoes = separar_impressoes(pd.read_parquet(self.caminho))
+        except Exception as e:
+            logger.warning("Snapshot %s ilegível: %s", self.caminho, e)
+            return
+        if impressoes is not None and len(impressoes) == len(df):
+            self.conjunto = ConjuntoDados(df, versao_impressoes(impressoes))
+            self.impressoes = impressoes
+        else:
+            self.conjunto = ConjuntoDados(df, versao_dataframe(df))
+        self.atualizado_em = os.path.getmtime(self.caminho)
+
+    def _reler_se_mudou(self):
+        if not os.path.exists(self.caminho):
+            return
+        if self.conjunto is None or os.path.getmtime(self.caminho) != self.atualizado_em:
+            self.acertos = 0
+            self._ler_snapshot()
+        else:
+            self.acertos += 1
+
+    def _limpar_linhas(self, df):
+        # Mesmo formato do snapshot em disco, para que as versões sejam comparáveis
+        return _preparar_para_parquet(self.limpar(df))
+
+    def _carregar_da_fonte(self):
+        df, impressoes = separar_impressoes(self.fonte.carregar())
+        linhas = linhas_da_fonte(df)
+        if impressoes is None or len(impressoes) != len(linhas):
+            impressoes = impressoes_linhas(linhas)
+        return linhas, impressoes
+
+    def _montar_conjunto(self, linhas, impressoes):
+        """
+        Devolve (conjunto novo, registro das alterações), ou (None, None) se a
+        fonte não mudou. Com impressões da versão anterior, só as linhas
+        inseridas ou alteradas são limpas e calculadas.
+        """
+        versao = versao_impressoes(impressoes)
+        if versao == self.versao:
+            return None, None
+        anterior, impressoes_anteriores = self.conjunto, self.impressoes
+        if anterior is not None and impressoes_anteriores is not None:
+            try:
+                diferenca = DiferencaBase(impressoes_anteriores, impressoes)
+                if diferenca.vazia:
+                    return None, None
+                if diferenca.proporcao_alterada <= LIMIAR_ATUALIZACAO_INCREMENTAL:
+                    novo = atualizar_conjunto(anterior, linhas, diferenca, self._limpar_linhas, versao)
+                    return novo, registrar_alteracoes(anterior, novo, diferenca)
+            except Exception as e:
+                logger.warning("Atualização incremental falhou, remontando a base: %s", e)
+        return ConjuntoDados(self._limpar_linhas(linhas), versao), None
+
+    def _substituir(self, conjunto, impressoes, registro):
+        # Chamado com a trava (ou antes de haver leitores)
+        self.conjunto = conjunto
+        self.impressoes = impressoes if len(impressoes) == len(conjunto.df) else None
+        if registro is not None:
+            logger.info("Base atualizada: %d inseridas, %d alteradas, %d removidas (ΔMT %.2f)",
+                        registro['inseridas'], registro['alteradas'],
+                        registro['removidas'], registro['delta_mt'])
+
+    def _atualizar(self):
+        linhas, impressoes = self._carregar_da_fonte()
+        conjunto, registro = self._montar_conjunto(linhas, impressoes)
+        if conjunto is not None:
+            self._gravar_snapshot(conjunto.df, impressoes)
+            self._gravar_alteracoes(registro)
+            self._substituir(conjunto, impressoes, registro)
+        self.atualizado_em = time.time()
+        self.ultimo_erro = None
+
+    def _atualizar_em_segundo_plano(self):
+        try:
+            linhas, impressoes = self._carregar_da_fonte()
+            conjunto, registro = self._montar_conjunto(linhas, impressoes)
+            if conjunto is not None:
+                self._gravar_snapshot(conjunto.df, impressoes)
+                self._gravar_alteracoes(registro)
+            with self._trava:
+                if conjunto is not None:
+                    self._substituir(conjunto, impressoes, registro)
+                self.atualizado_em = time.time()
+                self.ultimo_erro = None
+        except Exception as e:
+            # Fonte indisponível: continua servindo o snapshot atual
+            logger.warning("Falha ao atualizar a base a partir da fonte: %s", e)
+            with self._trava:
+                self.ultimo_erro = e
+                self.atualizado_em = time.time()
+        finally:
+            self._atualizando = False
+
+    def _gravar_snapshot(self, df, impressoes=None):
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f"{self.caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            df = _preparar_para_parquet(df)
+            if impressoes is not None and len(impressoes) == len(df):
+                # Impressões no mesmo arquivo: snapshot e impressões nunca se desencontram
+                df[COL_IMPRESSAO_CHAVE] = impressoes[COL_IMPRESSAO_CHAVE].to_numpy()
+                df[COL_IMPRESSAO_CONTEUDO] = impressoes[COL_IMPRESSAO_CONTEUDO].to_numpy()
+            df.to_parquet(temporario, index=False)
+            os.replace(temporario, self.caminho)
+        except Exception as e:
+            logger.warning("Não foi possível gravar o snapshot %s: %s", self.caminho, e)
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    def _gravar_alteracoes(self, registro):
+        if registro is None:
+            return
+        try:
+            with open(self.caminho_alteracoes, "a", encoding="utf-8") as arquivo:
+                arquivo.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            logger.warning("Não foi possível registrar as alterações em %s: %s",
+                           self.caminho_alteracoes, e)
+
+    def alteracoes(self, n=20):
+        """Os n registros de alteração mais recentes (o mais novo primeiro)."""
+        if not os.path.exists(self.caminho_alteracoes):
+            return []
+        with open(self.caminho_alteracoes, encoding="utf-8") as arquivo:
+            linhas = arquivo.readlines()[-n:]
+        return [json.loads(linha) for linha in reversed(linhas) if linha.strip()]
@@ -0,0 +1,122 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from carregamento import remover_acentos
+from correcoes_nomes import nomes_cursos_substituicoes
+from metodologia import metodologia_do_ano
+from motor_calculo import COL_FINANCIAMENTO, FINANCIAMENTOS
+
+# =======================================================
+# GERADOR DE PLANILHAS FASE 4 SINTÉTICAS
+# Dados fictícios com o mesmo cabeçalho da planilha real, datas em formatos
+# misturados e nomes com e sem acento, para medir desempenho sem depender
+# da base do IFFar nem de acesso à rede.
+# =======================================================
+
+COLUNAS_FASE4 = [
+    'Instituição', 'Unidade de Ensino', 'Tipo de Curso', 'Tipo de Oferta',
+    'Nome do curso', 'DIC - Data de Início do Ciclo', 'DTC - Data de Término do Ciclo',
+    'CHC - Carga Horária do Ciclo', 'CHMC - Carga Horária Mínima do Catálogo',
+    'PC - Peso do Curso', 'QTM1P - Quantidade de Matrículas no Primeiro Período',
+    'Agropecuária', COL_FINANCIAMENTO, 'Apto'
+]
+
+CAMPI = [nome for original, corrigido in nomes_cursos_substituicoes.items()
+         if original.startswith('CAMPUS') for nome in (original, corrigido)]
+TIPOS_CURSO = ['TÉCNICO', 'TECNICO', 'QUALIFICAÇÃO PROFISSIONAL (FIC)',
+               'QUALIFICACAO PROFISSIONAL (FIC)', 'LICENCIATURA', 'BACHARELADO',
+               'TECNOLOGIA', 'ESPECIALIZAÇÃO (LATO SENSU)', 'MESTRADO', 'DOUTORADO']
+TIPOS_OFERTA = ['INTEGRADO', 'SUBSEQUENTE', 'CONCOMITANTE', 'PROEJA', 'NÃO SE APLICA']
+CARGAS_HORARIAS = [160, 200, 400, 800, 1000, 1200, 2400, 3200]
+# Fração de linhas com PC inválido (fora da tabela ou ilegível), para
+# exercitar as regras de qualidade; as demais usam os pesos da Portaria
+FRACAO_PC_INVALIDO = 0.02
+PESOS_INVALIDOS = ['4,5', 2.5, 'n/d']
+ORIGEM_EXCEL = datetime.date(1899, 12, 30)
+
+
+def _nomes_cursos():
+    # Grafia corrigida e grafia sem acento (ou minúscula) de cada curso
+    nomes = []
+    for original, corrigido in nomes_cursos_substituicoes.items():
+        if original.startswith('CAMPUS'):
+            continue
+        nomes += [corrigido, original, remover_acentos(corrigido).title()]
+    return nomes
+
+
+def _formatar_datas(datas, formatos):
+    # 0: data; 1: texto DD/MM/AAAA; 2: texto ISO; 3: número de série do Excel
+    valores = np.empty(len(datas), dtype=object)
+    for i, (data, formato) in enumerate(zip(datas, formatos)):
+        if formato == 0:
+            valores[i] = datetime.datetime(data.year, data.month, data.day)
+        elif formato == 1:
+            valores[i] = data.strftime('%d/%m/%Y')
+        elif formato == 2:
+            valores[i] = data.isoformat()
+        else:
+            valores[i] = (data - ORIGEM_EXCEL).days
+    return valores
+
+
+def _pesos_validos():
+    # Cada peso da metodologia vigente como número, texto com vírgula e com ponto
+    pesos = []
+    for peso in metodologia_do_ano().pesos_curso:
+        pesos += [peso, f"{peso:g}".replace('.', ','), f"{peso:.1f}"]
+    return pesos
+
+
+def _sortear_pesos(rng, linhas):
+    pesos = rng.choice(np.asarray(_pesos_validos(), dtype=object), linhas)
+    invalidos = rng.random(linhas) < FRACAO_PC_INVALIDO
+    pesos[invalidos] = rng.choice(np.asarray(PESOS_INVALIDOS, dtype=object), invalidos.sum())
+    return pesos
+
+
+def gerar_dataframe_fase4(linhas, semente=0):
+    """DataFrame com o conteúdo bruto (antes da limpeza) de uma planilha Fase 4."""
+    rng = np.random.default_rng(semente)
+    cursos = _nomes_cursos()
+
+    inicio = np.datetime64('2018-01-01') + rng.integers(0, 7 * 365, linhas).astype('timedelta64[D]')
+    duracao = rng.choice([90, 180, 365, 730, 1095, 1460], linhas) + rng.integers(-30, 30, linhas)
+    termino = inicio + duracao.astype('timedelta64[D]')
+    formatos = rng.integers(0, 4, linhas)
+
+    return pd.DataFrame({
+        'Instituição': 'INSTITUTO FEDERAL FARROUPILHA',
+        'Unidade de Ensino': rng.choice(CAMPI, linhas),
+        'Tipo de Curso': rng.choice(TIPOS_CURSO, linhas),
+        'Tipo de Oferta': rng.choice(TIPOS_OFERTA, linhas),
+        'Nome do curso': rng.choice(cursos, linhas),
+        'DIC - Data de Início do Ciclo': _formatar_datas(inicio.astype(object), formatos),
+        'DTC - Data de Término do Ciclo': _formatar_datas(termino.astype(object), formatos),
+        'CHC - Carga Horária do Ciclo': rng.choice(CARGAS_HORARIAS, linhas),
+        'CHMC - Carga Horária Mínima do Catálogo': rng.choice(CARGAS_HORARIAS, linhas),
+        'PC - Peso do Curso': _sortear_pesos(rng, linhas),
+        'QTM1P - Quantidade de Matrículas no Primeiro Período': rng.integers(1, 45, linhas),
+        'Agropecuária': rng.choice(['Sim', 'Não', 'NÃO', 'S'], linhas, p=[0.2, 0.6, 0.1, 0.1]),
+        COL_FINANCIAMENTO: rng.choice(FINANCIAMENTOS, linhas, p=[0.8, 0.1, 0.1]),
+        'Apto': rng.choice(['SIM', 'NÃO'], linhas, p=[0.9, 0.1]),
+    }, columns=COLUNAS_FASE4)
+
+
+def gerar_planilha_fase4(caminho, linhas, semente=0):
+    """Grava um .xlsx no leiaute da Fase 4: aba de instruções, título e cabeçalho na 3ª linha."""
+    from openpyxl import Workbook
+
+    df = gerar_dataframe_fase4(linhas, semente)
+    wb = Workbook(write_only=True)
+    wb.create_sheet("Instruções").append(["Planilha sintética para medição de desempenho"])
+    aba = wb.create_sheet("Fase 4")
+    aba.append(["MATRIZ DE DISTRIBUIÇÃO ORÇAMENTÁRIA - FASE 4"])
+    aba.append([])
+    aba.append(COLUNAS_FASE4)
+    for linha in df.itertuples(index=False):
+        aba.append([v.item() if isinstance(v, np.generic) else v for v in linha])
+    wb.save(caminho)
+    return caminho
@@ -0,0 +1,109 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from motor_calculo import normalizar_datas
+
+# =======================================================
+# ÍNDICE HIERÁRQUICO DOS FILTROS EM CASCATA (ex.: Campus → Tipo → Curso → Ciclo)
+# Montado uma vez por carga de dados; cada passo do filtro vira uma consulta
+# a dicionário, sem máscaras nem cópias do DataFrame.
+# =======================================================
+
+OFERTAS_OCULTAS = ['NÃO SE APLICA', 'N/A', 'NAN']
+
+
+def _texto(serie):
+    # Mesmo texto para colunas object e categóricas (nulos viram 'nan')
+    return serie.astype(object).map(str)
+
+
+def matriculas_ciclos(df):
+    """QTM exibida de cada ciclo e se ela é válida (ciclos sem QTM ficam fora das listas)."""
+    col_qtm = 'QTM1P' if 'QTM1P' in df.columns else 'QTM' if 'QTM' in df.columns else None
+    if col_qtm:
+        qtm = df[col_qtm]
+        valido = qtm.notnull() & (_texto(qtm).str.strip().str.lower() != 'nan')
+        qtm_str = _texto(qtm)
+    else:
+        valido = pd.Series(True, index=df.index)
+        qtm_str = pd.Series('0', index=df.index)
+    return valido, qtm_str
+
+
+def rotulos_ciclos(df):
+    """Rótulo exibido na lista de ciclos; None para ciclos sem matrículas."""
+    # Mesma normalização usada no cálculo: a data da lista é a da calculadora
+    dic_dt = pd.Series(normalizar_datas(df['DIC']), index=df.index)
+    dic_str = dic_dt.dt.strftime('%d/%m/%Y').where(dic_dt.notnull(), "data inválida")
+
+    if 'Tipo de Oferta' in df.columns:
+        oferta = _texto(df['Tipo de Oferta'])
+    else:
+        oferta = pd.Series('N/A', index=df.index)
+    trecho_oferta = ('| Oferta: ' + oferta).where(
+        ~oferta.str.upper().str.strip().isin(OFERTAS_OCULTAS), '')
+
+    valido, qtm_str = matriculas_ciclos(df)
+    rotulos = "Início: " + dic_str + " " + trecho_oferta + " | Matrículas: " + qtm_str
+    return rotulos.where(valido, None).to_numpy(dtype=object), dic_dt
+
+
+class IndiceCascata:
+    def __init__(self, df, niveis):
+        self.niveis = list(niveis)
+        self.rotulos, dic_dt = rotulos_ciclos(df)
+
+        # Posição de cada linha na ordem de exibição (DIC mais recente primeiro)
+        dias = dic_dt.to_numpy(dtype='datetime64[D]').astype(np.int64)
+        sem_data = dic_dt.isnull().to_numpy()
+        ordem = np.lexsort((np.where(sem_data, 0, -dias), sem_data))
+        self.rank = np.empty(len(df), dtype=np.int64)
+        self.rank[ordem] = np.arange(len(df))
+
+        valores = pd.DataFrame({
+            n: _texto(df[n]).where(df[n].notnull(), None) for n in self.niveis
+        }).reset_index(drop=True)
+
+        # Para cada combinação de níveis preenchidos/curinga (None): chave -> posições
+        self._posicoes = {}
+        for preenchidos in itertools.product([True, False], repeat=len(self.niveis)):
+            colunas = [n for n, p in zip(self.niveis, preenchidos) if p]
+            if not colunas:
+                self._posicoes[(None,) * len(self.niveis)] = np.arange(len(df))
+                continue
+            grupos = valores.groupby(colunas, sort=False, dropna=True).indices
+            for chave_grupo, posicoes in grupos.items():
+                if not isinstance(chave_grupo, tuple):
+                    chave_grupo = (chave_grupo,)
+                valores_grupo = iter(chave_grupo)
+                chave = tuple(next(valores_grupo) if p else None for p in preenchidos)
+                self._posicoes[chave] = posicoes
+
+        # Opções do nível k dado o prefixo (níveis anteriores, com curingas)
+        opcoes = {}
+        for chave in self._posicoes:
+            for k, valor in enumerate(chave):
+                if valor is not None and all(v is None for v in chave[k + 1:]):
+                    opcoes.setdefault(chave[:k], set()).add(valor)
+        self._opcoes = {prefixo: sorted(v) for prefixo, v in opcoes.items()}
+
+    def _chave(self, filtros):
+        filtros = tuple(f if f else None for f in filtros)
+        return filtros + (None,) * (len(self.niveis) - len(filtros))
+
+    def opcoes(self, *prefixo):
+        prefixo = tuple(p if p else None for p in prefixo)
+        return self._opcoes.get(prefixo, [])
+
+    def posicoes(self, *filtros):
+        return self._posicoes.get(self._chave(filtros), np.array([], dtype=np.int64))
+
+    def ciclos(self, *filtros):
+        """Devolve (posições filtradas, {posição: rótulo} em ordem de exibição)."""
+        posicoes = self.posicoes(*filtros)
+        ordenadas = posicoes[np.argsort(self.rank[posicoes], kind='stable')]
+        opcoes_map = {int(p): self.rotulos[p] for p in ordenadas
+                      if self.rotulos[p] is not None}
+        return posicoes, opcoes_map
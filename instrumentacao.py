@@ -0,0 +1,94 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+# =======================================================
+# INSTRUMENTAÇÃO DAS ETAPAS (tempo, cache e memória por execução)
+# Ligada pela variável de ambiente CALCMT_INSTRUMENTACAO=1. Desligada, o
+# decorador devolve a própria função, sem nenhum custo por chamada.
+# Cada medição vira uma linha JSON no logger "calcmt.instrumentacao".
+# =======================================================
+
+ATIVO = os.environ.get("CALCMT_INSTRUMENTACAO", "").strip().lower() in ("1", "true", "sim")
+
+logger = logging.getLogger("calcmt.instrumentacao")
+if ATIVO and not logger.handlers:
+    _saida = logging.StreamHandler()
+    _saida.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_saida)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# Cada sessão do Streamlit roda seus reruns em uma thread própria
+_local = threading.local()
+
+
+def iniciar_execucao():
+    """Marca o início de um rerun: as medições seguintes ficam agrupadas nele."""
+    if not ATIVO:
+        return
+    _local.execucao = uuid.uuid4().hex[:12]
+    _local.registros = []
+
+
+def registros_execucao():
+    return list(getattr(_local, "registros", []))
+
+
+def _memoria(valor):
+    if hasattr(valor, "memory_usage"):
+        try:
+            return int(valor.memory_usage(deep=True).sum())
+        except Exception:
+            return None
+    return None
+
+
+def _registrar(registro):
+    registro["execucao"] = getattr(_local, "execucao", None)
+    if hasattr(_local, "registros"):
+        _local.registros.append(registro)
+    logger.info(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+def medir(etapa, acertos_cache=None):
+    """
+    Decorador que mede o tempo de parede da etapa e a memória do DataFrame
+    devolvido. acertos_cache, se informado, é uma função que devolve o
+    contador de acertos do cache usado pela etapa: se ele aumentar durante a
+    chamada, a etapa é registrada como acerto.
+    """
+    def decorador(funcao):
+        if not ATIVO:
+            return funcao
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            acertos_antes = acertos_cache() if acertos_cache else None
+            inicio = time.perf_counter()
+            erro = None
+            try:
+                resultado = funcao(*args, **kwargs)
+                return resultado
+            except Exception as e:
+                erro = e
+                resultado = None
+                raise
+            finally:
+                registro = {
+                    "etapa": etapa,
+                    "segundos": round(time.perf_counter() - inicio, 6),
+                    "memoria_bytes": _memoria(resultado),
+                    "cache": None,
+                    "erro": repr(erro) if erro else None,
+                    "instante": time.time(),
+                }
+                if acertos_cache:
+                    registro["cache"] = "acerto" if acertos_cache() > acertos_antes else "falha"
+                _registrar(registro)
+        return medida
+    return decorador
@@ -0,0 +1,192 @@
+import json
+import os
+
+import numpy as np
+
+# =======================================================
+# METODOLOGIAS DE CÁLCULO VERSIONADAS (por portaria e ano-base)
+# Cada versão reúne, em tabelas, as regras que mudam entre portarias: a
+# CHM por tipo de curso/oferta, o divisor de CH, o limite de jubilamento,
+# o bônus agro e os redutores EaD. As regras são avaliadas sobre colunas
+# inteiras (np.select e consultas por índice), e o ano de análise escolhe a
+# versão vigente, o que permite recalcular anos antigos e futuros de uma vez.
+# =======================================================
+
+# Valor de 'chm' nas regras que faz a CH da matriz seguir a CH do ciclo
+CHM_IGUAL_CHC = 'CHC'
+PARAMETROS_FORMULA = ['divisor_ch', 'dias_ano', 'limite_jubilamento',
+                      'fator_bonus_agro', 'fator_ead_proprio', 'fator_ead_externo']
+
+# Regras de CHM da Portaria MEC nº 646/2022, na ordem de precedência. Cada
+# regra casa por tipo de curso, por oferta (igual ou contendo um texto) e/ou
+# pela CHMC do catálogo; a primeira que casar define a CHM (padrão: CHMC).
+REGRAS_CHM_646_2022 = [
+    {'tipo_curso': 'QUALIFICACAO PROFISSIONAL (FIC)', 'chm': CHM_IGUAL_CHC},
+    {'tipo_curso': 'DOUTORADO', 'chm': CHM_IGUAL_CHC},
+    {'oferta_contem': 'PROEJA', 'chm': 2400},
+    {'oferta': 'INTEGRADO', 'chmc': 800, 'chm': 3000},
+    {'oferta': 'INTEGRADO', 'chmc': 1000, 'chm': 3100},
+    {'oferta': 'INTEGRADO', 'chmc': 1200, 'chm': 3200},
+]
+
+
+class Metodologia:
+    def __init__(self, versao, portaria, ano_inicial, regras_chm,
+                 divisor_ch=800, dias_ano=365, limite_jubilamento=1095,
+                 fator_bonus_agro=0.5, fator_ead_proprio=0.80, fator_ead_externo=0.25,
+                 pesos_curso=(1.0, 1.5, 2.0)):
+        self.versao = versao
+        self.portaria = portaria
+        self.ano_inicial = int(ano_inicial)
+        self.regras_chm = [dict(r) for r in regras_chm]
+        self.divisor_ch = divisor_ch
+        self.dias_ano = dias_ano
+        self.limite_jubilamento = limite_jubilamento
+        self.fator_bonus_agro = fator_bonus_agro
+        self.fator_ead_proprio = fator_ead_proprio
+        self.fator_ead_externo = fator_ead_externo
+        self.pesos_curso = list(pesos_curso)
+
+    def __repr__(self):
+        return f"Metodologia({self.versao!r}, desde {self.ano_inicial})"
+
+    @property
+    def tipos_chm_igual_chc(self):
+        """Tipos de curso em que a CH da matriz é a própria CH do ciclo."""
+        return [r['tipo_curso'] for r in self.regras_chm
+                if r['chm'] == CHM_IGUAL_CHC and set(r) == {'tipo_curso', 'chm'}]
+
+    def _casamentos(self, tipo_curso, tipo_oferta, chmc):
+        for regra in self.regras_chm:
+            casa = np.ones(len(chmc), dtype=bool)
+            if 'tipo_curso' in regra:
+                casa &= (tipo_curso == regra['tipo_curso']).to_numpy()
+            if 'oferta' in regra:
+                casa &= (tipo_oferta == regra['oferta']).to_numpy()
+            if 'oferta_contem' in regra:
+                casa &= tipo_oferta.str.contains(regra['oferta_contem'], regex=False).to_numpy()
+            if 'chmc' in regra:
+                casa &= chmc == regra['chmc']
+            yield casa
+
+    def chm(self, tipo_curso, tipo_oferta, chc, chmc):
+        """
+        CHM de cada ciclo pela tabela de regras. Tipo de curso e oferta já
+        em maiúsculas (Series de texto); CHC e CHMC como vetores numéricos.
+        """
+        chc = np.asarray(chc)
+        chmc = np.asarray(chmc)
+        condicoes = list(self._casamentos(tipo_curso, tipo_oferta, chmc))
+        escolhas = [chc if r['chm'] == CHM_IGUAL_CHC else r['chm'] for r in self.regras_chm]
+        return np.select(condicoes, escolhas, default=chmc)
+
+    def chm_segue_chc(self, tipo_curso):
+        return tipo_curso.isin(self.tipos_chm_igual_chc).to_numpy()
+
+    def parametros(self):
+        return {p: getattr(self, p) for p in PARAMETROS_FORMULA}
+
+
+def _de_dicionario(dados):
+    dados = dict(dados)
+    return Metodologia(dados.pop('versao'), dados.pop('portaria'), dados.pop('ano_inicial'),
+                       dados.pop('regras_chm', REGRAS_CHM_646_2022), **dados)
+
+
+# Versões em ordem de ano inicial; cada uma vale até a seguinte começar
+METODOLOGIAS = [
+    Metodologia('646/2022', "Portaria MEC nº 646/2022", 2022, REGRAS_CHM_646_2022),
+]
+
+
+def registrar_metodologia(metodologia):
+    """Inclui (ou substitui, pela versão) uma metodologia no registro."""
+    METODOLOGIAS[:] = [m for m in METODOLOGIAS if m.versao != metodologia.versao]
+    METODOLOGIAS.append(metodologia)
+    METODOLOGIAS.sort(key=lambda m: m.ano_inicial)
+
+
+def carregar_metodologias(caminho):
+    """
+    Registra as versões descritas em um arquivo JSON: lista de objetos com
+    versao, portaria, ano_inicial e, opcionais, regras_chm e os parâmetros
+    de Metodologia (os ausentes assumem os valores da 646/2022).
+    """
+    with open(caminho, encoding='utf-8') as f:
+        for dados in json.load(f):
+            registrar_metodologia(_de_dicionario(dados))
+
+
+def versoes_metodologia():
+    return [m.versao for m in METODOLOGIAS]
+
+
+def obter_metodologia(versao):
+    """Metodologia pela versão; uma Metodologia ou None passam direto."""
+    if versao is None or isinstance(versao, Metodologia):
+        return versao
+    for m in METODOLOGIAS:
+        if m.versao == versao:
+            return m
+    raise ValueError(f"Metodologia desconhecida: {versao} (disponíveis: {', '.join(versoes_metodologia())}).")
+
+
+def indices_por_ano(anos):
+    """Posição em METODOLOGIAS da versão vigente em cada ano (anos antes da primeira usam a primeira)."""
+    iniciais = np.asarray([m.ano_inicial for m in METODOLOGIAS])
+    indices = np.searchsorted(iniciais, np.asarray(anos), side='right') - 1
+    return np.maximum(indices, 0)
+
+
+def metodologia_do_ano(ano=None):
+    """Versão vigente no ano de análise; sem ano, a mais recente."""
+    if ano is None:
+        return METODOLOGIAS[-1]
+    return METODOLOGIAS[int(indices_por_ano(ano))]
+
+
+def agrupar_anos(anos):
+    """Anos de análise agrupados pela versão vigente em cada um, na ordem dada."""
+    grupos = {}
+    for ano, indice in zip(anos, indices_por_ano(list(anos))):
+        grupos.setdefault(METODOLOGIAS[indice], []).append(ano)
+    return grupos
+
+
+def parametros_formula(ano, metodologia=None):
+    """
+    Parâmetros da fórmula para a metodologia informada ou, sem ela, os da
+    versão vigente em cada ano: consulta vetorizada, com o mesmo formato de
+    `ano` (escalar, vetor por ciclo ou linha de anos da projeção).
+    """
+    if metodologia is not None:
+        return obter_metodologia(metodologia).parametros()
+    if len(METODOLOGIAS) == 1 or np.ndim(ano) == 0:
+        return metodologia_do_ano(ano).parametros()
+    indices = indices_por_ano(ano)
+    return {p: np.asarray([getattr(m, p) for m in METODOLOGIAS])[indices]
+            for p in PARAMETROS_FORMULA}
+
+
+def aplicar_por_metodologia(n, calcular, metodologia=None, ano=None):
+    """
+    Aplica calcular(metodologia, linhas) a cada grupo de linhas regido pela
+    mesma versão: a indicada, a vigente no ano (escalar) ou, com um ano por
+    linha, a vigente no ano de cada linha. Devolve um vetor de n posições.
+    """
+    if metodologia is not None or ano is None or np.ndim(ano) == 0:
+        m = obter_metodologia(metodologia) or metodologia_do_ano(ano)
+        return calcular(m, np.ones(n, dtype=bool))
+    indices = np.broadcast_to(indices_por_ano(ano), (n,))
+    resultado = None
+    for indice in np.unique(indices):
+        linhas = indices == indice
+        parte = calcular(METODOLOGIAS[indice], linhas)
+        if resultado is None:
+            resultado = np.empty(n, dtype=parte.dtype)
+        resultado[linhas] = parte
+    return resultado if resultado is not None else np.empty(0)
+
+
+if os.environ.get("CALCMT_METODOLOGIAS"):
+    carregar_metodologias(os.environ["CALCMT_METODOLOGIAS"])
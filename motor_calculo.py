@@ -0,0 +1,353 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from metodologia import aplicar_por_metodologia, parametros_formula
+
+# =======================================================
+# MOTOR DE CÁLCULO DA MATRÍCULA TOTAL
+# Opera sobre colunas inteiras (NumPy), sem dependência do Streamlit; pode
+# ser importado por scripts e rotinas em lote sem carregar a interface.
+# Regras e parâmetros vêm da metodologia (metodologia.py): a indicada ou,
+# sem ela, a vigente no ano de análise.
+# =======================================================
+
+DIAS_ANO = 365
+
+# A posição na lista é o código usado nos vetores de financiamento
+FINANCIAMENTOS = ["PRESENCIAL", "EAD FINANCIAMENTO EXTERNO", "EAD PRÓPRIO"]
+FIN_PRESENCIAL, FIN_EAD_EXTERNO, FIN_EAD_PROPRIO = 0, 1, 2
+
+# Formatos de data aceitos nas colunas DIC/DTC (e DIP/DFP)
+PADRAO_DATA_ISO = r'^\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$'
+PADRAO_DATA_BR = r'^\d{1,2}/\d{1,2}/\d{4}(?: \d{2}:\d{2}(?::\d{2})?)?$'
+PADRAO_SERIAL_EXCEL = r'^\d+(?:\.0+)?$'
+ORIGEM_SERIAL_EXCEL = np.datetime64('1899-12-30', 'D')
+SERIAL_EXCEL_MINIMO, SERIAL_EXCEL_MAXIMO = 3654, 73050  # de 1910 a 2099
+
+COL_FINANCIAMENTO = 'Situação de acordo com o tipo de financiamento'
+COLUNAS_AGRO = ['Agropecuária', 'AGROPECUÁRIA', 'Curso de Agropecuária']
+COLUNAS_QTM = ['QTM1P', 'QTM']
+
+COLUNAS_RESULTADO = [
+    "QTDC", "CHMD", "CHA", "FECH",
+    "DACP1", "DACP2", "DACP3", "DACP4", "DACP5",
+    "FEDA", "FECHDA", "MECHDA", "MP", "BA", "CMTD80", "CMTD25", "MT"
+]
+
+
+# =======================================================
+# FUNÇÕES ESCALARES (um ciclo por vez, usadas pela calculadora)
+# =======================================================
+
+
+def calcular_chm(tipo_curso, tipo_oferta, chc, chmc, metodologia=None):
+    chm = calcular_chm_lote(pd.Series([tipo_curso], dtype=object),
+                            pd.Series([tipo_oferta], dtype=object),
+                            [chc], [chmc], metodologia)
+    return int(chm[0])
+
+
+def get_val(row, keys, default=None):
+    if row is None:
+        return default
+    if isinstance(keys, str):
+        keys = [keys]
+    for k in keys:
+        if k in row.index and pd.notnull(row[k]):
+            return row[k]
+    return default
+
+
+def converter_para_data(valor):
+    """Mesma regra de normalizar_datas, para um único valor; None se inválido."""
+    if valor is None or (not isinstance(valor, str) and pd.isnull(valor)) or valor == "":
+        return None
+    if isinstance(valor, datetime.date) and not isinstance(valor, datetime.datetime):
+        return valor
+    data = normalizar_datas(pd.Series([valor], dtype=object))[0]
+    return None if np.isnat(data) else data.astype(datetime.date)
+
+
+def converter_para_numero(valor):
+    """Número (aceita vírgula decimal) ou None se ausente ou inválido."""
+    if valor is None or (not isinstance(valor, str) and pd.isnull(valor)):
+        return None
+    try:
+        numero = float(str(valor).strip().replace(',', '.'))
+    except ValueError:
+        return None
+    return None if np.isnan(numero) else numero
+
+
+# =======================================================
+# FUNÇÕES VETORIZADAS (todos os ciclos de uma vez)
+# =======================================================
+
+
+def _coalescer(df, colunas, default):
+    # Equivalente vetorizado do get_val: primeira coluna não nula, na ordem
+    if isinstance(colunas, str):
+        colunas = [colunas]
+    presentes = [c for c in colunas if c in df.columns]
+    if len(presentes) == 1 and default is None:
+        # Uma só coluna e sem valor padrão: preserva o tipo (ex.: datetime64)
+        return df[presentes[0]]
+    resultado = pd.Series(default, index=df.index, dtype=object)
+    for col in reversed(colunas):
+        if col in df.columns:
+            resultado = df[col].astype(object).where(df[col].notnull(), resultado)
+    return resultado
+
+
+def _texto_upper(serie):
+    return serie.astype(str).str.strip().str.upper()
+
+
+def _para_inteiro(serie):
+    numeros = pd.to_numeric(serie, errors='coerce').fillna(0)
+    return np.trunc(numeros.to_numpy(dtype=float)).astype(np.int64)
+
+
+def normalizar_datas(serie):
+    """
+    Converte uma coluna de datas em datetime64[D] de uma só vez, um valor
+    distinto por vez. Datas já convertidas e textos ISO (AAAA-MM-DD) passam
+    por uma única conversão ISO 8601; só os valores que sobrarem são
+    classificados pelo formato (ISO com espaços, DD/MM/AAAA ou número de
+    série do Excel) e convertidos com o formato explícito. O que não se
+    encaixa em nenhum vira NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.to_numpy().astype('datetime64[D]')
+
+    if pd.api.types.infer_dtype(serie, skipna=True) in ('datetime', 'date', 'datetime64'):
+        return pd.to_datetime(pd.Series(serie), errors='coerce').to_numpy().astype('datetime64[D]')
+
+    # Datas se repetem muito entre ciclos: cada valor distinto é convertido uma vez
+    codigos, unicos = pd.factorize(pd.Series(serie, dtype=object))
+    datas = np.full(len(codigos), np.datetime64('NaT'), dtype='datetime64[D]')
+    validos = codigos >= 0
+    datas[validos] = _converter_datas(pd.Series(unicos, dtype=object))[codigos[validos]]
+    return datas
+
+
+def _converter_datas(serie):
+    tipos = serie.map(type)
+    e_data = tipos.isin([pd.Timestamp, datetime.datetime, datetime.date, np.datetime64]).to_numpy()
+    e_texto = (tipos == str).to_numpy()
+    iso = e_data.copy()
+    if e_texto.any():
+        # Só textos com os hífens de AAAA-MM-DD: "2024" ou "20240301" também passariam no ISO 8601
+        texto = serie[e_texto].astype(str)
+        iso[e_texto] = ((texto.str.slice(4, 5) == '-') & (texto.str.slice(7, 8) == '-')).to_numpy()
+    datas = np.full(len(serie), np.datetime64('NaT'), dtype='datetime64[D]')
+    if iso.any():
+        convertidas = pd.to_datetime(serie[iso], format='ISO8601', errors='coerce')
+        datas[iso] = convertidas.to_numpy().astype('datetime64[D]')
+
+    restantes = np.flatnonzero(np.isnat(datas))
+    if len(restantes):
+        datas[restantes] = _datas_por_formato(serie.iloc[restantes])
+    return datas
+
+
+def _datas_por_formato(serie):
+    # Números de série viram dígitos; datas como texto, com espaços removidos
+    datas = np.full(len(serie), np.datetime64('NaT'), dtype='datetime64[D]')
+    texto = serie.map(str).str.strip()
+
+    iso = texto.str.match(PADRAO_DATA_ISO).to_numpy()
+    if iso.any():
+        datas[iso] = pd.to_datetime(texto[iso], format='%Y-%m-%d', exact=False,
+                                    errors='coerce').to_numpy()
+    brasil = texto.str.match(PADRAO_DATA_BR).to_numpy()
+    if brasil.any():
+        datas[brasil] = pd.to_datetime(texto[brasil], format='%d/%m/%Y', exact=False,
+                                       errors='coerce').to_numpy()
+    serial = texto.str.match(PADRAO_SERIAL_EXCEL).to_numpy()
+    if serial.any():
+        dias = pd.to_numeric(texto[serial], errors='coerce').to_numpy()
+        plausivel = (dias >= SERIAL_EXCEL_MINIMO) & (dias <= SERIAL_EXCEL_MAXIMO)
+        datas[serial] = np.where(
+            plausivel,
+            ORIGEM_SERIAL_EXCEL + np.nan_to_num(dias).astype(np.int64).astype('timedelta64[D]'),
+            np.datetime64('NaT'))
+    return datas
+
+
+def codificar_financiamento(serie):
+    texto = serie.astype(str)
+    upper = texto.str.upper()
+    return np.select(
+        [texto == FINANCIAMENTOS[FIN_PRESENCIAL],
+         texto == FINANCIAMENTOS[FIN_EAD_EXTERNO],
+         texto == FINANCIAMENTOS[FIN_EAD_PROPRIO],
+         upper.str.contains("EAD FP", regex=False),
+         upper.str.contains("EAD", regex=False)],
+        [FIN_PRESENCIAL, FIN_EAD_EXTERNO, FIN_EAD_PROPRIO,
+         FIN_EAD_PROPRIO, FIN_EAD_EXTERNO],
+        default=FIN_PRESENCIAL
+    ).astype(np.int8)
+
+
+def _texto_tipo_curso(tipo_curso):
+    # astype(object): colunas categóricas não aceitam "" no fillna
+    return tipo_curso.astype(object).fillna("").astype(str).str.upper()
+
+
+def calcular_chm_lote(tipo_curso, tipo_oferta, chc, chmc, metodologia=None, ano=None):
+    tipo_curso_upper = _texto_tipo_curso(tipo_curso)
+    tipo_oferta_upper = _texto_upper(tipo_oferta.astype(object).fillna(""))
+    chc = np.asarray(chc)
+    chmc = np.asarray(chmc)
+    return aplicar_por_metodologia(
+        len(chc),
+        lambda m, linhas: m.chm(tipo_curso_upper[linhas], tipo_oferta_upper[linhas],
+                                chc[linhas], chmc[linhas]),
+        metodologia, ano)
+
+
+def preparar_entradas(df, metodologia=None, ano=None):
+    """
+    Extrai do DataFrame limpo os parâmetros de cada ciclo, já tipados. A CHM
+    segue a metodologia indicada ou a vigente no ano (um ano por ciclo é aceito).
+    """
+    vazio = pd.Series(index=df.index, dtype=object)
+    tipo_curso = df['Tipo de Curso'] if 'Tipo de Curso' in df.columns else vazio
+    texto_tipo_curso = _texto_tipo_curso(tipo_curso)
+    chc = _para_inteiro(_coalescer(df, 'CHC', 0))
+    chmc = _para_inteiro(_coalescer(df, 'CHMC', 0))
+    pc = pd.to_numeric(
+        _coalescer(df, 'PC', 1.0).astype(str).str.replace(',', '.', regex=False),
+        errors='coerce').fillna(1.0)
+
+    entradas = pd.DataFrame({
+        'DIC': normalizar_datas(_coalescer(df, 'DIC', None)),
+        'DTC': normalizar_datas(_coalescer(df, 'DTC', None)),
+        'CHC': chc,
+        'CHMC': chmc,
+        'CHM': calcular_chm_lote(
+            tipo_curso,
+            df['Tipo de Oferta'] if 'Tipo de Oferta' in df.columns else vazio,
+            chc, chmc, metodologia, ano),
+        'CHM_SEGUE_CHC': aplicar_por_metodologia(
+            len(df), lambda m, linhas: m.chm_segue_chc(texto_tipo_curso[linhas]),
+            metodologia, ano),
+        'PC': pc.to_numpy(dtype=float),
+        'QTM': _para_inteiro(_coalescer(df, COLUNAS_QTM, 0)),
+        'AGRO': _texto_upper(_coalescer(df, COLUNAS_AGRO, "Não")).isin(
+            ['SIM', 'S', 'TRUE', '1']).to_numpy(),
+        'FINANCIAMENTO': codificar_financiamento(
+            _coalescer(df, COL_FINANCIAMENTO, FINANCIAMENTOS[FIN_PRESENCIAL])),
+        # Apto pode vir como texto (SIM/NÃO) ou já convertido para booleano
+        'JUBILADO': _texto_upper(_coalescer(df, 'Apto', "SIM")).isin(
+            ["NÃO", "FALSE"]).to_numpy(),
+    }, index=df.index)
+    return entradas
+
+
+def _inicio_ano(ano):
+    return (np.asarray(ano) - 1970).astype('datetime64[Y]').astype('datetime64[D]')
+
+
+def calcular_formula(dic, dtc, chc, chm, qtm, pc, agro, financiamento, ano, metodologia=None):
+    """
+    Aplica a fórmula da Fase 4 a vetores (ou escalares) com broadcasting.
+    Datas em datetime64[D]; financiamento pelo código de FINANCIAMENTOS.
+    Sem metodologia, os parâmetros são os da versão vigente em cada ano.
+    """
+    p = parametros_formula(ano, metodologia)
+    epoca = np.datetime64('1970-01-01', 'D')
+    dia_ic = (np.asarray(dic, dtype='datetime64[D]') - epoca) / np.timedelta64(1, 'D')
+    dia_tc = (np.asarray(dtc, dtype='datetime64[D]') - epoca) / np.timedelta64(1, 'D')
+    inicio = _inicio_ano(ano)
+    dip = (inicio - epoca) / np.timedelta64(1, 'D')
+    dfp = (_inicio_ano(np.asarray(ano) + 1) - epoca) / np.timedelta64(1, 'D') - 1
+
+    chc = np.asarray(chc, dtype=float)
+    chm = np.asarray(chm, dtype=float)
+    qtm = np.asarray(qtm, dtype=float)
+    pc = np.asarray(pc, dtype=float)
+    agro = np.asarray(agro, dtype=bool)
+    financiamento = np.asarray(financiamento)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        qtdc = dia_tc - dia_ic + 1
+        longo = qtdc > p['dias_ano']
+        chmd = np.where(qtdc > 0, np.minimum(chm, chc) / qtdc, 0.0)
+        cha = np.where(longo, chmd * p['dias_ano'], chm)
+        fech = np.where(longo, cha / p['divisor_ch'], chc / p['divisor_ch'])
+
+        # Dias ativos no período
+        dias_periodo = dfp - dip + 1
+        dacp1 = np.where((dia_ic < dip) & (dia_tc > dfp), dias_periodo, 0)
+        dacp2 = np.where((dia_ic >= dip) & (dia_tc > dfp) & (dia_ic < dfp),
+                         dfp - dia_ic + 1, 0)
+        dacp3 = np.where((dia_ic < dip) & (dia_tc <= dfp) & (dia_tc >= dip),
+                         dia_tc - dip + 1, 0)
+        dacp4 = np.where((dia_ic >= dip) & (dia_tc <= dfp), dia_tc - dia_ic + 1, 0)
+        dacp5 = np.where((dia_ic < dip) & (dia_tc < dip), dias_periodo / 2, 0)
+
+        feda = (dacp1 + dacp2 + dacp3 + dacp4 + dacp5) / dias_periodo
+        fechda = fech * feda
+
+        mechda = np.select(
+            [dacp5 == 0, (dip - dia_tc) > p['limite_jubilamento']],
+            [fechda * qtm, 0.0],
+            default=fechda * (qtm / 2)
+        )
+
+        mp = mechda * pc
+        ba = np.where(agro, mp * p['fator_bonus_agro'], 0.0)
+        cmtd80 = np.where(financiamento == FIN_EAD_PROPRIO, mp * p['fator_ead_proprio'], 0.0)
+        cmtd25 = np.where(financiamento == FIN_EAD_EXTERNO, mp * p['fator_ead_externo'], 0.0)
+        mt = np.select(
+            [financiamento == FIN_PRESENCIAL,
+             financiamento == FIN_EAD_PROPRIO,
+             financiamento == FIN_EAD_EXTERNO],
+            [mp + ba, cmtd80, cmtd25],
+            default=0.0
+        )
+
+    valores = dict(zip(COLUNAS_RESULTADO, [
+        qtdc, chmd, cha, fech, dacp1, dacp2, dacp3, dacp4, dacp5,
+        feda, fechda, mechda, mp, ba, cmtd80, cmtd25, mt]))
+
+    # Ciclos sem datas válidas não têm resultado
+    invalido = np.isnan(dia_ic) | np.isnan(dia_tc)
+    if invalido.any():
+        valores = {k: np.where(invalido, np.nan, v) for k, v in valores.items()}
+    return valores
+
+
+def calcular_ciclo(dic, dtc, chc, chm, qtm, pc, agro, financiamento, ano, metodologia=None):
+    """Versão escalar usada pela calculadora interativa."""
+    valores = calcular_formula(dic, dtc, chc, chm, qtm, pc, agro, financiamento, ano, metodologia)
+    resultado = {k: float(v) for k, v in valores.items()}
+    for k in ["QTDC", "DACP1", "DACP2", "DACP3", "DACP4"]:
+        resultado[k] = int(resultado[k])
+    resultado["DACP5"] = resultado["DACP5"] or 0
+    return resultado
+
+
+def calcular_matricula_total_lote(df, ano_periodo=2024, entradas=None, metodologia=None):
+    """
+    Calcula todas as variáveis intermediárias e a MT de todos os ciclos
+    de um DataFrame saído de limpar_padronizar_dataframe.
+    Ciclos jubilados (Apto = NÃO) ficam com MT zerada.
+    """
+    if entradas is None:
+        entradas = preparar_entradas(df, metodologia, ano_periodo)
+    valores = calcular_formula(
+        entradas['DIC'].to_numpy(), entradas['DTC'].to_numpy(),
+        entradas['CHC'].to_numpy(), entradas['CHM'].to_numpy(),
+        entradas['QTM'].to_numpy(), entradas['PC'].to_numpy(),
+        entradas['AGRO'].to_numpy(), entradas['FINANCIAMENTO'].to_numpy(),
+        ano_periodo, metodologia)
+
+    resultado = pd.concat(
+        [entradas, pd.DataFrame(valores, index=df.index)], axis=1)
+    resultado['MT'] = resultado['MT'].where(~resultado['JUBILADO'], 0.0)
+    return resultado
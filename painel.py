@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+from motor_calculo import FINANCIAMENTOS
+
+# =======================================================
+# PAINEL INSTITUCIONAL
+# Totais de MT, MECHDA e BA por campus, tipo de curso, oferta e financiamento.
+# Os agregados são montados uma vez por carga e, quando só algumas linhas da
+# base mudam, corrigidos pela diferença dessas linhas. A ordem dos ciclos de
+# cada grupo é montada na primeira consulta do detalhamento; as interações do
+# painel só fazem consultas e fatias.
+# =======================================================
+
+METRICAS_PAINEL = ['MT', 'MECHDA', 'BA']
+DIMENSAO_FINANCIAMENTO = 'Financiamento'
+
+
+def _grupos(df, resultado, dimensoes):
+    grupos = {
+        d: df[d].astype(object).map(str).where(df[d].notnull(), "(vazio)")
+        for d in dimensoes if d in df.columns
+    }
+    grupos[DIMENSAO_FINANCIAMENTO] = pd.Series(
+        np.asarray(FINANCIAMENTOS, dtype=object)[resultado['FINANCIAMENTO'].to_numpy()],
+        index=resultado.index)
+    return grupos
+
+
+def _somar(valores, chaves):
+    tabela = valores.groupby(chaves.to_numpy()).sum()
+    tabela['Ciclos'] = chaves.value_counts().reindex(tabela.index).to_numpy()
+    return tabela
+
+
+def _ordenar(tabela, dimensao):
+    return tabela.sort_values('MT', ascending=False).rename_axis(dimensao)
+
+
+class PainelInstitucional:
+    def __init__(self, df, resultado, dimensoes):
+        self._df, self._resultado = df, resultado
+        valores = resultado[METRICAS_PAINEL].fillna(0.0)
+        self.totais = valores.sum()
+        self.total_ciclos = len(valores)
+
+        grupos = _grupos(df, resultado, dimensoes)
+        self.dimensoes = list(grupos)
+        self.agregados = {d: _ordenar(_somar(valores, chaves), d) for d, chaves in grupos.items()}
+        self._detalhe = None
+
+    def com_diferenca(self, df, resultado, df_saidas, resultado_saidas, entradas):
+        """
+        Painel da nova base (df, resultado) a partir deste, somando aos agregados
+        as linhas que entraram (posições `entradas` na nova base: alteradas e
+        inseridas) e subtraindo as que saíram (linhas da base anterior:
+        alteradas e removidas).
+        """
+        novo = PainelInstitucional.__new__(PainelInstitucional)
+        novo._df, novo._resultado = df, resultado
+        novo.dimensoes = list(self.dimensoes)
+        novo.total_ciclos = len(resultado)
+        novo._detalhe = None
+
+        resultado_entradas = resultado.iloc[entradas]
+        saiu = resultado_saidas[METRICAS_PAINEL].fillna(0.0)
+        entrou = resultado_entradas[METRICAS_PAINEL].fillna(0.0)
+        novo.totais = self.totais - saiu.sum() + entrou.sum()
+
+        grupos_saiu = _grupos(df_saidas, resultado_saidas, self.dimensoes)
+        grupos_entrou = _grupos(df.iloc[entradas], resultado_entradas, self.dimensoes)
+        novo.agregados = {}
+        for dimensao, tabela in self.agregados.items():
+            delta = _somar(entrou, grupos_entrou[dimensao]).sub(
+                _somar(saiu, grupos_saiu[dimensao]), fill_value=0)
+            tabela = tabela.add(delta, fill_value=0)
+            # Grupos que ficaram sem ciclos saem do painel
+            tabela = tabela[tabela['Ciclos'] > 0].astype({'Ciclos': 'int64'})
+            novo.agregados[dimensao] = _ordenar(tabela, dimensao)
+        return novo
+
+    def _detalhamento(self):
+        # Ciclos em ordem decrescente de MT: cada grupo guarda suas posições
+        # já nessa ordem, e o detalhamento é só uma fatia
+        if self._detalhe is None:
+            mt = self._resultado['MT'].fillna(0.0).to_numpy()
+            ordem = np.argsort(-mt, kind='stable')
+            posicoes = {
+                dimensao: pd.Series(chaves.to_numpy()[ordem]).groupby(chaves.to_numpy()[ordem]).indices
+                for dimensao, chaves in _grupos(self._df, self._resultado, self.dimensoes).items()
+            }
+            self._detalhe = (self._resultado.iloc[ordem], self._df.iloc[ordem], posicoes)
+        return self._detalhe
+
+    def ciclos_principais(self, dimensao, valor, n=10, colunas=()):
+        """Os n ciclos que mais contribuem para a MT do grupo escolhido."""
+        ciclos, linhas, grupos = self._detalhamento()
+        posicoes = grupos[dimensao].get(valor, np.array([], dtype=np.int64))[:n]
+        colunas = [c for c in colunas if c in linhas.columns]
+        return pd.concat([
+            linhas.iloc[posicoes][colunas],
+            ciclos.iloc[posicoes][['QTM'] + METRICAS_PAINEL],
+        ], axis=1)
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from auditoria import ano_da_planilha
+from metodologia import agrupar_anos, obter_metodologia
+from motor_calculo import calcular_formula, preparar_entradas
+
+# =======================================================
+# PROJEÇÃO PLURIANUAL DA MATRÍCULA TOTAL
+# Calcula a matriz ciclos × anos de análise em uma única avaliação
+# vetorizada (ciclos nas linhas, anos nas colunas, por broadcasting).
+# Sem metodologia fixa, os anos são agrupados pela versão vigente em cada um
+# e cada grupo é uma avaliação.
+# =======================================================
+
+ANOS_PADRAO = list(range(2020, 2031))
+
+
+def projetar_anos(df, anos=ANOS_PADRAO, entradas=None, metodologia=None, ano_base=None):
+    """
+    MT de cada ciclo (linhas) em cada ano de análise (colunas). `entradas`,
+    se informado, é uma função metodologia -> entradas já preparadas. O
+    jubilamento sai da fórmula, pelo limite de dias em cada ano; a marca
+    JUBILADO da planilha só zera os anos a partir de `ano_base` (padrão: o
+    ano da planilha), quando ela já valia.
+    """
+    if entradas is None:
+        def entradas(m):
+            return preparar_entradas(df, m)
+    anos = list(anos)
+    if ano_base is None:
+        ano_base = ano_da_planilha(df)
+    metodologia = obter_metodologia(metodologia)
+    grupos = {metodologia: anos} if metodologia is not None else agrupar_anos(anos)
+
+    colunas = {}
+    for m, anos_m in grupos.items():
+        e = entradas(m)
+        coluna = {c: e[c].to_numpy()[:, None] for c in
+                  ['DIC', 'DTC', 'CHC', 'CHM', 'QTM', 'PC', 'AGRO', 'FINANCIAMENTO']}
+        mt = calcular_formula(
+            coluna['DIC'], coluna['DTC'], coluna['CHC'], coluna['CHM'], coluna['QTM'],
+            coluna['PC'], coluna['AGRO'], coluna['FINANCIAMENTO'],
+            np.asarray(anos_m)[None, :], m)['MT']
+        jubilado = e['JUBILADO'].to_numpy()[:, None] & (np.asarray(anos_m) >= ano_base)[None, :]
+        mt = np.where(jubilado, 0.0, mt)
+        colunas.update(zip(anos_m, mt.T))
+    return pd.DataFrame({a: colunas[a] for a in anos}, index=df.index, columns=anos)
+
+
+def agregar_projecao(matriz, df, por):
+    """Soma a matriz ciclos × anos pelos grupos indicados (ex.: campus, tipo)."""
+    por = [c for c in ([por] if isinstance(por, str) else por) if c in df.columns]
+    if not por:
+        return matriz.sum().to_frame("Total").T
+    chaves = [df.loc[matriz.index, c].astype(str) for c in por]
+    return matriz.groupby(chaves).sum()
@@ -0,0 +1,184 @@
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from atualizacao_incremental import CHAVE_CICLO
+from metodologia import metodologia_do_ano, obter_metodologia
+from motor_calculo import COLUNAS_QTM, _inicio_ano, normalizar_datas
+
+# =======================================================
+# REGRAS DE QUALIDADE DOS DADOS
+# Cada regra é uma máscara calculada sobre a base inteira, logo após a carga.
+# O resultado é um mapa de bits por ciclo (bit i = regra i violada) e um
+# resumo por regra: a revisão da planilha vira um relatório, sem abrir ciclo
+# por ciclo na calculadora.
+# =======================================================
+
+# Campus entra na chave nas planilhas de outros IFs (Unidade de Ensino renomeada)
+CHAVE_DUPLICIDADE = CHAVE_CICLO + ['Campus']
+
+
+def _numero(df, coluna):
+    # Mesmas conversões do esquema: texto com vírgula decimal vira número, o resto NaN
+    if coluna not in df.columns:
+        return pd.Series(np.nan, index=df.index)
+    serie = df[coluna]
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return serie.astype(float)
+    return pd.to_numeric(serie.astype(str).str.strip().str.replace(',', '.', regex=False),
+                         errors='coerce')
+
+
+def _datas(df, coluna):
+    if coluna not in df.columns:
+        return np.full(len(df), np.datetime64('NaT'), dtype='datetime64[D]')
+    return normalizar_datas(df[coluna])
+
+
+class _Campos:
+    """Colunas convertidas uma única vez e compartilhadas entre as regras."""
+
+    def __init__(self, df, metodologia):
+        self.df = df
+        # Pesos de curso e limite de jubilamento da versão aplicada
+        self.metodologia = metodologia
+
+    @cached_property
+    def dic(self):
+        return _datas(self.df, 'DIC')
+
+    @cached_property
+    def dtc(self):
+        return _datas(self.df, 'DTC')
+
+    @cached_property
+    def chc(self):
+        return _numero(self.df, 'CHC').to_numpy()
+
+    @cached_property
+    def chmc(self):
+        return _numero(self.df, 'CHMC').to_numpy()
+
+    @cached_property
+    def pc(self):
+        return _numero(self.df, 'PC').to_numpy()
+
+    @cached_property
+    def qtm(self):
+        coluna = next((c for c in COLUNAS_QTM if c in self.df.columns), COLUNAS_QTM[0])
+        return _numero(self.df, coluna).to_numpy()
+
+
+def _datas_ausentes(campos, ano):
+    return np.isnat(campos.dic) | np.isnat(campos.dtc)
+
+
+def _datas_invertidas(campos, ano):
+    return ~np.isnat(campos.dic) & ~np.isnat(campos.dtc) & (campos.dtc <= campos.dic)
+
+
+def _chc_ausente(campos, ano):
+    return ~(campos.chc > 0)
+
+
+def _chmc_ausente(campos, ano):
+    return ~(campos.chmc > 0)
+
+
+def _chc_maior_chmc(campos, ano):
+    return (campos.chmc > 0) & (campos.chc > campos.chmc)
+
+
+def _pc_ausente(campos, ano):
+    return np.isnan(campos.pc)
+
+
+def _pc_fora_tabela(campos, ano):
+    na_tabela = np.isclose(campos.pc[:, None], np.asarray(campos.metodologia.pesos_curso)[None, :]).any(axis=1)
+    return ~np.isnan(campos.pc) & ~na_tabela
+
+
+def _qtm_ausente(campos, ano):
+    return np.isnan(campos.qtm)
+
+
+def _apto_inconsistente(campos, ano):
+    # Apto = NÃO (jubilado) só quando o término ficou mais de três anos antes do período
+    if 'Apto' not in campos.df.columns:
+        return np.zeros(len(campos.df), dtype=bool)
+    apto = campos.df['Apto']
+    if pd.api.types.is_bool_dtype(apto):
+        jubilado = (apto == False).fillna(False).to_numpy(dtype=bool)  # noqa: E712
+    else:
+        jubilado = apto.astype(str).str.strip().str.upper().isin(["NÃO", "FALSE"]).to_numpy()
+    vencido = (_inicio_ano(ano) - campos.dtc) > np.timedelta64(campos.metodologia.limite_jubilamento, 'D')
+    return ~np.isnat(campos.dtc) & (jubilado != vencido)
+
+
+def _ciclo_duplicado(campos, ano):
+    colunas = [c for c in CHAVE_DUPLICIDADE if c in campos.df.columns]
+    if not colunas:
+        return np.zeros(len(campos.df), dtype=bool)
+    # Códigos inteiros por coluna; DIC já normalizada (a mesma data em formatos diferentes)
+    codigos = pd.DataFrame({
+        c: pd.factorize(campos.dic if c == 'DIC' else campos.df[c].to_numpy())[0] for c in colunas
+    })
+    return codigos.duplicated(keep=False).to_numpy()
+
+
+# (código, descrição, máscara) — a posição na lista é o bit da regra
+REGRAS_QUALIDADE = [
+    ('DATA_AUSENTE', "DIC ou DTC ausente ou inválida", _datas_ausentes),
+    ('DATAS_INVERTIDAS', "Data de término não é maior que a de início", _datas_invertidas),
+    ('CHC_AUSENTE', "CHC ausente, inválida ou zero", _chc_ausente),
+    ('CHMC_AUSENTE', "CHMC ausente, inválida ou zero", _chmc_ausente),
+    ('CHC_MAIOR_CHMC', "CHC maior que a CHMC do catálogo", _chc_maior_chmc),
+    ('PC_AUSENTE', "PC ausente ou inválido (o cálculo usa 1,0)", _pc_ausente),
+    ('PC_FORA_TABELA', "PC fora da tabela de pesos da Portaria", _pc_fora_tabela),
+    ('QTM_AUSENTE', "QTM ausente (ciclo não aparece na lista)", _qtm_ausente),
+    ('APTO_INCONSISTENTE', "Apto não condiz com a data de término", _apto_inconsistente),
+    ('CICLO_DUPLICADO', "Ciclo repetido (mesma instituição, unidade, curso, DIC e oferta)", _ciclo_duplicado),
+]
+CODIGOS_REGRAS = [codigo for codigo, _, _ in REGRAS_QUALIDADE]
+DESCRICOES_REGRAS = {codigo: descricao for codigo, descricao, _ in REGRAS_QUALIDADE}
+
+
+def avaliar_qualidade(df, ano=2024, metodologia=None):
+    """Mapa de bits (uint16) por ciclo: o bit i indica a regra i de REGRAS_QUALIDADE violada."""
+    campos = _Campos(df, obter_metodologia(metodologia) or metodologia_do_ano(ano))
+    mapa = np.zeros(len(df), dtype=np.uint16)
+    for bit, (_, _, regra) in enumerate(REGRAS_QUALIDADE):
+        mapa |= np.asarray(regra(campos, ano), dtype=np.uint16) << np.uint16(bit)
+    return pd.Series(mapa, index=df.index, name='PROBLEMAS')
+
+
+def mascara_regra(mapa, codigo):
+    return (mapa.to_numpy() & np.uint16(1 << CODIGOS_REGRAS.index(codigo))) != 0
+
+
+def resumo_qualidade(mapa):
+    """Quantidade de ciclos por regra violada, na ordem das regras."""
+    return pd.DataFrame([
+        {'Regra': codigo, 'Descrição': descricao, 'Ciclos': int(mascara_regra(mapa, codigo).sum())}
+        for codigo, descricao, _ in REGRAS_QUALIDADE
+    ], columns=['Regra', 'Descrição', 'Ciclos'])
+
+
+def problemas_do_ciclo(bits):
+    """Descrições das regras violadas por um ciclo, a partir do seu valor no mapa."""
+    return [descricao for bit, (_, descricao, _) in enumerate(REGRAS_QUALIDADE)
+            if int(bits) & (1 << bit)]
+
+
+def relatorio_qualidade(df, mapa, colunas_identificacao):
+    """Ciclos com algum problema e a lista das regras violadas por cada um."""
+    com_problema = mapa.to_numpy() != 0
+    colunas = [c for c in colunas_identificacao if c in df.columns]
+    relatorio = df.loc[com_problema, colunas].copy()
+    # Um texto por combinação de regras, não por ciclo
+    codigos, combinacoes = pd.factorize(mapa.to_numpy()[com_problema])
+    textos = np.asarray([", ".join(c for bit, c in enumerate(CODIGOS_REGRAS) if int(b) & (1 << bit))
+                         for b in combinacoes], dtype=object)
+    relatorio['Problemas'] = textos[codigos]
+    return relatorio
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from motor_calculo import calcular_formula
+
+# =======================================================
+# SIMULAÇÃO DE ALTERAÇÕES EM LOTE
+# Parte da MT já calculada para a base inteira e, a cada edição, recalcula
+# só os ciclos alterados, somando a diferença (delta) aos totais da
+# instituição e de cada campus. O custo de uma edição não depende do
+# tamanho da base.
+# =======================================================
+
+COLUNAS_EDITAVEIS = ['DIC', 'DTC', 'CHC', 'CHM', 'QTM']
+COLUNAS_DATA_EDITAVEIS = ['DIC', 'DTC']
+GRUPO_VAZIO = "(vazio)"
+
+
+def _normalizar_edicao(valores):
+    """Valores vindos da grade com os mesmos tipos das entradas do cálculo."""
+    normalizados = {}
+    for coluna in COLUNAS_EDITAVEIS:
+        serie = valores[coluna]
+        if coluna in COLUNAS_DATA_EDITAVEIS:
+            normalizados[coluna] = pd.to_datetime(serie, errors='coerce').to_numpy(dtype='datetime64[D]')
+        else:
+            normalizados[coluna] = pd.to_numeric(serie, errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    return normalizados
+
+
+def _diferentes(atual, novo):
+    if np.issubdtype(atual.dtype, np.datetime64):
+        return (atual != novo) & ~(np.isnat(atual) & np.isnat(novo))
+    return atual != novo
+
+
+class SimulacaoEdicao:
+    def __init__(self, df, entradas, resultado, ano, dimensao, metodologia=None):
+        self.ano = ano
+        self.metodologia = metodologia
+        self.dimensao = dimensao
+        self._entradas_originais = entradas.reset_index(drop=True)
+        self._mt_original = np.nan_to_num(resultado['MT'].to_numpy(dtype=float))
+
+        if dimensao in df.columns:
+            grupos = df[dimensao].astype(object).map(str).where(df[dimensao].notnull(), GRUPO_VAZIO)
+        else:
+            grupos = pd.Series(GRUPO_VAZIO, index=df.index)
+        self._codigos, grupos_unicos = pd.factorize(grupos.to_numpy(), sort=True)
+        self.grupos = pd.Index(grupos_unicos)
+        self._totais_originais = np.bincount(
+            self._codigos, weights=self._mt_original, minlength=len(self.grupos))
+        self.restaurar()
+
+    def restaurar(self):
+        """Descarta todas as alterações."""
+        self.entradas = {c: self._entradas_originais[c].to_numpy(
+            dtype='datetime64[D]' if c in COLUNAS_DATA_EDITAVEIS else None).copy()
+            for c in COLUNAS_EDITAVEIS}
+        self.mt = self._mt_original.copy()
+        self.totais_grupo = self._totais_originais.copy()
+        self.total = float(self._mt_original.sum())
+
+    @property
+    def total_original(self):
+        return float(self._mt_original.sum())
+
+    def valores(self, posicoes):
+        """Valores atuais (com as alterações) das colunas editáveis."""
+        return pd.DataFrame({c: self.entradas[c][posicoes] for c in COLUNAS_EDITAVEIS})
+
+    def aplicar(self, posicoes, novos):
+        """
+        Aplica os valores editados (uma linha por posição, colunas de
+        COLUNAS_EDITAVEIS). Só os ciclos que de fato mudaram são recalculados.
+        Devolve a quantidade de ciclos recalculados.
+        """
+        posicoes = np.asarray(posicoes, dtype=np.int64)
+        novos = _normalizar_edicao(novos)
+        alterado = {c: _diferentes(self.entradas[c][posicoes], novos[c]) for c in COLUNAS_EDITAVEIS}
+        mudou = np.logical_or.reduce(list(alterado.values()))
+        if not mudou.any():
+            return 0
+
+        pos = posicoes[mudou]
+        for coluna in COLUNAS_EDITAVEIS:
+            self.entradas[coluna][pos] = novos[coluna][mudou]
+
+        # FIC e doutorado: a CHM acompanha a CHC, como na regra de carga
+        segue_chc = (self._entradas_originais['CHM_SEGUE_CHC'].to_numpy()[pos]
+                     & alterado['CHC'][mudou] & ~alterado['CHM'][mudou])
+        self.entradas['CHM'][pos[segue_chc]] = self.entradas['CHC'][pos[segue_chc]]
+
+        fixas = self._entradas_originais.iloc[pos]
+        mt = calcular_formula(
+            self.entradas['DIC'][pos], self.entradas['DTC'][pos],
+            self.entradas['CHC'][pos], self.entradas['CHM'][pos], self.entradas['QTM'][pos],
+            fixas['PC'].to_numpy(), fixas['AGRO'].to_numpy(),
+            fixas['FINANCIAMENTO'].to_numpy(), self.ano, self.metodologia)['MT']
+        mt = np.nan_to_num(np.where(fixas['JUBILADO'].to_numpy(), 0.0, mt))
+
+        delta = mt - self.mt[pos]
+        np.add.at(self.totais_grupo, self._codigos[pos], delta)
+        self.total += float(delta.sum())
+        self.mt[pos] = mt
+        return len(pos)
+
+    def total_grupo(self, grupo):
+        if grupo not in self.grupos:
+            return 0.0, 0.0
+        posicao = self.grupos.get_loc(grupo)
+        return float(self.totais_grupo[posicao]), float(self._totais_originais[posicao])
+
+    def resumo_grupos(self):
+        """MT original, simulada e diferença de cada grupo (ex.: campus)."""
+        return pd.DataFrame({
+            'MT original': self._totais_originais,
+            'MT simulada': self.totais_grupo,
+            'Diferença': self.totais_grupo - self._totais_originais,
+        }, index=pd.Index(self.grupos, name=self.dimensao))
+
+    def ciclos_alterados(self):
+        """Posições dos ciclos cuja MT mudou, com a MT original e a simulada."""
+        posicoes = np.flatnonzero(~np.isclose(self.mt, self._mt_original))
+        return pd.DataFrame({
+            'MT original': self._mt_original[posicoes],
+            'MT simulada': self.mt[posicoes],
+            'Diferença': self.mt[posicoes] - self._mt_original[posicoes],
+        }, index=posicoes)
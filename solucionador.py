@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+from metodologia import parametros_formula
+from motor_calculo import DIAS_ANO, calcular_formula, preparar_entradas
+
+# =======================================================
+# SOLUCIONADOR INVERSO: o que é preciso para atingir uma MT desejada
+# A MT é linear em QTM e linear por partes em CHC (forma fechada); para a
+# data de término usa-se bisseção vetorizada sobre a duração do ciclo,
+# dentro de trechos em que a MT não muda de regime (e por isso é monótona).
+# =======================================================
+
+DURACAO_MAXIMA = 10 * DIAS_ANO
+PASSO_GRADE_DIAS = 15
+
+
+def _mt(entradas, ano, metodologia=None, **substituir):
+    v = {c: entradas[c].to_numpy() for c in
+         ['DIC', 'DTC', 'CHC', 'CHM', 'QTM', 'PC', 'AGRO', 'FINANCIAMENTO']}
+    v.update(substituir)
+    return calcular_formula(
+        v['DIC'], v['DTC'], v['CHC'], v['CHM'], v['QTM'], v['PC'],
+        v['AGRO'], v['FINANCIAMENTO'], ano, metodologia)['MT']
+
+
+def _resultado(entradas, coluna, necessario, mt_obtida):
+    viavel = np.isfinite(necessario) & ~entradas['JUBILADO'].to_numpy()
+    return pd.DataFrame({
+        coluna: np.where(viavel, necessario, np.nan),
+        'MT_OBTIDA': np.where(viavel, mt_obtida, np.nan),
+        'VIAVEL': viavel,
+    }, index=entradas.index)
+
+
+def qtm_necessario(entradas, meta, ano=2024, metodologia=None):
+    meta = np.broadcast_to(np.asarray(meta, dtype=float), len(entradas))
+    por_matricula = _mt(entradas, ano, metodologia, QTM=np.ones(len(entradas)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        qtm = np.where(por_matricula > 0, np.ceil(meta / por_matricula), np.nan)
+    return _resultado(entradas, 'QTM_NECESSARIO', qtm, qtm * por_matricula)
+
+
+def chc_necessaria(entradas, meta, ano=2024, metodologia=None):
+    meta = np.broadcast_to(np.asarray(meta, dtype=float), len(entradas))
+    segue = entradas['CHM_SEGUE_CHC'].to_numpy()
+    chm = entradas['CHM'].to_numpy()
+    um = np.ones(len(entradas))
+
+    # MT por hora de CHC (a MT passa pela origem em CHC = 0)
+    por_hora = _mt(entradas, ano, metodologia, CHC=um, CHM=np.where(segue, um, chm))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        chc = np.where(por_hora > 0, np.ceil(meta / por_hora), np.nan)
+
+    # Ciclos longos usam min(CHM, CHC): acima da CHM a MT não cresce mais
+    qtdc = (entradas['DTC'] - entradas['DIC']).dt.days.to_numpy() + 1
+    limitado = (qtdc > parametros_formula(ano, metodologia)['dias_ano']) & ~segue & (chc > chm)
+    chc = np.where(limitado, np.nan, chc)
+    return _resultado(entradas, 'CHC_NECESSARIA', chc, chc * por_hora)
+
+
+def dtc_necessaria(entradas, meta, ano=2024, metodologia=None):
+    """Menor data de término (mantido o DIC) cuja MT alcança a meta."""
+    meta = np.broadcast_to(np.asarray(meta, dtype=float), len(entradas))
+    dic = entradas['DIC'].to_numpy(dtype='datetime64[D]')
+    segue = entradas['CHM_SEGUE_CHC'].to_numpy()
+    chm = np.where(segue, entradas['CHC'].to_numpy(), entradas['CHM'].to_numpy())
+
+    def mt_com_duracao(duracao):
+        dtc = dic[:, None] + (np.asarray(duracao) - 1).astype('timedelta64[D]')
+        linhas = {c: entradas[c].to_numpy()[:, None] for c in
+                  ['CHC', 'QTM', 'PC', 'AGRO', 'FINANCIAMENTO']}
+        return calcular_formula(
+            dic[:, None], dtc, linhas['CHC'], chm[:, None], linhas['QTM'],
+            linhas['PC'], linhas['AGRO'], linhas['FINANCIAMENTO'], ano, metodologia)['MT']
+
+    # Grade grossa mais, por ciclo, as durações em que a fórmula muda de regime
+    # (término no limite do jubilamento, no início e no fim do ano de análise;
+    # duração igual a dias_ano, onde a MT tem o pico e passa a cair). Entre
+    # dois pontos da grade a MT é monótona, e o primeiro ponto que atinge a
+    # meta fecha o intervalo da bisseção.
+    p = parametros_formula(ano, metodologia)
+    dip = np.datetime64(f"{int(ano)}-01-01", 'D')
+    dfp = np.datetime64(f"{int(ano)}-12-31", 'D')
+    limite = int(p['limite_jubilamento'])
+    terminos = np.array([dip - limite - 1, dip - limite, dip - 1, dip, dfp, dfp + 1])
+    quebras = (terminos[None, :] - dic[:, None]).astype(np.int64) + 1
+    comuns = np.array([p['dias_ano'], p['dias_ano'] + 1, DURACAO_MAXIMA])
+    grossa = np.arange(1, DURACAO_MAXIMA + 1, PASSO_GRADE_DIAS)
+    n = len(entradas)
+    grade = np.concatenate([np.broadcast_to(grossa, (n, len(grossa))), quebras,
+                            np.broadcast_to(comuns, (n, len(comuns)))], axis=1)
+    grade = np.sort(np.clip(grade, 1, DURACAO_MAXIMA), axis=1)
+
+    atinge = mt_com_duracao(grade) >= meta[:, None]
+    encontrou = atinge.any(axis=1)
+    primeiro = np.argmax(atinge, axis=1)
+    linhas = np.arange(n)
+    alto = grade[linhas, primeiro].astype(np.int64)
+    baixo = np.where(primeiro > 0, grade[linhas, np.maximum(primeiro - 1, 0)], 0).astype(np.int64)
+
+    # Bisseção inteira: baixo não atinge a meta, alto atinge
+    aberto = encontrou & (alto - baixo > 1)
+    while aberto.any():
+        meio = (alto + baixo) // 2
+        ok = mt_com_duracao(meio[:, None])[:, 0] >= meta
+        alto = np.where(aberto & ok, meio, alto)
+        baixo = np.where(aberto & ~ok, meio, baixo)
+        aberto = encontrou & (alto - baixo > 1)
+
+    duracao = np.where(encontrou, alto, 0)
+    dtc = dic + (duracao - 1).astype('timedelta64[D]')
+    mt_obtida = mt_com_duracao(duracao[:, None])[:, 0]
+    resultado = _resultado(entradas, 'DURACAO_NECESSARIA',
+                           np.where(encontrou, duracao, np.nan), mt_obtida)
+    resultado['DTC_NECESSARIA'] = pd.Series(dtc, index=entradas.index).where(resultado['VIAVEL'])
+    return resultado
+
+
+def entradas_ciclo(dic, dtc, chc, chm, qtm, pc, agro, financiamento,
+                   chm_segue_chc=False, jubilado=False):
+    """Entradas de um único ciclo, com os valores digitados na calculadora."""
+    return pd.DataFrame({
+        'DIC': [np.datetime64(dic, 'D')], 'DTC': [np.datetime64(dtc, 'D')],
+        'CHC': [chc], 'CHM': [chm], 'CHM_SEGUE_CHC': [chm_segue_chc],
+        'PC': [pc], 'QTM': [qtm], 'AGRO': [agro],
+        'FINANCIAMENTO': [financiamento], 'JUBILADO': [jubilado],
+    })
+
+
+SOLUCIONADORES = {
+    'QTM': qtm_necessario,
+    'CHC': chc_necessaria,
+    'DTC': dtc_necessaria,
+}
+
+
+def resolver_meta(df, meta, variavel='QTM', ano=2024, metodologia=None):
+    """
+    Para cada ciclo (linhas limpas da planilha), calcula o valor de QTM, CHC
+    ou DTC necessário para atingir a meta de MT, mantidos os demais parâmetros.
+    """
+    return SOLUCIONADORES[variavel](preparar_entradas(df, metodologia, ano), meta, ano, metodologia)
@@ -0,0 +1,160 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import metodologia
+from metodologia import Metodologia, REGRAS_CHM_646_2022, registrar_metodologia
+from motor_calculo import (COL_FINANCIAMENTO, COLUNAS_RESULTADO, calcular_chm,
+                           calcular_matricula_total_lote, normalizar_datas)
+
+# =======================================================
+# MOTOR VETORIZADO x FÓRMULA DA FASE 4 CICLO A CICLO
+# A referência abaixo reescreve a planilha Fase 4 (QTDC -> ... -> MT) com
+# datas do Python e condicionais, um ciclo por vez, sem reaproveitar o motor.
+# =======================================================
+
+D = datetime.date
+
+# Tipo de curso, oferta, DIC e DTC como vêm na planilha, as mesmas datas já
+# convertidas, CHC, CHMC, PC, QTM, agro, financiamento, apto e ano de análise
+CICLOS = [
+    # Mais de 365 dias, DD/MM/AAAA, regra do integrado (CHMC 1000 -> CHM 3100), ano 2020
+    ('TECNICO', 'INTEGRADO', '01/03/2019', '20/12/2021', D(2019, 3, 1), D(2021, 12, 20),
+     3000, 1000, 1.5, 30, 'Não', 'PRESENCIAL', 'SIM', 2020),
+    # FIC: CHM segue a CHC; ISO, dentro do ano de 2024
+    ('QUALIFICACAO PROFISSIONAL (FIC)', 'PRESENCIAL', '2024-03-01', '2024-07-30',
+     D(2024, 3, 1), D(2024, 7, 30), 160, 200, 1.0, 25, 'Sim', 'PRESENCIAL', 'SIM', 2024),
+    # Número de série do Excel (45352 = 01/03/2024), EAD próprio
+    ('GRADUACAO', 'BACHARELADO', '45352', '15/12/2025', D(2024, 3, 1), D(2025, 12, 15),
+     2400, 2400, 2.0, 40, 'Não', 'EAD PRÓPRIO', 'SIM', 2024),
+    # PROEJA (CHM 2400), terminou no ano anterior, EAD com financiamento externo
+    ('TECNICO', 'PROEJA INTEGRADO', '2021-02-01', '2023-11-30', D(2021, 2, 1), D(2023, 11, 30),
+     2400, 1200, 1.5, 18, 'Não', 'EAD FINANCIAMENTO EXTERNO', 'SIM', 2024),
+    # Terminou há mais de 1095 dias: sem matrícula computada
+    ('TECNICO', 'SUBSEQUENTE', '01/02/2018', '30/06/2020', D(2018, 2, 1), D(2020, 6, 30),
+     1200, 1200, 1.0, 22, 'Não', 'PRESENCIAL', 'SIM', 2024),
+    # Começa no ano de análise e termina depois dele, com bônus agro
+    ('TECNICO', 'INTEGRADO', '2024-02-15 00:00:00', '2026-12-10', D(2024, 2, 15), D(2026, 12, 10),
+     3200, 1200, 1.5, 35, 'Sim', 'PRESENCIAL', 'SIM', 2024),
+    # Apto = NÃO: MT zerada
+    ('TECNICO', 'CONCOMITANTE', '2023-03-01', '2025-07-15', D(2023, 3, 1), D(2025, 7, 15),
+     1000, 1000, 1.0, 12, 'Não', 'PRESENCIAL', 'NÃO', 2024),
+    # Data inválida: sem resultado
+    ('TECNICO', 'SUBSEQUENTE', '31/02/2024', '2025-12-20', None, D(2025, 12, 20),
+     1200, 1200, 1.0, 20, 'Não', 'PRESENCIAL', 'SIM', 2024),
+]
+
+
+def quadro(ciclos):
+    return pd.DataFrame([{
+        'Tipo de Curso': c[0], 'Tipo de Oferta': c[1], 'DIC': c[2], 'DTC': c[3],
+        'CHC': c[6], 'CHMC': c[7], 'PC': c[8], 'QTM1P': c[9], 'Agropecuária': c[10],
+        COL_FINANCIAMENTO: c[11], 'Apto': c[12],
+    } for c in ciclos], dtype=object)
+
+
+def formula_referencia(dic, dtc, chc, chm, qtm, pc, agro, financiamento, apto, ano,
+                       divisor_ch=800, dias_ano=365):
+    if dic is None or dtc is None:
+        return None
+    dip, dfp = D(ano, 1, 1), D(ano, 12, 31)
+    qtdc = (dtc - dic).days + 1
+    chmd = min(chm, chc) / qtdc if qtdc > 0 else 0.0
+    if qtdc > dias_ano:
+        cha = chmd * dias_ano
+        fech = cha / divisor_ch
+    else:
+        cha = chm
+        fech = chc / divisor_ch
+
+    dias_periodo = (dfp - dip).days + 1
+    dacp, dacp5 = 0, 0.0
+    if dic < dip and dtc > dfp:
+        dacp = dias_periodo
+    elif dic >= dip and dtc > dfp and dic < dfp:
+        dacp = (dfp - dic).days + 1
+    elif dic < dip and dip <= dtc <= dfp:
+        dacp = (dtc - dip).days + 1
+    elif dic >= dip and dtc <= dfp:
+        dacp = (dtc - dic).days + 1
+    elif dic < dip and dtc < dip:
+        dacp5 = dias_periodo / 2
+    fechda = fech * (dacp + dacp5) / dias_periodo
+
+    if dacp5 == 0:
+        mechda = fechda * qtm
+    elif (dip - dtc).days > 1095:
+        mechda = 0.0
+    else:
+        mechda = fechda * qtm / 2
+    mp = mechda * pc
+    ba = mp * 0.5 if agro == 'Sim' else 0.0
+    mt = {'PRESENCIAL': mp + ba,
+          'EAD PRÓPRIO': mp * 0.80,
+          'EAD FINANCIAMENTO EXTERNO': mp * 0.25}[financiamento]
+    return {'QTDC': qtdc, 'CHA': cha, 'FECH': fech, 'MECHDA': mechda, 'MP': mp, 'BA': ba,
+            'MT': 0.0 if apto == 'NÃO' else mt}
+
+
+@pytest.mark.parametrize('ciclo', CICLOS, ids=[f"{c[1]}-{c[2]}-{c[13]}" for c in CICLOS])
+def test_motor_confere_com_formula_ciclo_a_ciclo(ciclo):
+    df = quadro([ciclo])
+    ano = ciclo[13]
+    resultado = calcular_matricula_total_lote(df, ano).iloc[0]
+
+    chm = calcular_chm(ciclo[0], ciclo[1], ciclo[6], ciclo[7])
+    assert resultado['CHM'] == chm
+    esperado = formula_referencia(ciclo[4], ciclo[5], ciclo[6], chm, ciclo[9], ciclo[8],
+                                  ciclo[10], ciclo[11], ciclo[12], ano)
+    if esperado is None:
+        assert resultado[COLUNAS_RESULTADO].isnull().all()
+        return
+    for coluna, valor in esperado.items():
+        assert resultado[coluna] == pytest.approx(valor), coluna
+
+
+def test_regras_de_chm():
+    df = quadro(CICLOS)
+    chm = calcular_matricula_total_lote(df, 2024)['CHM'].tolist()
+    # Integrado 1000 -> 3100, FIC segue a CHC, sem regra -> CHMC, PROEJA -> 2400, integrado 1200 -> 3200
+    assert chm[:6] == [3100, 160, 2400, 2400, 1200, 3200]
+
+
+def test_lote_com_varios_ciclos_igual_ao_ciclo_isolado():
+    df = quadro(CICLOS)
+    lote = calcular_matricula_total_lote(df, 2024)
+    for i in range(len(CICLOS)):
+        isolado = calcular_matricula_total_lote(df.iloc[[i]], 2024)
+        pd.testing.assert_frame_equal(lote.iloc[[i]], isolado)
+
+
+def test_formatos_de_data():
+    valores = pd.Series(['01/03/2024', '2024-03-01', '45352', 45352, '2024-03-01 10:30:00',
+                         pd.Timestamp('2024-03-01'), '31/02/2024', 'abc', None, '12'], dtype=object)
+    datas = normalizar_datas(valores)
+    assert (datas[:6] == np.datetime64('2024-03-01')).all()
+    assert np.isnat(datas[6:]).all()
+
+
+@pytest.fixture
+def versao_2026():
+    originais = list(metodologia.METODOLOGIAS)
+    registrar_metodologia(Metodologia('teste/2026', 'Teste', 2026, REGRAS_CHM_646_2022,
+                                      divisor_ch=1000, dias_ano=360))
+    yield
+    metodologia.METODOLOGIAS[:] = originais
+
+
+def test_cada_ano_usa_a_versao_vigente(versao_2026):
+    ciclo = CICLOS[5]
+    df = quadro([ciclo])
+    chm = calcular_chm(ciclo[0], ciclo[1], ciclo[6], ciclo[7])
+    argumentos = (ciclo[4], ciclo[5], ciclo[6], chm, ciclo[9], ciclo[8], ciclo[10], ciclo[11], ciclo[12])
+    for ano, parametros in [(2024, {}), (2026, {'divisor_ch': 1000, 'dias_ano': 360})]:
+        esperado = formula_referencia(*argumentos, ano, **parametros)
+        assert calcular_matricula_total_lote(df, ano)['MT'].iloc[0] == pytest.approx(esperado['MT'])
+    # Versão fixada vale para qualquer ano
+    fixada = calcular_matricula_total_lote(df, 2026, metodologia='646/2022')['MT'].iloc[0]
+    assert fixada == pytest.approx(formula_referencia(*argumentos, 2026)['MT'])
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from motor_calculo import FIN_PRESENCIAL, calcular_formula
+from solucionador import DURACAO_MAXIMA, dtc_necessaria, entradas_ciclo
+
+
+def mt_por_duracao(dic, chc, chm, qtm, ano):
+    duracoes = np.arange(1, DURACAO_MAXIMA + 1)
+    dtc = np.datetime64(dic, 'D') + (duracoes - 1).astype('timedelta64[D]')
+    return duracoes, calcular_formula(np.datetime64(dic, 'D'), dtc, chc, chm, qtm, 1.0,
+                                      False, FIN_PRESENCIAL, ano)['MT']
+
+
+def menor_duracao(duracoes, mt, meta):
+    atinge = np.flatnonzero(mt >= meta)
+    return duracoes[atinge[0]] if len(atinge) else None
+
+
+def test_meta_perto_do_pico_de_365_dias():
+    # Acima de dias_ano a CHA é limitada e a MT cai: o pico fica perto de 365
+    # dias, entre dois pontos da grade de 15 em 15 dias (361 e 376)
+    duracoes, mt = mt_por_duracao('2024-01-01', 1200, 1200, 30, 2024)
+    meta = (mt[360] + mt[364]) / 2
+    assert mt[375] < meta
+
+    resultado = dtc_necessaria(entradas_ciclo('2024-01-01', '2024-12-31', 1200, 1200, 30, 1.0,
+                                              False, FIN_PRESENCIAL), meta, 2024)
+    assert resultado['VIAVEL'].iloc[0]
+    assert resultado['DURACAO_NECESSARIA'].iloc[0] == menor_duracao(duracoes, mt, meta)
+    assert resultado['MT_OBTIDA'].iloc[0] >= meta
+
+
+@pytest.mark.parametrize('dic', ['2019-05-10', '2021-03-01', '2023-08-15', '2024-01-01', '2024-06-20'])
+def test_confere_com_busca_exaustiva(dic):
+    duracoes, mt = mt_por_duracao(dic, 1000, 1200, 25, 2024)
+    metas = np.linspace(0.5, np.nanmax(mt) * 1.05, 25)
+    entradas = entradas_ciclo(dic, dic, 1000, 1200, 25, 1.0, False, FIN_PRESENCIAL)
+    for meta in metas:
+        resultado = dtc_necessaria(entradas, meta, 2024).iloc[0]
+        esperado = menor_duracao(duracoes, mt, meta)
+        if esperado is None:
+            assert not resultado['VIAVEL']
+        else:
+            assert resultado['DURACAO_NECESSARIA'] == esperado, meta